@@ -0,0 +1,229 @@
+# Author: Marius Lindauer
+# License: BSD
+# Generator of synthetic ASlib scenarios
+#
+# Writes description.txt and all ARFF files of a scenario
+# with a configurable number of instances, algorithms, features,
+# repetitions and timeouts.
+# The performance depends on latent instance properties that are
+# also (noisily) reflected by the features,
+# such that feature-based selectors can learn something.
+
+import os
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+import numpy as np
+import pandas as pd
+
+STATUS_VALUES = "{ok, timeout, memout, not_applicable, crash, other}"
+FEATURE_STATUS_VALUES = "{ok, timeout, memout, presolved, crash, other, unknown}"
+
+
+class ScenarioGenerator(object):
+
+    def __init__(self, n_instances: int = 1000, n_algorithms: int = 20, n_features: int = 50,
+                 n_feature_steps: int = 5, n_repetitions: int = 1, timeout_rate: float = 0.2,
+                 crash_rate: float = 0.01, presolved_rate: float = 0.02,
+                 performance_type: str = "runtime", cutoff: float = 5000.0,
+                 n_folds: int = 10, n_latent: int = 5, seed: int = 1):
+        '''
+            Arguments
+            ---------
+            n_instances, n_algorithms, n_features, n_feature_steps, n_repetitions: int
+                size of the scenario
+            timeout_rate: float
+                fraction of (runtime) runs that time out
+            crash_rate: float
+                fraction of runs and feature steps that crash
+            presolved_rate: float
+                fraction of feature step runs that presolve the instance
+            performance_type: str
+                "runtime" or "solution_quality"
+            cutoff: float
+                algorithm and feature cutoff time
+            n_folds: int
+                number of folds in cv.arff
+            n_latent: int
+                number of latent instance properties
+            seed: int
+                random seed
+        '''
+        if performance_type not in ["runtime", "solution_quality"]:
+            raise ValueError("Unknown performance type %s" % (performance_type))
+        self.n_instances = n_instances
+        self.n_algorithms = n_algorithms
+        self.n_features = n_features
+        self.n_feature_steps = min(n_feature_steps, n_features)
+        self.n_repetitions = n_repetitions
+        self.timeout_rate = timeout_rate
+        self.crash_rate = crash_rate
+        self.presolved_rate = presolved_rate
+        self.performance_type = performance_type
+        self.cutoff = cutoff
+        self.n_folds = n_folds
+        self.n_latent = n_latent
+        self.seed = seed
+
+        self.instances = ["inst_%07d" % i for i in range(n_instances)]
+        self.algorithms = ["algo_%03d" % a for a in range(n_algorithms)]
+        self.features = ["feat_%04d" % f for f in range(n_features)]
+        self.feature_steps = ["step_%02d" % s for s in range(self.n_feature_steps)]
+        # features are distributed round-robin over the feature steps
+        self.step_features = dict((step, self.features[s::self.n_feature_steps])
+                                  for s, step in enumerate(self.feature_steps))
+
+    def write(self, dn: str):
+        '''
+            writes the scenario to directory dn
+        '''
+        os.makedirs(dn, exist_ok=True)
+        rng = np.random.RandomState(self.seed)
+
+        latent = rng.normal(size=(self.n_instances, self.n_latent))
+        self._write_description(os.path.join(dn, "description.txt"))
+        self._write_algorithm_runs(os.path.join(dn, "algorithm_runs.arff"), latent, rng)
+        status = self._write_feature_runstatus(os.path.join(dn, "feature_runstatus.arff"), rng)
+        self._write_feature_values(os.path.join(dn, "feature_values.arff"), latent, status, rng)
+        self._write_feature_costs(os.path.join(dn, "feature_costs.arff"), rng)
+        self._write_cv(os.path.join(dn, "cv.arff"), rng)
+
+    def _write_description(self, fn: str):
+        lines = ["scenario_id: SYNTHETIC-%d-%d-%d" % (self.n_instances, self.n_algorithms, self.n_features),
+                 "performance_measures:",
+                 "- %s" % ("runtime" if self.performance_type == "runtime" else "quality"),
+                 "performance_type:",
+                 "- %s" % (self.performance_type),
+                 "maximize:",
+                 "- false",
+                 "algorithm_cutoff_time: %s" % (self.cutoff if self.performance_type == "runtime" else "'?'"),
+                 "algorithm_cutoff_memory: '?'",
+                 "features_cutoff_time: %s" % (self.cutoff),
+                 "features_cutoff_memory: '?'",
+                 "features_deterministic:"]
+        lines.extend("- %s" % f for f in self.features)
+        lines.append("features_stochastic: null")
+        lines.append("default_steps:")
+        lines.extend("- %s" % step for step in self.feature_steps)
+        lines.append("feature_steps:")
+        for s, step in enumerate(self.feature_steps):
+            lines.append("  %s:" % step)
+            lines.append("    provides:")
+            lines.extend("    - %s" % f for f in self.step_features[step])
+            # all steps require the first one (as "Pre" in SAT scenarios)
+            if s > 0:
+                lines.append("    requires:")
+                lines.append("    - %s" % self.feature_steps[0])
+        lines.append("metainfo_algorithms:")
+        for algo in self.algorithms:
+            lines.append("  %s:" % algo)
+            lines.append("    configuration: ''")
+            lines.append("    deterministic: %s" % ("true" if self.n_repetitions == 1 else "false"))
+        lines.append("number_of_feature_steps: %d" % (self.n_feature_steps))
+        with open(fn, "w") as fp:
+            fp.write("\n".join(lines) + "\n")
+
+    def _write_arff(self, fn: str, relation: str, attributes: list, data: pd.DataFrame):
+        with open(fn, "w") as fp:
+            fp.write("@RELATION %s\n\n" % (relation))
+            for name, kind in attributes:
+                fp.write("@ATTRIBUTE %s %s\n" % (name, kind))
+            fp.write("\n@DATA\n")
+            data.to_csv(fp, header=False, index=False, na_rep="?", float_format="%.6g")
+
+    def _write_algorithm_runs(self, fn: str, latent: np.ndarray, rng: np.random.RandomState):
+        n_insts, n_algos, n_reps = self.n_instances, self.n_algorithms, self.n_repetitions
+
+        hardness = rng.normal(scale=1.5, size=(n_insts, 1))
+        strength = rng.normal(scale=0.5, size=(1, n_algos))
+        affinity = latent @ rng.normal(scale=0.7, size=(self.n_latent, n_algos))
+        # instances x algorithms x repetitions
+        log_perf = (hardness + strength + affinity)[:, :, np.newaxis] + \
+            rng.normal(scale=0.3, size=(n_insts, n_algos, n_reps))
+
+        status = np.full(log_perf.shape, "ok", dtype=object)
+        if self.performance_type == "runtime":
+            # scale such that timeout_rate of the runs exceed the cutoff
+            quantile = np.quantile(log_perf, 1 - self.timeout_rate) if self.timeout_rate > 0 else log_perf.max()
+            perf = np.exp(log_perf - quantile) * self.cutoff
+            timeout = perf > self.cutoff
+            perf[timeout] = self.cutoff
+            status[timeout] = "timeout"
+            crash = ~timeout & (rng.uniform(size=perf.shape) < self.crash_rate)
+            status[crash] = "crash"
+        else:
+            perf = np.exp(log_perf) * 100
+
+        data = pd.DataFrame({"instance_id": np.repeat(self.instances, n_algos * n_reps),
+                             "repetition": np.tile(np.arange(1, n_reps + 1), n_insts * n_algos),
+                             "algorithm": np.tile(np.repeat(self.algorithms, n_reps), n_insts),
+                             "performance": perf.ravel(),
+                             "runstatus": status.ravel()})
+        measure = "runtime" if self.performance_type == "runtime" else "quality"
+        self._write_arff(fn, "ALGORITHM_RUNS_SYNTHETIC",
+                         [("instance_id", "STRING"), ("repetition", "NUMERIC"), ("algorithm", "STRING"),
+                          (measure, "NUMERIC"), ("runstatus", STATUS_VALUES)], data)
+
+    def _write_feature_runstatus(self, fn: str, rng: np.random.RandomState) -> np.ndarray:
+        shape = (self.n_instances, self.n_feature_steps)
+        status = np.full(shape, "ok", dtype=object)
+        u = rng.uniform(size=shape)
+        status[u < self.crash_rate] = "crash"
+        if self.performance_type == "runtime":
+            status[(u >= self.crash_rate) & (u < self.crash_rate + self.presolved_rate)] = "presolved"
+        data = pd.DataFrame(status, columns=self.feature_steps)
+        data.insert(0, "repetition", 1)
+        data.insert(0, "instance_id", self.instances)
+        self._write_arff(fn, "FEATURE_RUNSTATUS_SYNTHETIC",
+                         [("instance_id", "STRING"), ("repetition", "NUMERIC")] +
+                         [(step, FEATURE_STATUS_VALUES) for step in self.feature_steps], data)
+        return status
+
+    def _write_feature_values(self, fn: str, latent: np.ndarray, status: np.ndarray,
+                              rng: np.random.RandomState):
+        values = latent @ rng.normal(size=(self.n_latent, self.n_features)) + \
+            rng.normal(scale=0.5, size=(self.n_instances, self.n_features))
+        step_idx = dict((f, s) for s, step in enumerate(self.feature_steps) for f in self.step_features[step])
+        for f_idx, feature in enumerate(self.features):
+            values[status[:, step_idx[feature]] != "ok", f_idx] = np.nan
+        data = pd.DataFrame(values, columns=self.features)
+        data.insert(0, "repetition", 1)
+        data.insert(0, "instance_id", self.instances)
+        self._write_arff(fn, "FEATURE_VALUES_SYNTHETIC",
+                         [("instance_id", "STRING"), ("repetition", "NUMERIC")] +
+                         [(f, "NUMERIC") for f in self.features], data)
+
+    def _write_feature_costs(self, fn: str, rng: np.random.RandomState):
+        costs = rng.exponential(scale=0.002 * self.cutoff, size=(self.n_instances, self.n_feature_steps))
+        data = pd.DataFrame(costs, columns=self.feature_steps)
+        data.insert(0, "repetition", 1)
+        data.insert(0, "instance_id", self.instances)
+        self._write_arff(fn, "FEATURE_COSTS_SYNTHETIC",
+                         [("instance_id", "STRING"), ("repetition", "NUMERIC")] +
+                         [(step, "NUMERIC") for step in self.feature_steps], data)
+
+    def _write_cv(self, fn: str, rng: np.random.RandomState):
+        folds = rng.permutation(np.arange(self.n_instances) % self.n_folds) + 1
+        data = pd.DataFrame({"instance_id": self.instances, "repetition": 1, "fold": folds})
+        self._write_arff(fn, "CV_SYNTHETIC",
+                         [("instance_id", "STRING"), ("repetition", "NUMERIC"), ("fold", "NUMERIC")], data)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--out_dir", help="Directory of the generated scenario")
+    parser.add_argument("--n_instances", type=int, default=1000, help="Number of instances")
+    parser.add_argument("--n_algorithms", type=int, default=20, help="Number of algorithms")
+    parser.add_argument("--n_features", type=int, default=50, help="Number of features")
+    parser.add_argument("--n_feature_steps", type=int, default=5, help="Number of feature steps")
+    parser.add_argument("--n_repetitions", type=int, default=1, help="Number of repetitions per run")
+    parser.add_argument("--timeout_rate", type=float, default=0.2, help="Fraction of runs with timeouts")
+    parser.add_argument("--performance_type", default="runtime", choices=["runtime", "solution_quality"], help="Performance type")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+
+    args_ = parser.parse_args()
+
+    ScenarioGenerator(n_instances=args_.n_instances, n_algorithms=args_.n_algorithms,
+                      n_features=args_.n_features, n_feature_steps=args_.n_feature_steps,
+                      n_repetitions=args_.n_repetitions, timeout_rate=args_.timeout_rate,
+                      performance_type=args_.performance_type, seed=args_.seed).write(args_.out_dir)
@@ -0,0 +1,212 @@
+# Author: Marius Lindauer
+# License: BSD
+# Timed benchmarks of the starter kit on synthetic scenarios
+#
+# For each scenario size, a synthetic scenario is generated
+# (see generate_scenario.py) and the main stages are timed:
+# scenario loading (parsing, streaming, cache), fitting and prediction
+# of the selectors and validation.
+# The results are written as JSON such that they can be compared
+# between versions.
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import tempfile
+import subprocess
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate_scenario import ScenarioGenerator
+from oasc_starterkit.scenario_cache import parse_scenario, read_scenario
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.regression_selector import RegressionSelector
+from oasc_starterkit.results_io import load_results
+from validation.validate import Validator
+from validation.baselines import ScenarioBaselines
+
+# benchmark format version
+BENCHMARK_VERSION = 1
+
+
+def parse_size(size: str) -> dict:
+    '''
+        parses a size "<instances>x<algorithms>x<features>[x<repetitions>]"
+    '''
+    values = [int(v) for v in size.lower().split("x")]
+    if len(values) not in [3, 4]:
+        raise ValueError("Size %s does not match <instances>x<algorithms>x<features>[x<repetitions>]" % (size))
+    return {"n_instances": values[0], "n_algorithms": values[1], "n_features": values[2],
+            "n_repetitions": values[3] if len(values) == 4 else 1}
+
+
+def get_git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkRunner(object):
+
+    def __init__(self, repeat: int = 3, loop_limit: int = 20000, work_dn: str = None):
+        '''
+            Arguments
+            ---------
+            repeat: int
+                each stage is run repeat times; the minimal time is reported
+            loop_limit: int
+                the per-instance validation loop is only timed
+                up to this number of instances
+            work_dn: str
+                directory for the generated scenarios and result files
+                (default: temporary directory)
+        '''
+        self.repeat = repeat
+        self.loop_limit = loop_limit
+        self.work_dn = work_dn
+        self.logger = logging.getLogger("Benchmark")
+
+    def time(self, func, repeat: int = None):
+        '''
+            runs func repeat times
+
+            Returns
+            -------
+            seconds: float
+                minimal wall time
+            result:
+                return value of the last call
+        '''
+        times = []
+        result = None
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    def run_size(self, size: str, performance_type: str, dn: str) -> list:
+        '''
+            generates a scenario of the given size and times all stages
+
+            Returns
+            -------
+            list of dicts (one per stage)
+        '''
+        params = parse_size(size)
+        generator = ScenarioGenerator(performance_type=performance_type, **params)
+        records = []
+
+        def record(stage, seconds):
+            self.logger.info("%s %s: %.4f sec" % (size, stage, seconds))
+            records.append({"size": size, "performance_type": performance_type,
+                            "stage": stage, "seconds": seconds, **params})
+
+        scen_dn = os.path.join(dn, "scenario")
+        cache_dn = os.path.join(dn, "cache")
+        seconds, _ = self.time(lambda: generator.write(scen_dn), repeat=1)
+        record("generate", seconds)
+
+        seconds, scenario = self.time(lambda: parse_scenario(scen_dn))
+        record("load_parse", seconds)
+        seconds, _ = self.time(lambda: parse_scenario(scen_dn, stream_runs=True))
+        record("load_stream", seconds)
+        seconds, _ = self.time(lambda: read_scenario(scen_dn, cache_dn=cache_dn), repeat=1)
+        record("load_cache_write", seconds)
+        seconds, _ = self.time(lambda: read_scenario(scen_dn, cache_dn=cache_dn))
+        record("load_cache_read", seconds)
+
+        selectors = [("single_best", SingleBest()), ("regression", RegressionSelector())]
+        result_fn = os.path.join(dn, "results.json")
+        for name, selector in selectors:
+            seconds, _ = self.time(lambda: selector.fit(scenario))
+            record("fit_%s" % (name), seconds)
+            seconds, schedules = self.time(lambda: selector.predict(scenario, out_fn=None))
+            record("predict_%s" % (name), seconds)
+        seconds, _ = self.time(lambda: selectors[-1][1].predict(scenario, out_fn=result_fn))
+        record("predict_write_json", seconds)
+        seconds, _ = self.time(lambda: selectors[-1][1].predict(scenario, out_fn=result_fn + "l"))
+        record("predict_write_jsonl", seconds)
+
+        validator = Validator(log_instances=False)
+        seconds, baselines = self.time(lambda: ScenarioBaselines.compute(scenario, scenario))
+        record("baselines", seconds)
+        if performance_type == "runtime":
+            seconds, _ = self.time(lambda: validator.validate_runtime(schedules, scenario, scenario,
+                                                                      baselines=baselines))
+            record("validate_runtime", seconds)
+            seconds, _ = self.time(lambda: validator.validate_runtime(load_results(result_fn + "l"),
+                                                                      scenario, scenario, baselines=baselines))
+            record("validate_runtime_jsonl", seconds)
+            if params["n_instances"] <= self.loop_limit:
+                seconds, _ = self.time(lambda: validator.validate_runtime(schedules, scenario, scenario,
+                                                                          vectorized=False, baselines=baselines),
+                                       repeat=1)
+                record("validate_runtime_loop", seconds)
+        else:
+            seconds, _ = self.time(lambda: validator.validate_quality(schedules, scenario, scenario,
+                                                                      baselines=baselines))
+            record("validate_quality", seconds)
+
+        return records
+
+    def run(self, sizes: list, performance_type: str = "runtime") -> dict:
+        '''
+            runs the benchmarks for all sizes
+
+            Returns
+            -------
+            dict with environment information and the list of results
+        '''
+        work_dn = self.work_dn or tempfile.mkdtemp(prefix="oasc_benchmark_")
+        results = []
+        try:
+            for size in sizes:
+                dn = os.path.join(work_dn, "%s_%s" % (performance_type, size))
+                results.extend(self.run_size(size=size, performance_type=performance_type, dn=dn))
+        finally:
+            if self.work_dn is None:
+                shutil.rmtree(work_dn, ignore_errors=True)
+
+        return {"version": BENCHMARK_VERSION,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "git_revision": get_git_revision(),
+                "python": sys.version.split()[0],
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "repeat": self.repeat,
+                "results": results}
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["1000x20x50", "10000x50x100"],
+                        help="Scenario sizes <instances>x<algorithms>x<features>[x<repetitions>]")
+    parser.add_argument("--performance_type", default="runtime", choices=["runtime", "solution_quality"], help="Performance type")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of each stage (minimal time is reported)")
+    parser.add_argument("--work_dir", default=None, help="Directory for generated scenarios (default: temporary directory)")
+    parser.add_argument("--out_fn", default="benchmark_results.json", help="JSON file with the results")
+
+    args_ = parser.parse_args()
+
+    logging.basicConfig(level="INFO")
+    # per-instance log messages of the validation are not part of the benchmark
+    logging.getLogger("Validation").setLevel("WARNING")
+    logging.getLogger("Stats").setLevel("WARNING")
+    logging.getLogger("SingleBest").setLevel("WARNING")
+
+    report = BenchmarkRunner(repeat=args_.repeat, work_dn=args_.work_dir).run(
+        sizes=args_.sizes, performance_type=args_.performance_type)
+    with open(args_.out_fn, "w") as fp:
+        json.dump(report, fp, indent=2)
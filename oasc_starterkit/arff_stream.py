@@ -0,0 +1,582 @@
+# Author: Marius Lindauer
+# License: BSD
+# Streaming reader for algorithm_runs.arff
+#
+# ASlibScenario loads the complete @DATA section into a long-form
+# data frame (one row per instance, algorithm and repetition)
+# before it is pivoted into the instance x algorithm performance matrix.
+# For large scenarios, this costs several times the memory of the final matrix.
+#
+# Here, the @DATA section is parsed in chunks and the repetitions
+# are aggregated on the fly into a preallocated
+# float32 performance matrix and a uint8 runstatus code matrix
+# (see oasc_starterkit/runstatus.py).
+#
+# For stochastic algorithms, read_run_cube keeps all repetitions
+# in a dense instance x algorithm x repetition cube (RunCube)
+# from which aggregates (mean, median, PAR10 per run, solve probability)
+# are computed without a long-form data frame.
+#
+# In contrast to ASlibScenario.read_scenario, the following consistency
+# checks are skipped by read_scenario_streamed and read_runs_streamed:
+# - ASlibScenario.check_data is not called, i.e., it is not checked that
+#   algorithm runs and feature values cover the same instances
+#   and that the values of unsuccessful feature steps are missing
+# - runs of algorithms that are not listed in description.txt
+#   (and of unknown instances) are skipped with a warning instead of an error
+# - the number of repetitions per run is not checked;
+#   missing repetitions are aggregated over the available ones
+# - performance values are not checked against the cutoff
+# The performance matrix is float32 by default,
+# i.e., it matches the parse of ASlibScenario up to a relative error of about 1e-7.
+
+import os
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.runstatus import OK, MISSING, StatusMatrix, encode_status, get_status
+
+AGGREGATIONS = ["mean", "median"]
+
+# aggregations of the repetitions in a RunCube
+CUBE_AGGREGATIONS = ["mean", "median", "par10", "solve_probability"]
+
+# optional scenario files read by read_scenario_streamed
+# (algorithm_runs.arff is read by read_algorithm_runs)
+OPTIONAL_FILES = [("feature_values.arff", "read_feature_values"),
+                  ("feature_runstatus.arff", "read_feature_runstatus"),
+                  ("feature_costs.arff", "read_feature_costs"),
+                  ("ground_truth.arff", "read_ground_truth"),
+                  ("cv.arff", "read_cv")]
+
+
+class RunMatrix(object):
+
+    def __init__(self, instances: list, algorithms: list,
+                 performance: np.ndarray, runstatus: np.ndarray):
+        '''
+            aggregated algorithm runs
+
+            Arguments
+            ---------
+            instances: list
+                instance names (rows)
+            algorithms: list
+                algorithm names (columns)
+            performance: np.ndarray
+                float32 matrix instances x algorithms
+                (NaN if no run was found)
+            runstatus: np.ndarray
+                uint8 status codes instances x algorithms
+        '''
+        self.instances = instances
+        self.algorithms = algorithms
+        self.performance = performance
+        self.runstatus = runstatus
+
+    def to_frames(self):
+        '''
+            returns performance and runstatus as pandas data frames
+            in the format of ASlibScenario.performance_data and .runstatus_data
+            (runstatus with categorical columns, see runstatus.STATUS_DTYPE)
+        '''
+        perf = pd.DataFrame(self.performance, index=self.instances, columns=self.algorithms)
+        status = StatusMatrix(codes=self.runstatus, index=self.instances, columns=self.algorithms).to_frame()
+        return perf, status
+
+    def apply_to(self, scenario: ASlibScenario):
+        '''
+            sets performance_data, runstatus_data and instances of scenario
+
+            as in ASlibScenario, the performance of unsuccessful runs
+            is imputed with PAR10 in runtime scenarios and
+            the performance is multiplied by -1 in maximization scenarios
+        '''
+        perf, status = self.to_frames()
+        if scenario.performance_type[0] == "runtime":
+            perf[self.runstatus != OK] = scenario.algorithm_cutoff_time * 10
+        if scenario.maximize[0]:
+            perf *= -1
+        scenario.performance_data = perf
+        scenario.runstatus_data = status
+        scenario.instances = list(self.instances)
+
+
+class RunCube(object):
+
+    def __init__(self, instances: list, algorithms: list,
+                 performance: np.ndarray, runstatus: np.ndarray):
+        '''
+            all repetitions of the algorithm runs
+
+            Arguments
+            ---------
+            instances: list
+                instance names (first axis)
+            algorithms: list
+                algorithm names (second axis)
+            performance: np.ndarray
+                float32 cube instances x algorithms x repetitions
+                (NaN if there was no such repetition)
+            runstatus: np.ndarray
+                uint8 status codes instances x algorithms x repetitions
+                (MISSING if there was no such repetition)
+        '''
+        self.instances = instances
+        self.algorithms = algorithms
+        self.performance = performance
+        self.runstatus = runstatus
+
+    @property
+    def n_repetitions(self) -> int:
+        return self.performance.shape[2]
+
+    @classmethod
+    def from_scenario(cls, scenario: ASlibScenario):
+        '''
+            cube with a single repetition from the (aggregated)
+            performance_data and runstatus_data of scenario
+        '''
+        perf_data = scenario.performance_data
+        perf = perf_data.values.astype(np.float64)
+        if scenario.maximize[0]:
+            perf = perf * -1
+        status = get_status(scenario).runs.reindex(perf_data.index, perf_data.columns).codes
+        return cls(instances=list(perf_data.index), algorithms=list(perf_data.columns),
+                   performance=perf[:, :, np.newaxis], runstatus=status[:, :, np.newaxis])
+
+    def subset(self, instances: list):
+        '''
+            cube of the given instances
+        '''
+        rows = pd.Index(self.instances).get_indexer(list(instances))
+        if (rows < 0).any():
+            raise ValueError("Instances are not part of the cube")
+        return RunCube(instances=list(instances), algorithms=self.algorithms,
+                       performance=self.performance[rows], runstatus=self.runstatus[rows])
+
+    def get_n_runs(self) -> np.ndarray:
+        '''
+            number of repetitions of each instance and algorithm
+        '''
+        return (self.runstatus != MISSING).sum(axis=2)
+
+    def get_status(self) -> np.ndarray:
+        '''
+            status of each instance and algorithm
+            (the largest code, i.e., "ok" only if all repetitions are "ok")
+        '''
+        return self.runstatus.max(axis=2)
+
+    def aggregate(self, aggregate: str = "mean", algorithm_cutoff_time: float = None) -> np.ndarray:
+        '''
+            aggregates the repetitions
+
+            Arguments
+            ---------
+            aggregate: str
+                mean: mean of the observed performance values
+                median: median of the observed performance values
+                par10: mean of the PAR10 score of each run
+                       (10 x cutoff if the status is not "ok")
+                solve_probability: fraction of runs with status "ok"
+            algorithm_cutoff_time: float
+                cutoff (required for par10)
+
+            Returns
+            -------
+            np.ndarray instances x algorithms
+            (NaN if there was no run)
+        '''
+        n_runs = self.get_n_runs()
+        if aggregate == "mean" or aggregate == "par10":
+            if aggregate == "par10":
+                if algorithm_cutoff_time is None:
+                    raise ValueError("par10 requires the algorithm cutoff time")
+                values = np.where(self.runstatus == OK, self.performance,
+                                  np.float32(10 * algorithm_cutoff_time))
+                values[np.isnan(values) & (self.runstatus == OK)] = 10 * algorithm_cutoff_time
+                values[self.runstatus == MISSING] = np.nan
+            else:
+                values = self.performance
+            observed = ~np.isnan(values)
+            counts = observed.sum(axis=2)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = np.where(observed, values, 0).sum(axis=2, dtype=np.float64) / counts
+            result[counts == 0] = np.nan
+            return result
+        if aggregate == "median":
+            result = np.full(n_runs.shape, np.nan)
+            has_run = ~np.isnan(self.performance).all(axis=2)
+            result[has_run] = np.nanmedian(self.performance[has_run], axis=1)
+            return result
+        if aggregate == "solve_probability":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = (self.runstatus == OK).sum(axis=2) / n_runs
+            result[n_runs == 0] = np.nan
+            return result
+        raise ValueError("Unknown aggregation %s (choose from %s)" % (aggregate, CUBE_AGGREGATIONS))
+
+    def to_run_matrix(self, aggregate: str = "mean", dtype=np.float32) -> RunMatrix:
+        '''
+            aggregated runs ("mean" or "median" of the performance values)
+            with the status of get_status
+        '''
+        if aggregate not in AGGREGATIONS:
+            raise ValueError("Unknown aggregation %s (choose from %s)" % (aggregate, AGGREGATIONS))
+        return RunMatrix(instances=list(self.instances), algorithms=list(self.algorithms),
+                         performance=self.aggregate(aggregate).astype(dtype), runstatus=self.get_status())
+
+    def get_repetition(self, rep: int, fill_missing: bool = False) -> RunMatrix:
+        '''
+            runs of a single repetition (0-based)
+
+            Arguments
+            ---------
+            rep: int
+                index of the repetition
+            fill_missing: bool
+                runs missing in this repetition take the mean (and status)
+                of the other repetitions (otherwise they stay NaN/missing)
+        '''
+        perf = self.performance[:, :, rep]
+        status = self.runstatus[:, :, rep]
+        if fill_missing:
+            missing = status == MISSING
+            if missing.any():
+                perf = perf.copy()
+                status = status.copy()
+                perf[missing] = self.aggregate("mean")[missing]
+                status[missing] = self.get_status()[missing]
+        return RunMatrix(instances=list(self.instances), algorithms=list(self.algorithms),
+                         performance=perf, runstatus=status)
+
+
+def get_run_cube(scenario: ASlibScenario) -> RunCube:
+    '''
+        returns the repetitions of the instances of scenario.performance_data:
+        scenario.run_cube (see read_scenario_streamed) if available;
+        otherwise a cube with a single (aggregated) repetition
+    '''
+    cube = getattr(scenario, "run_cube", None)
+    if cube is None:
+        return RunCube.from_scenario(scenario)
+    instances = list(scenario.performance_data.index)
+    if cube.instances != instances:
+        # e.g., cv split of a scenario
+        cube = cube.subset(instances)
+    return cube
+
+
+def read_arff_header(fp):
+    '''
+        reads the ARFF header up to (and including) the @DATA line
+
+        Returns
+        -------
+        list of tuples (attribute name, attribute type)
+    '''
+    attributes = []
+    for line in fp:
+        line = line.strip()
+        if not line or line.startswith("%"):
+            continue
+        upper = line.upper()
+        if upper.startswith("@ATTRIBUTE"):
+            _, rest = line.split(None, 1)
+            if rest[0] in ("'", '"'):
+                name, a_type = rest[1:].split(rest[0], 1)
+            else:
+                name, a_type = rest.split(None, 1)
+            attributes.append((name, a_type.strip()))
+        elif upper.startswith("@DATA"):
+            return attributes
+    raise ValueError("Found no @DATA section")
+
+
+def iter_arff_chunks(fn: str, chunk_size: int = 100000, usecols: list = None):
+    '''
+        iterates over the @DATA section of an ARFF file in chunks
+
+        Arguments
+        ---------
+        fn: str
+            ARFF file name
+        chunk_size: int
+            number of data lines per chunk
+        usecols: list
+            attribute names to read (default: all)
+
+        Returns
+        -------
+        generator of pd.DataFrame with attribute names as columns;
+        missing values ("?") are NaN
+    '''
+    with open(fn) as fp:
+        attributes = read_arff_header(fp)
+        for chunk in iter_arff_data(fp, attributes, chunk_size=chunk_size, usecols=usecols):
+            yield chunk
+
+
+def iter_arff_data(fp, attributes: list, chunk_size: int = 100000, usecols: list = None):
+    '''
+        iterates over ARFF data lines in chunks
+
+        Arguments
+        ---------
+        fp: file object
+            positioned at the first data line
+        attributes: list
+            attributes of the file (see read_arff_header)
+        chunk_size: int
+            number of data lines per chunk
+        usecols: list
+            attribute names to read (default: all)
+
+        Returns
+        -------
+        generator of pd.DataFrame (see iter_arff_chunks)
+    '''
+    names = [a[0] for a in attributes]
+    dtypes = dict((name, str) for name, a_type in attributes if a_type.upper() != "NUMERIC")
+    try:
+        reader = pd.read_csv(fp, header=None, names=names, usecols=usecols,
+                             dtype=dtypes, na_values=["?"], keep_default_na=False,
+                             quotechar="'", skipinitialspace=True,
+                             chunksize=chunk_size)
+    except pd.errors.EmptyDataError:
+        # no data lines
+        return
+    for chunk in reader:
+        # comment lines inside of @DATA
+        comments = chunk[names[0]].str.startswith("%", na=False)
+        if comments.any():
+            chunk = chunk[~comments]
+        yield chunk
+
+
+def scan_algorithm_runs(fn: str, chunk_size: int = 100000):
+    '''
+        first pass over algorithm_runs.arff:
+        collects instance and algorithm names (in order of appearance)
+        and the maximal repetition number
+    '''
+    with open(fn) as fp:
+        names = [a[0] for a in read_arff_header(fp)]
+    instances = OrderedDict()
+    algorithms = OrderedDict()
+    max_rep = 1
+    for chunk in iter_arff_chunks(fn, chunk_size=chunk_size, usecols=names[:3]):
+        instances.update((inst, None) for inst in chunk[names[0]].unique())
+        algorithms.update((algo, None) for algo in chunk[names[2]].unique())
+        max_rep = max(max_rep, int(chunk[names[1]].max()))
+    return list(instances), list(algorithms), max_rep
+
+
+def read_algorithm_runs(fn: str, algorithms: list = None, instances: list = None,
+                        performance_measure: str = None, aggregate: str = "mean",
+                        chunk_size: int = 100000, dtype=np.float32) -> RunMatrix:
+    '''
+        reads algorithm_runs.arff chunk by chunk
+        and aggregates repetitions on the fly
+
+        Arguments
+        ---------
+        fn: str
+            file name of algorithm_runs.arff
+        algorithms: list
+            algorithm names (e.g., ASlibScenario.algorithms);
+            if None, collected in an additional pass over the file
+        instances: list
+            instance names; if None, collected in an additional pass over the file
+        performance_measure: str
+            name of the performance column (default: 4th attribute)
+        aggregate: str
+            aggregation of repetitions: "mean" or "median"
+            ("median" keeps all repetitions in memory until the end)
+        chunk_size: int
+            number of data lines parsed at once
+        dtype:
+            dtype of the performance matrix
+
+        Returns
+        -------
+        RunMatrix
+    '''
+    logger = logging.getLogger("ArffStream")
+    if aggregate not in AGGREGATIONS:
+        raise ValueError("Unknown aggregation %s (choose from %s)" % (aggregate, AGGREGATIONS))
+
+    with open(fn) as fp:
+        attributes = read_arff_header(fp)
+    names = [a[0] for a in attributes]
+    if len(names) < 5:
+        raise ValueError("%s has to have (at least) the attributes instance_id, repetition, "
+                         "algorithm, <performance measure> and runstatus" % (fn))
+    inst_col, rep_col, algo_col, status_col = names[0], names[1], names[2], names[-1]
+    perf_col = performance_measure if performance_measure is not None else names[3]
+
+    if aggregate == "median":
+        # requires all repetitions
+        cube = read_run_cube(fn, algorithms=algorithms, instances=instances,
+                             performance_measure=performance_measure,
+                             chunk_size=chunk_size, dtype=dtype)
+        return cube.to_run_matrix(aggregate="median", dtype=dtype)
+
+    if instances is None or algorithms is None:
+        found_insts, found_algos, _ = scan_algorithm_runs(fn, chunk_size=chunk_size)
+        instances = found_insts if instances is None else instances
+        algorithms = found_algos if algorithms is None else algorithms
+
+    inst_index = pd.Index(instances)
+    algo_index = pd.Index(algorithms)
+    n_insts, n_algos = len(instances), len(algorithms)
+
+    status = np.full((n_insts, n_algos), MISSING, dtype=np.uint8)
+    perf = np.zeros((n_insts, n_algos), dtype=dtype)
+    counts = np.zeros((n_insts, n_algos), dtype=np.uint16)
+
+    n_rows = 0
+    for chunk in iter_arff_chunks(fn, chunk_size=chunk_size,
+                                  usecols=[inst_col, rep_col, algo_col, perf_col, status_col]):
+        rows = inst_index.get_indexer(chunk[inst_col])
+        cols = algo_index.get_indexer(chunk[algo_col])
+        known = (rows >= 0) & (cols >= 0)
+        if not known.all():
+            logger.warning("Skip %d runs of unknown instances or algorithms" % ((~known).sum()))
+        rows, cols = rows[known], cols[known]
+        values = chunk[perf_col].values[known].astype(dtype)
+
+        np.maximum.at(status, (rows, cols), encode_status(chunk[status_col].values[known]))
+
+        observed = ~np.isnan(values)
+        np.add.at(perf, (rows[observed], cols[observed]), values[observed])
+        np.add.at(counts, (rows[observed], cols[observed]), 1)
+        n_rows += len(rows)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        perf /= counts
+    perf[counts == 0] = np.nan
+
+    logger.debug("Read %d runs of %d instances and %d algorithms from %s" % (n_rows, n_insts, n_algos, fn))
+
+    return RunMatrix(instances=list(instances), algorithms=list(algorithms),
+                     performance=perf, runstatus=status)
+
+
+def read_run_cube(fn: str, algorithms: list = None, instances: list = None,
+                  performance_measure: str = None, chunk_size: int = 100000,
+                  dtype=np.float32) -> RunCube:
+    '''
+        reads all repetitions of algorithm_runs.arff chunk by chunk
+        into a preallocated cube
+
+        Arguments
+        ---------
+        see read_algorithm_runs
+
+        Returns
+        -------
+        RunCube
+    '''
+    logger = logging.getLogger("ArffStream")
+
+    with open(fn) as fp:
+        names = [a[0] for a in read_arff_header(fp)]
+    if len(names) < 5:
+        raise ValueError("%s has to have (at least) the attributes instance_id, repetition, "
+                         "algorithm, <performance measure> and runstatus" % (fn))
+    inst_col, rep_col, algo_col, status_col = names[0], names[1], names[2], names[-1]
+    perf_col = performance_measure if performance_measure is not None else names[3]
+
+    found_insts, found_algos, max_rep = scan_algorithm_runs(fn, chunk_size=chunk_size)
+    instances = found_insts if instances is None else instances
+    algorithms = found_algos if algorithms is None else algorithms
+
+    inst_index = pd.Index(instances)
+    algo_index = pd.Index(algorithms)
+    shape = (len(instances), len(algorithms), max_rep)
+    perf = np.full(shape, np.nan, dtype=dtype)
+    status = np.full(shape, MISSING, dtype=np.uint8)
+
+    n_rows = 0
+    for chunk in iter_arff_chunks(fn, chunk_size=chunk_size,
+                                  usecols=[inst_col, rep_col, algo_col, perf_col, status_col]):
+        rows = inst_index.get_indexer(chunk[inst_col])
+        cols = algo_index.get_indexer(chunk[algo_col])
+        known = (rows >= 0) & (cols >= 0)
+        if not known.all():
+            logger.warning("Skip %d runs of unknown instances or algorithms" % ((~known).sum()))
+        rows, cols = rows[known], cols[known]
+        reps = np.clip(chunk[rep_col].values[known].astype(np.int64) - 1, 0, max_rep - 1)
+        perf[rows, cols, reps] = chunk[perf_col].values[known].astype(dtype)
+        status[rows, cols, reps] = encode_status(chunk[status_col].values[known])
+        n_rows += len(rows)
+
+    logger.debug("Read %d runs (%d repetitions) of %d instances and %d algorithms from %s" %
+                 (n_rows, max_rep, shape[0], shape[1], fn))
+
+    return RunCube(instances=list(instances), algorithms=list(algorithms),
+                   performance=perf, runstatus=status)
+
+
+def read_scenario_streamed(dn: str, aggregate: str = "mean",
+                           chunk_size: int = 100000, keep_repetitions: bool = False) -> ASlibScenario:
+    '''
+        reads an ASlib scenario;
+        algorithm_runs.arff is read with read_algorithm_runs
+        and all other files with the readers of ASlibScenario
+
+        Arguments
+        ---------
+        dn: str
+            scenario directory
+        aggregate: str
+            aggregation of repetitions ("mean" or "median")
+        chunk_size: int
+            number of data lines of algorithm_runs.arff parsed at once
+        keep_repetitions: bool
+            store all repetitions as scenario.run_cube (see RunCube)
+
+        Returns
+        -------
+        ASlibScenario
+            (without the long-form algorithm_runs data frame;
+            see the header of this module for the skipped consistency checks)
+    '''
+    scenario = ASlibScenario()
+    scenario.read_description(fn=os.path.join(dn, "description.txt"))
+    for fn, read_func in OPTIONAL_FILES:
+        if os.path.isfile(os.path.join(dn, fn)):
+            getattr(scenario, read_func)(fn=os.path.join(dn, fn))
+
+    read_runs_streamed(scenario=scenario, fn=os.path.join(dn, "algorithm_runs.arff"),
+                       aggregate=aggregate, chunk_size=chunk_size,
+                       keep_repetitions=keep_repetitions)
+    get_status(scenario)
+    return scenario
+
+
+def read_runs_streamed(scenario: ASlibScenario, fn: str, aggregate: str = "mean",
+                       chunk_size: int = 100000, keep_repetitions: bool = False):
+    '''
+        reads algorithm_runs.arff with read_algorithm_runs
+        (or read_run_cube if keep_repetitions)
+        and sets performance_data, runstatus_data and instances of scenario
+        (scenario.read_description has to be called before)
+    '''
+    if keep_repetitions:
+        scenario.run_cube = read_run_cube(fn=fn, algorithms=scenario.algorithms,
+                                          performance_measure=scenario.performance_measure[0],
+                                          chunk_size=chunk_size)
+        runs = scenario.run_cube.to_run_matrix(aggregate=aggregate)
+    else:
+        runs = read_algorithm_runs(fn=fn, algorithms=scenario.algorithms,
+                                   performance_measure=scenario.performance_measure[0],
+                                   aggregate=aggregate, chunk_size=chunk_size)
+    runs.apply_to(scenario)
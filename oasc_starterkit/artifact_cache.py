@@ -0,0 +1,191 @@
+# Author: Marius Lindauer
+# License: BSD
+# Content-addressed caches of intermediate artifacts
+#
+# An artifact (e.g., a cv fold, a feature matrix or a fitted selector)
+# is stored under the sha1 of everything it was computed from
+# (see content_key), i.e., a changed input yields a new key
+# and stale entries are never returned.
+# Both caches are bounded in size and evict the least recently used entries:
+# LRUCache keeps python objects in memory,
+# DiskLRUCache keeps JSON documents (e.g., validation results) in a directory.
+
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def content_key(*parts) -> str:
+    '''
+        sha1 of the JSON representation of parts
+        (dicts are serialized with sorted keys)
+    '''
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def estimate_nbytes(value, depth: int = 0) -> int:
+    '''
+        rough memory size of value:
+        numpy arrays and pandas objects with their data;
+        containers and objects (up to three levels deep) with their contents
+    '''
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if depth >= 3:
+        return 64
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v, depth + 1) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_nbytes(v, depth + 1) for v in value)
+    if hasattr(value, "__dict__"):
+        return sum(estimate_nbytes(v, depth + 1) for v in vars(value).values())
+    return 64
+
+
+class LRUCache(object):
+
+    def __init__(self, max_mb: float = 1024):
+        '''
+            in-memory cache with size-bounded LRU eviction
+
+            Arguments
+            ---------
+            max_mb: float
+                maximal total size of all entries (see estimate_nbytes);
+                an entry larger than max_mb is returned but not stored
+        '''
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.entries = OrderedDict()  # key -> (value, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.logger = logging.getLogger("LRUCache")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key: str, value, nbytes: int = None):
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key)[1]
+        nbytes = estimate_nbytes(value) if nbytes is None else nbytes
+        if nbytes > self.max_bytes:
+            self.logger.debug("Entry %s (%d bytes) exceeds the cache size" % (key, nbytes))
+            return
+        self.entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, old_nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= old_nbytes
+            self.evictions += 1
+
+    def get_or_compute(self, key: str, compute):
+        '''
+            returns the entry of key;
+            computes (compute()) and stores it if it is missing
+        '''
+        if key in self.entries:
+            return self.get(key)
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def get_stats(self) -> dict:
+        return {"entries": len(self.entries), "mb": self.nbytes / 1024. / 1024.,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class DiskLRUCache(object):
+
+    def __init__(self, dn: str, max_mb: float = 256):
+        '''
+            JSON documents in a directory (one file per key)
+            with size-bounded LRU eviction;
+            the modification time of a file is its last use
+
+            Arguments
+            ---------
+            dn: str
+                cache directory
+            max_mb: float
+                maximal total size of all files (see evict)
+        '''
+        self.dn = dn
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.logger = logging.getLogger("DiskLRUCache")
+        os.makedirs(dn, exist_ok=True)
+
+    def _fn(self, key: str) -> str:
+        return os.path.join(self.dn, "%s.json" % (key))
+
+    def get(self, key: str, default=None):
+        fn = self._fn(key)
+        try:
+            with open(fn) as fp:
+                value = json.load(fp)
+            os.utime(fn)
+        except (OSError, ValueError):
+            return default
+        return value
+
+    def put(self, key: str, value):
+        fn = self._fn(key)
+        tmp_fn = "%s.tmp%d" % (fn, os.getpid())
+        with open(tmp_fn, "w") as fp:
+            json.dump(value, fp)
+        os.replace(tmp_fn, fn)
+
+    def evict(self):
+        '''
+            removes the least recently used files
+            until all files fit into max_mb
+
+            Returns
+            -------
+            int: number of removed files
+        '''
+        files = []
+        for name in os.listdir(self.dn):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.dn, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        nbytes = sum(size for _, size, _ in files)
+        n_removed = 0
+        for _, size, name in sorted(files):
+            if nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.dn, name))
+            except OSError:
+                continue
+            nbytes -= size
+            n_removed += 1
+        if n_removed:
+            self.logger.debug("Evicted %d files from %s" % (n_removed, self.dn))
+        return n_removed
@@ -0,0 +1,150 @@
+# Author: Marius Lindauer
+# License: BSD
+# Cross-validation of an algorithm selector
+# based on the fold assignment in cv.arff
+#
+# Each fold is fitted, predicted and validated in its own worker process.
+# The workers are forked after the scenario was loaded,
+# i.e., they share the scenario data with the parent process
+# (copy-on-write) instead of receiving a pickled copy.
+
+import logging
+import functools
+import multiprocessing
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.scenario_cache import read_scenario
+from oasc_starterkit.model_io import SELECTORS, create_named_selector
+from validation.validate import Stats, Validator
+
+# data shared with forked worker processes
+_SHARED = {}
+
+
+def _run_fold(fold: int):
+    '''
+        fits, predicts and validates one cv fold
+        (on the scenario shared by CrossValidator.run)
+
+        Returns
+        -------
+        fold: int
+        stat: Stats
+    '''
+    scenario = _SHARED["scenario"]
+    selector = _SHARED["selector_factory"]()
+
+    test_scenario, train_scenario = scenario.get_split(indx=fold)
+
+    selector.fit(scenario=train_scenario)
+    schedules = selector.predict(scenario=test_scenario, out_fn=None)
+
+    validator = Validator(log_instances=False)
+    if test_scenario.performance_type[0] == "runtime":
+        stat = validator.validate_runtime(schedules=schedules, test_scenario=test_scenario,
+                                          train_scenario=train_scenario)
+    else:
+        stat = validator.validate_quality(schedules=schedules, test_scenario=test_scenario,
+                                          train_scenario=train_scenario)
+    return fold, stat
+
+
+class CrossValidator(object):
+
+    def __init__(self, selector_factory=SingleBest, n_jobs: int = None):
+        '''
+            Arguments
+            ---------
+            selector_factory: callable
+                returns a new selector with the fit/predict interface of SingleBest
+            n_jobs: int
+                number of worker processes (default: number of cores);
+                folds run sequentially if n_jobs == 1 or if
+                worker processes cannot be forked on this platform
+        '''
+        self.selector_factory = selector_factory
+        self.n_jobs = n_jobs
+        self.logger = logging.getLogger("CrossValidator")
+
+    def get_folds(self, scenario: ASlibScenario) -> list:
+        if scenario.cv_data is None:
+            raise ValueError("Scenario has no cv.arff")
+        return sorted(int(fold) for fold in scenario.cv_data["fold"].unique())
+
+    def run(self, scenario: ASlibScenario):
+        '''
+            runs all cv folds of scenario
+
+            Arguments
+            ---------
+            scenario: ASlibScenario
+                scenario with training data and cv.arff
+
+            Returns
+            -------
+            fold_stats: dict fold -> Stats
+            stat: Stats
+                aggregated statistics over all folds
+        '''
+        folds = self.get_folds(scenario)
+        n_jobs = min(self.n_jobs or multiprocessing.cpu_count(), len(folds))
+
+        _SHARED["scenario"] = scenario
+        _SHARED["selector_factory"] = self.selector_factory
+        try:
+            if n_jobs > 1 and "fork" in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context("fork")
+                with ctx.Pool(processes=n_jobs) as pool:
+                    fold_stats = dict(pool.imap_unordered(_run_fold, folds))
+            else:
+                fold_stats = dict(map(_run_fold, folds))
+        finally:
+            _SHARED.clear()
+
+        stat = Stats(runtime_cutoff=scenario.algorithm_cutoff_time
+                     if scenario.performance_type[0] == "runtime" else None,
+                     maximize=scenario.maximize[0])
+        for fold in folds:
+            stat.add(fold_stats[fold])
+
+        self.show(fold_stats=fold_stats, stat=stat)
+
+        return fold_stats, stat
+
+    def show(self, fold_stats: dict, stat: Stats):
+        '''
+            logs one line per fold and the aggregated statistics
+        '''
+        remove_unsolvable = stat.runtime_cutoff is not None
+        self.logger.info("Fold\tScore\tOracle\tSBS\tGap closed")
+        for fold in sorted(fold_stats):
+            f_stat = fold_stats[fold]
+            self.logger.info("%d\t%.4f\t%.4f\t%.4f\t%.4f" % (fold,
+                                                              f_stat.get_score(remove_unsolvable),
+                                                              f_stat.get_score_oracle(remove_unsolvable),
+                                                              f_stat.get_score_sbs(remove_unsolvable),
+                                                              f_stat.get_closed_gap(remove_unsolvable)))
+        self.logger.info("Aggregated over %d folds:" % (len(fold_stats)))
+        stat.show(remove_unsolvable=remove_unsolvable)
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level="INFO")
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--train_as", help="Directory with training data in ASlib format (incl. cv.arff)")
+    parser.add_argument("--selector", default="single_best", choices=sorted(SELECTORS), help="Algorithm selector")
+    parser.add_argument("--n_jobs", type=int, default=None, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+
+    args_ = parser.parse_args()
+
+    scenario = read_scenario(dn=args_.train_as, cache_dn=args_.cache_dir,
+                             use_cache=not args_.no_cache)
+    CrossValidator(selector_factory=functools.partial(create_named_selector, args_.selector),
+                   n_jobs=args_.n_jobs).run(scenario=scenario)
@@ -0,0 +1,388 @@
+# Author: Marius Lindauer
+# License: BSD
+# Incremental fitting on a growing performance database
+#
+# RunStatistics keeps running sufficient statistics of algorithm runs:
+# per (instance, algorithm) the sum and count of the observed performance values
+# and the run status (aggregated over repetitions as in arff_stream.read_algorithm_runs),
+# and per algorithm the sum of the (PAR10-imputed) performance,
+# the number of instances and the number of unsolved instances and timeouts.
+# Each update only touches the cells of the new runs, i.e.,
+# runs appended to algorithm_runs.arff (the read position is remembered)
+# or runs of a delta ARFF file; new instances and algorithms (e.g., new solver versions)
+# are added on the fly.
+# The per-algorithm averages are the column means of ASlibScenario.performance_data,
+# i.e., SingleBest.fit_statistics gives the same single best as a full refit.
+
+import io
+import os
+import json
+import logging
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+import numpy as np
+import pandas as pd
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.arff_stream import RunMatrix, read_arff_header, iter_arff_data
+from oasc_starterkit.runstatus import OK, MISSING, TIMEOUT, encode_status
+
+# version of the saved statistics
+STATISTICS_VERSION = 1
+
+
+class RunStatistics(object):
+
+    def __init__(self, performance_type: str = "runtime", algorithm_cutoff_time: float = None,
+                 maximize: bool = False, algorithms: list = None):
+        '''
+            Arguments
+            ---------
+            performance_type: str
+                "runtime" or "solution_quality"
+            algorithm_cutoff_time: float
+                cutoff of runtime scenarios
+                (unsuccessful runs count as 10 x cutoff)
+            maximize: bool
+                performance is maximized
+                (values are multiplied by -1 as in ASlibScenario)
+            algorithms: list
+                algorithms known in advance (e.g., ASlibScenario.algorithms);
+                algorithms without runs are counted as unsolved
+        '''
+        if performance_type == "runtime" and algorithm_cutoff_time is None:
+            raise ValueError("Runtime scenarios require algorithm_cutoff_time")
+        self.performance_type = performance_type
+        self.algorithm_cutoff_time = algorithm_cutoff_time
+        self.maximize = maximize
+
+        self.logger = logging.getLogger("RunStatistics")
+
+        self.instances = []
+        self.algorithms = []
+        self._inst_index = {}
+        self._algo_index = {}
+        # read positions of files read with read_runs (file name -> byte offset)
+        self.offsets = {}
+
+        # cells (instances x algorithms; rows are allocated in blocks)
+        self._sum = np.zeros((0, 0))
+        self._count = np.zeros((0, 0), dtype=np.int32)
+        self._status = np.zeros((0, 0), dtype=np.uint8)
+
+        # per algorithm
+        self.perf_sum = np.zeros(0)
+        self.n_instances = np.zeros(0, dtype=np.int64)
+        self.n_unsolved = np.zeros(0, dtype=np.int64)
+        self.n_timeouts = np.zeros(0, dtype=np.int64)
+
+        self.n_runs = 0
+
+        if algorithms:
+            self._add_algorithms(list(algorithms))
+
+    @classmethod
+    def from_scenario(cls, scenario: ASlibScenario):
+        '''
+            empty statistics for the description of scenario
+        '''
+        return cls(performance_type=scenario.performance_type[0],
+                   algorithm_cutoff_time=scenario.algorithm_cutoff_time,
+                   maximize=bool(scenario.maximize[0]),
+                   algorithms=scenario.algorithms)
+
+    def _cell_values(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        '''
+            values of the cells in performance_data
+            (mean of the repetitions; PAR10 for unsuccessful runtime runs;
+            NaN for quality cells without runs)
+        '''
+        count = self._count[rows, cols]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = self._sum[rows, cols] / count
+        values[count == 0] = np.nan
+        if self.performance_type == "runtime":
+            values[self._status[rows, cols] != OK] = self.algorithm_cutoff_time * 10
+        if self.maximize:
+            values = -values
+        return values
+
+    def _add_to_aggregates(self, rows: np.ndarray, cols: np.ndarray, sign: int):
+        values = self._cell_values(rows, cols)
+        observed = ~np.isnan(values)
+        status = self._status[rows, cols]
+        np.add.at(self.perf_sum, cols[observed], sign * values[observed])
+        np.add.at(self.n_instances, cols[observed], sign)
+        np.add.at(self.n_unsolved, cols[observed & (status != OK)], sign)
+        np.add.at(self.n_timeouts, cols[observed & (status == TIMEOUT)], sign)
+
+    def _all_cells(self, rows: list, cols: list):
+        rows, cols = np.meshgrid(np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+                                 indexing="ij")
+        return rows.ravel(), cols.ravel()
+
+    def _add_algorithms(self, algorithms: list):
+        start = len(self.algorithms)
+        for algo in algorithms:
+            self._algo_index[algo] = len(self.algorithms)
+            self.algorithms.append(algo)
+        n_new = len(self.algorithms) - start
+        n_rows = self._sum.shape[0]
+        self._sum = np.hstack([self._sum, np.zeros((n_rows, n_new))])
+        self._count = np.hstack([self._count, np.zeros((n_rows, n_new), dtype=np.int32)])
+        self._status = np.hstack([self._status, np.full((n_rows, n_new), MISSING, dtype=np.uint8)])
+        for name in ["perf_sum", "n_instances", "n_unsolved", "n_timeouts"]:
+            values = getattr(self, name)
+            setattr(self, name, np.concatenate([values, np.zeros(n_new, dtype=values.dtype)]))
+        # cells of known instances without runs
+        self._add_to_aggregates(*self._all_cells(range(len(self.instances)), range(start, len(self.algorithms))),
+                                sign=1)
+
+    def _add_instances(self, instances: list):
+        start = len(self.instances)
+        for inst in instances:
+            self._inst_index[inst] = len(self.instances)
+            self.instances.append(inst)
+        n_needed = len(self.instances)
+        if n_needed > self._sum.shape[0]:
+            # grow in blocks such that appending rows is amortized O(1)
+            n_new = max(n_needed, 2 * self._sum.shape[0], 1024) - self._sum.shape[0]
+            n_cols = len(self.algorithms)
+            self._sum = np.vstack([self._sum, np.zeros((n_new, n_cols))])
+            self._count = np.vstack([self._count, np.zeros((n_new, n_cols), dtype=np.int32)])
+            self._status = np.vstack([self._status, np.full((n_new, n_cols), MISSING, dtype=np.uint8)])
+        self._add_to_aggregates(*self._all_cells(range(start, n_needed), range(len(self.algorithms))), sign=1)
+
+    def update(self, instances, algorithms, values, status) -> list:
+        '''
+            adds algorithm runs
+
+            Arguments
+            ---------
+            instances, algorithms: array-like
+                instance and algorithm name of each run
+            values: array-like
+                performance value of each run (NaN if missing)
+            status: array-like
+                run status string of each run
+
+            Returns
+            -------
+            list of instances with new runs
+        '''
+        instances = np.asarray(instances, dtype=object)
+        algorithms = np.asarray(algorithms, dtype=object)
+        values = np.asarray(values, dtype=np.float64)
+        if len(instances) == 0:
+            return []
+
+        # only the distinct names are looked up; the runs are mapped with their codes
+        inst_codes, inst_names = pd.factorize(instances)
+        algo_codes, algo_names = pd.factorize(algorithms)
+
+        new_algos = [a for a in algo_names if a not in self._algo_index]
+        if new_algos:
+            self.logger.info("New algorithms: %s" % (", ".join(new_algos)))
+            self._add_algorithms(new_algos)
+        new_insts = [i for i in inst_names if i not in self._inst_index]
+        if new_insts:
+            self._add_instances(new_insts)
+
+        rows = np.array([self._inst_index[inst] for inst in inst_names], dtype=np.int64)[inst_codes]
+        cols = np.array([self._algo_index[algo] for algo in algo_names], dtype=np.int64)[algo_codes]
+
+        # replace the contribution of the touched cells
+        cells = np.unique(rows * len(self.algorithms) + cols)
+        cell_rows, cell_cols = np.divmod(cells, len(self.algorithms))
+        self._add_to_aggregates(cell_rows, cell_cols, sign=-1)
+
+        observed = ~np.isnan(values)
+        np.add.at(self._sum, (rows[observed], cols[observed]), values[observed])
+        np.add.at(self._count, (rows[observed], cols[observed]), 1)
+        np.maximum.at(self._status, (rows, cols), encode_status(status))
+
+        self._add_to_aggregates(cell_rows, cell_cols, sign=1)
+        self.n_runs += len(rows)
+
+        return [self.instances[r] for r in np.unique(cell_rows)]
+
+    def read_runs(self, fn: str, chunk_size: int = 100000, block_size: int = 2 ** 24) -> list:
+        '''
+            adds the runs of an ARFF file in the format of algorithm_runs.arff;
+            if the file was read before, only the lines appended since then are read
+
+            Arguments
+            ---------
+            fn: str
+                file name (e.g., algorithm_runs.arff or a delta file with the same attributes)
+            chunk_size: int
+                number of data lines parsed at once
+            block_size: int
+                number of bytes read at once
+                (the memory used is bounded by block_size and chunk_size)
+
+            Returns
+            -------
+            list of instances with new runs
+        '''
+        key = os.path.abspath(fn)
+        offset = self.offsets.get(key)
+        touched = set()
+        with open(fn, "rb") as fp:
+            attributes = read_arff_header(line.decode("utf-8") for line in iter(fp.readline, b""))
+            names = [a[0] for a in attributes]
+            if len(names) < 5:
+                raise ValueError("%s has to have (at least) the attributes instance_id, repetition, "
+                                 "algorithm, <performance measure> and runstatus" % (fn))
+            inst_col, algo_col, perf_col, status_col = names[0], names[2], names[3], names[-1]
+
+            if offset is not None:
+                if offset > os.path.getsize(fn):
+                    raise ValueError("%s is shorter than at the last update; "
+                                     "the statistics have to be computed from scratch" % (fn))
+                fp.seek(offset)
+            start = end = fp.tell()
+
+            # the incomplete last line of a block is carried over to the next block;
+            # an incomplete last line of the file is read by the next update
+            rest = b""
+            for block in iter(lambda: fp.read(block_size), b""):
+                data = rest + block
+                n_complete = data.rfind(b"\n") + 1
+                rest = data[n_complete:]
+                if n_complete == 0:
+                    continue
+                buf = io.TextIOWrapper(io.BytesIO(data[:n_complete]), encoding="utf-8")
+                for chunk in iter_arff_data(buf, attributes, chunk_size=chunk_size,
+                                            usecols=[inst_col, algo_col, perf_col, status_col]):
+                    touched.update(self.update(instances=chunk[inst_col].values,
+                                               algorithms=chunk[algo_col].values,
+                                               values=chunk[perf_col].values,
+                                               status=chunk[status_col].values))
+                end += n_complete
+                self.offsets[key] = end
+            self.offsets[key] = end
+
+        self.logger.debug("Read %d new bytes of %s" % (end - start, fn))
+        return [inst for inst in self.instances if inst in touched]
+
+    def get_average(self) -> pd.Series:
+        '''
+            average performance of each algorithm
+            (as performance_data.mean(axis=0))
+        '''
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average = self.perf_sum / self.n_instances
+        return pd.Series(np.where(self.n_instances > 0, average, np.nan), index=self.algorithms)
+
+    def get_summary(self) -> pd.DataFrame:
+        '''
+            per algorithm: average performance (PAR10 in runtime scenarios),
+            number of instances, unsolved instances and timeouts
+        '''
+        return pd.DataFrame({"average": self.get_average().values,
+                             "instances": self.n_instances,
+                             "unsolved": self.n_unsolved,
+                             "timeouts": self.n_timeouts},
+                            index=self.algorithms)
+
+    def get_run_matrix(self, instances: list = None) -> RunMatrix:
+        '''
+            aggregated runs of instances (default: all instances)
+            (see arff_stream.RunMatrix.apply_to)
+        '''
+        if instances is None:
+            instances = self.instances
+        rows = np.array([self._inst_index[inst] for inst in instances], dtype=np.int64)
+        count = self._count[rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            perf = self._sum[rows] / count
+        perf[count == 0] = np.nan
+        return RunMatrix(instances=list(instances), algorithms=list(self.algorithms),
+                         performance=perf, runstatus=self._status[rows].copy())
+
+    def save(self, fn: str):
+        '''
+            saves the statistics (incl. read positions) to a .npz file
+        '''
+        n = len(self.instances)
+        meta = {"version": STATISTICS_VERSION,
+                "performance_type": self.performance_type,
+                "algorithm_cutoff_time": self.algorithm_cutoff_time,
+                "maximize": self.maximize,
+                "instances": self.instances,
+                "algorithms": self.algorithms,
+                "offsets": self.offsets,
+                "n_runs": self.n_runs}
+        # np.savez appends .npz otherwise
+        with open(fn, "wb") as fp:
+            np.savez_compressed(fp, meta=np.array(json.dumps(meta)),
+                                sum=self._sum[:n], count=self._count[:n], status=self._status[:n],
+                                perf_sum=self.perf_sum, n_instances=self.n_instances,
+                                n_unsolved=self.n_unsolved, n_timeouts=self.n_timeouts)
+
+    @classmethod
+    def load(cls, fn: str):
+        '''
+            loads statistics saved with save
+        '''
+        with np.load(fn, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != STATISTICS_VERSION:
+                raise ValueError("%s has version %s; expected version %d" %
+                                 (fn, meta.get("version"), STATISTICS_VERSION))
+            stats = cls(performance_type=meta["performance_type"],
+                        algorithm_cutoff_time=meta["algorithm_cutoff_time"],
+                        maximize=meta["maximize"])
+            stats.instances = list(meta["instances"])
+            stats.algorithms = list(meta["algorithms"])
+            stats._inst_index = dict((inst, idx) for idx, inst in enumerate(stats.instances))
+            stats._algo_index = dict((algo, idx) for idx, algo in enumerate(stats.algorithms))
+            stats.offsets = dict(meta["offsets"])
+            stats.n_runs = meta["n_runs"]
+            stats._sum = data["sum"]
+            stats._count = data["count"]
+            stats._status = data["status"]
+            stats.perf_sum = data["perf_sum"]
+            stats.n_instances = data["n_instances"]
+            stats.n_unsolved = data["n_unsolved"]
+            stats.n_timeouts = data["n_timeouts"]
+        return stats
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--train_as", help="Directory with training data in ASlib format")
+    parser.add_argument("--delta", nargs="*", default=[], help="ARFF files with additional runs (attributes as in algorithm_runs.arff)")
+    parser.add_argument("--state", default=None, help="Load the statistics from (if the file exists) and save them to this file (.npz)")
+
+    args_ = parser.parse_args()
+
+    logging.basicConfig(level="INFO")
+    logger = logging.getLogger("RunStatistics")
+
+    from oasc_starterkit.single_best import SingleBest
+
+    if args_.state and os.path.isfile(args_.state):
+        stats = RunStatistics.load(args_.state)
+    else:
+        scenario = ASlibScenario()
+        scenario.read_description(fn=os.path.join(args_.train_as, "description.txt"))
+        stats = RunStatistics.from_scenario(scenario)
+
+    # only appended runs are read if the statistics were loaded
+    n_runs = stats.n_runs
+    stats.read_runs(os.path.join(args_.train_as, "algorithm_runs.arff"))
+    for fn in args_.delta:
+        stats.read_runs(fn)
+    logger.info("Added %d runs (%d runs of %d instances and %d algorithms in total)" %
+                (stats.n_runs - n_runs, stats.n_runs, len(stats.instances), len(stats.algorithms)))
+
+    sb = SingleBest()
+    sb.fit_statistics(stats)
+    logger.info("Per algorithm:\n%s" % (stats.get_summary()))
+
+    if args_.state:
+        stats.save(args_.state)
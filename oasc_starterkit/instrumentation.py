@@ -0,0 +1,145 @@
+# Author: Marius Lindauer
+# License: BSD
+# Timing and memory instrumentation of the pipeline
+# (reading, fitting, prediction, writing results, validation)
+#
+# Each stage records its wall time, its peak of traced memory (tracemalloc)
+# and the number of processed instances.
+# A disabled profiler (the default of all components) does nothing.
+
+import sys
+import json
+import time
+import logging
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class Profiler(object):
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = True):
+        '''
+            Arguments
+            ---------
+            enabled: bool
+                if False, stage() does not record anything
+            trace_memory: bool
+                record the peak memory per stage with tracemalloc
+                (slows down memory allocations)
+        '''
+        self.enabled = enabled
+        self.trace_memory = trace_memory and enabled
+        self.stages = []
+        self.logger = logging.getLogger("Profiler")
+
+        self._stack = []
+        self._start = time.perf_counter()
+
+    def stage(self, name: str, n_instances: int = None):
+        '''
+            context manager that records a stage;
+            yields the record such that n_instances can be set
+            inside of the stage
+
+            Arguments
+            ---------
+            name: str
+                name of the stage
+            n_instances: int
+                number of processed instances
+        '''
+        if not self.enabled:
+            return _NullStage()
+        return _Stage(self, name, n_instances)
+
+    def _enter(self, record: dict):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if hasattr(tracemalloc, "reset_peak"):  # Python >= 3.9
+                tracemalloc.reset_peak()
+        record["parent"] = self._stack[-1]["name"] if self._stack else None
+        self._stack.append(record)
+        self.stages.append(record)
+        record["_start"] = time.perf_counter()
+
+    def _exit(self, record: dict):
+        record["seconds"] = time.perf_counter() - record.pop("_start")
+        self._stack.pop()
+        if self.trace_memory:
+            # the peak of a nested stage was reset when it started;
+            # therefore, the peaks of nested stages are passed to their parents
+            peak = max(tracemalloc.get_traced_memory()[1], record.pop("_child_peak", 0))
+            record["peak_memory_mb"] = peak / 2 ** 20
+            if self._stack:
+                parent = self._stack[-1]
+                parent["_child_peak"] = max(parent.get("_child_peak", 0), peak)
+        if record.get("n_instances") and record["seconds"] > 0:
+            record["instances_per_sec"] = record["n_instances"] / record["seconds"]
+        self.logger.debug("%s: %.4f sec" % (record["name"], record["seconds"]))
+
+    def report(self) -> dict:
+        '''
+            Returns
+            -------
+            dict with all stages, the total time
+            and the maximal resident memory of the process
+        '''
+        report = {"total_seconds": time.perf_counter() - self._start,
+                  "stages": [dict((key, value) for key, value in record.items() if not key.startswith("_"))
+                             for record in self.stages]}
+        if resource is not None:
+            # kilobytes on Linux, bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report["max_rss_mb"] = max_rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+        return report
+
+    def show(self):
+        '''
+            logs one line per stage
+        '''
+        for record in self.stages:
+            line = "%-20s %10.4f sec" % (record["name"], record.get("seconds", float("nan")))
+            if "peak_memory_mb" in record:
+                line += " %10.2f MB" % (record["peak_memory_mb"])
+            if record.get("n_instances") is not None:
+                line += " %10d instances" % (record["n_instances"])
+            self.logger.info(line)
+
+    def write(self, fn: str):
+        '''
+            writes the report as JSON
+        '''
+        with open(fn, "w") as fp:
+            json.dump(self.report(), fp, indent=2)
+
+
+class _Stage(object):
+
+    def __init__(self, profiler: Profiler, name: str, n_instances: int):
+        self.profiler = profiler
+        self.record = {"name": name, "n_instances": n_instances}
+
+    def __enter__(self):
+        self.profiler._enter(self.record)
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler._exit(self.record)
+
+
+class _NullStage(object):
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+# default of all components: records nothing
+NULL_PROFILER = Profiler(enabled=False)
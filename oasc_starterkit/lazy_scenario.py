@@ -0,0 +1,143 @@
+# Author: Marius Lindauer
+# License: BSD
+# On-demand loading of ASlib scenarios
+#
+# ASlibScenario.read_scenario parses all files of a scenario,
+# although most steps need only a few of them:
+# SingleBest.fit needs only the algorithm runs,
+# the predictions only the feature values (and feature runstatus),
+# and the validation of solution quality neither the feature costs
+# nor the feature runstatus.
+# LazyScenario parses description.txt up front
+# and every other file on the first access of one of its attributes.
+
+import os
+import time
+from collections import OrderedDict
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.arff_stream import read_runs_streamed
+
+# file -> (reader of ASlibScenario, attributes set by the reader)
+COMPONENTS = OrderedDict([("algorithm_runs.arff", ("read_algorithm_runs",
+                                                   ["algorithm_runs", "performance_data", "runstatus_data"])),
+                          ("feature_values.arff", ("read_feature_values", ["feature_data"])),
+                          ("feature_runstatus.arff", ("read_feature_runstatus", ["feature_runstatus_data"])),
+                          ("feature_costs.arff", ("read_feature_costs", ["feature_cost_data"])),
+                          ("ground_truth.arff", ("read_ground_truth", ["ground_truth_data"])),
+                          ("cv.arff", ("read_cv", ["cv_data"]))])
+
+# attribute -> file that provides it
+LAZY_ATTRIBUTES = dict((attr, fn) for fn, (_, attrs) in COMPONENTS.items() for attr in attrs)
+LAZY_ATTRIBUTES["run_cube"] = "algorithm_runs.arff"
+
+
+class LazyScenario(ASlibScenario):
+
+    def __init__(self, dn: str, stream_runs: bool = False, keep_repetitions: bool = False):
+        '''
+            ASlib scenario that reads each file on first access
+
+            In contrast to ASlibScenario.read_scenario,
+            the consistency of the files is not checked
+            (e.g., instances with runs but without features).
+
+            Arguments
+            ---------
+            dn: str
+                scenario directory
+            stream_runs: bool
+                read algorithm_runs.arff with the streaming reader
+                (see arff_stream.read_algorithm_runs)
+            keep_repetitions: bool
+                keep all repetitions of the algorithm runs as run_cube
+                (implies stream_runs; see arff_stream.RunCube)
+        '''
+        super(LazyScenario, self).__init__()
+        # missing attributes are resolved by __getattr__
+        for attr in list(LAZY_ATTRIBUTES) + ["instances"]:
+            self.__dict__.pop(attr, None)
+        self.dir_ = dn
+        self.stream_runs = stream_runs or keep_repetitions
+        self.keep_repetitions = keep_repetitions
+        # (file name, seconds to read it); a tuple, such that copies do not share it
+        self._loaded = ()
+        self._loaded += (("description.txt", self._read("description.txt", "read_description")),)
+
+    def __getattr__(self, name: str):
+        # only called if name is not (yet) an attribute of the instance
+        if name == "instances" and "dir_" in self.__dict__:
+            return self._get_instances()
+        fn = LAZY_ATTRIBUTES.get(name)
+        if fn is None or "dir_" not in self.__dict__:
+            raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+        self.load(fn)
+        return self.__dict__[name]
+
+    def _read(self, fn: str, read_func: str) -> float:
+        start = time.perf_counter()
+        getattr(self, read_func)(fn=os.path.join(self.dir_, fn))
+        seconds = time.perf_counter() - start
+        self.logger.debug("Read %s in %.2f sec" % (os.path.join(self.dir_, fn), seconds))
+        return seconds
+
+    def _get_instances(self) -> list:
+        '''
+            instances of the algorithm runs (in the same order as ASlibScenario,
+            independent of the files read so far)
+            or of the feature values if there are no runs
+        '''
+        if os.path.isfile(os.path.join(self.dir_, "algorithm_runs.arff")):
+            data = self.performance_data
+        else:
+            data = self.feature_data
+        # the streaming reader sets the instances itself
+        if "instances" not in self.__dict__:
+            self.instances = None if data is None else list(data.index)
+        return self.__dict__["instances"]
+
+    def load(self, fn: str = None):
+        '''
+            reads a file of the scenario (e.g., "feature_values.arff")
+            if it was not read before; all files if fn is None;
+            the attributes of missing files are None
+        '''
+        if fn is None:
+            for fn in COMPONENTS:
+                self.load(fn)
+            return
+        if fn in self.get_loaded_components():
+            return
+        read_func, attrs = COMPONENTS[fn]
+        path = os.path.join(self.dir_, fn)
+        seconds = 0.0
+        if not os.path.isfile(path):
+            self.logger.debug("Not found: %s" % (path))
+        elif fn == "algorithm_runs.arff" and self.stream_runs:
+            start = time.perf_counter()
+            read_runs_streamed(scenario=self, fn=path, keep_repetitions=self.keep_repetitions)
+            seconds = time.perf_counter() - start
+            self.logger.debug("Read %s in %.2f sec" % (path, seconds))
+        else:
+            seconds = self._read(fn, read_func)
+        for attr in attrs + (["run_cube"] if fn == "algorithm_runs.arff" else []):
+            self.__dict__.setdefault(attr, None)
+        self._loaded += ((fn, seconds),)
+
+    def get_loaded_components(self) -> list:
+        '''
+            files of the scenario read so far (in the order of reading)
+        '''
+        return [fn for fn, _ in self._loaded]
+
+    def get_load_times(self) -> OrderedDict:
+        '''
+            file name -> seconds to read it
+        '''
+        return OrderedDict(self._loaded)
+
+    def get_split(self, indx=1):
+        # the split copies all data frames of the scenario
+        self.load()
+        return super(LazyScenario, self).get_split(indx=indx)
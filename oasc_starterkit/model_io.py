@@ -0,0 +1,163 @@
+# Author: Marius Lindauer
+# License: BSD
+# Persistence of fitted selectors
+#
+# A model artifact is a single .npz file:
+# all numpy arrays of the selector state are stored as arrays,
+# everything else (selector class, state, algorithms, cutoff, performance type, ...)
+# as JSON in the entry "meta".
+# Loading does not require the training data.
+
+import os
+import json
+import time
+import importlib
+
+import numpy as np
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+# version of the artifact format
+ARTIFACT_VERSION = 1
+
+# selectors that can be restored (class name -> module)
+KNOWN_SELECTORS = {"SingleBest": "oasc_starterkit.single_best",
+                   "RegressionSelector": "oasc_starterkit.regression_selector",
+                   "ScheduleBuilder": "oasc_starterkit.schedule_builder"}
+
+
+# selectors of the command line tools (name -> class name in KNOWN_SELECTORS)
+SELECTORS = {"single_best": "SingleBest",
+             "regression": "RegressionSelector",
+             "schedule": "ScheduleBuilder"}
+
+# selector of the final algorithm of "schedule" (see create_named_selector)
+SCHEDULE_FINAL_SELECTOR = "regression"
+
+
+def get_selector_class(name: str):
+    '''
+        returns the selector class of a class name in KNOWN_SELECTORS
+        (imported on demand; the selector modules import this module)
+    '''
+    if name not in KNOWN_SELECTORS:
+        raise ValueError("Unknown selector class %s" % (name))
+    module = importlib.import_module(KNOWN_SELECTORS[name])
+    return getattr(module, name)
+
+
+def create_selector(name: str):
+    '''
+        returns a new (unfitted) selector of a class in KNOWN_SELECTORS
+    '''
+    return get_selector_class(name)()
+
+
+def create_named_selector(name: str):
+    '''
+        returns a new (unfitted) selector of a name in SELECTORS
+        with the default arguments of the command line tools
+        ("schedule" selects the final algorithm with SCHEDULE_FINAL_SELECTOR)
+    '''
+    if name not in SELECTORS:
+        raise ValueError("Unknown selector %s (choose from %s)" % (name, sorted(SELECTORS)))
+    if name == "schedule":
+        return get_selector_class(SELECTORS[name])(selector=create_named_selector(SCHEDULE_FINAL_SELECTOR))
+    return create_selector(SELECTORS[name])
+
+
+def _pack(obj, arrays: dict):
+    '''
+        replaces numpy arrays in a nested state by references into arrays
+    '''
+    if isinstance(obj, np.ndarray):
+        key = "array_%d" % (len(arrays))
+        arrays[key] = obj
+        return {"__array__": key}
+    if isinstance(obj, dict):
+        return dict((key, _pack(value, arrays)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return [_pack(value, arrays) for value in obj]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def _unpack(obj, arrays):
+    if isinstance(obj, dict):
+        if set(obj) == {"__array__"}:
+            return arrays[obj["__array__"]]
+        return dict((key, _unpack(value, arrays)) for key, value in obj.items())
+    if isinstance(obj, list):
+        return [_unpack(value, arrays) for value in obj]
+    return obj
+
+
+def save_model(selector, scenario, fn: str):
+    '''
+        saves a fitted selector
+
+        Arguments
+        ---------
+        selector: SingleBest
+            fitted selector (with get_state)
+        scenario: ASlibScenario
+            training scenario
+        fn: str
+            file name of the artifact (.npz)
+    '''
+    arrays = {}
+    meta = {"version": ARTIFACT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "selector_class": type(selector).__name__,
+            "state": _pack(selector.get_state(), arrays),
+            "scenario_id": scenario.scenario,
+            "algorithms": list(scenario.algorithms),
+            "algorithm_cutoff_time": scenario.algorithm_cutoff_time,
+            "performance_type": scenario.performance_type[0],
+            "maximize": bool(scenario.maximize[0]),
+            "features": list(selector.get_feature_names()),
+            "n_train_instances": len(scenario.instances)}
+    # np.savez appends .npz otherwise
+    with open(fn, "wb") as fp:
+        np.savez_compressed(fp, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_model(fn: str):
+    '''
+        loads a selector saved with save_model
+
+        Returns
+        -------
+        selector: SingleBest
+            fitted selector
+        meta: dict
+            information about the training scenario
+            (algorithms, algorithm_cutoff_time, performance_type, ...)
+    '''
+    if not os.path.isfile(fn):
+        raise FileNotFoundError("Model file %s not found" % (fn))
+    with np.load(fn, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != ARTIFACT_VERSION:
+            raise ValueError("Model %s has version %s; expected version %d" %
+                             (fn, meta.get("version"), ARTIFACT_VERSION))
+        arrays = dict((key, data[key]) for key in data.files if key != "meta")
+
+    selector = create_selector(meta["selector_class"])
+    selector.set_state(_unpack(meta.pop("state"), arrays))
+    return selector, meta
+
+
+def scenario_from_meta(meta: dict) -> ASlibScenario:
+    '''
+        returns a scenario without data but with the description
+        required to build schedules (performance type, cutoff, algorithms)
+    '''
+    scenario = ASlibScenario()
+    scenario.scenario = meta["scenario_id"]
+    scenario.algorithms = list(meta["algorithms"])
+    scenario.algorithm_cutoff_time = meta["algorithm_cutoff_time"]
+    scenario.performance_type = [meta["performance_type"]]
+    scenario.maximize = [meta["maximize"]]
+    return scenario
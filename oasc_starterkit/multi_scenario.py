@@ -0,0 +1,308 @@
+# Author: Marius Lindauer
+# License: BSD
+# Training and prediction on many scenarios
+#
+# All pairs <name>-TRAIN/<name>-TEST in a directory
+# (e.g., example_files/SAT11-INDU-TRAIN and example_files/SAT11-INDU-TEST)
+# are processed by a pool of worker processes:
+# each worker reads, fits and predicts one scenario
+# and writes the results to its own file (see --out_fn).
+# A failing scenario is reported without stopping the other ones
+# (also if its worker process dies, e.g., killed for using too much memory).
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import itertools
+import traceback
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+from oasc_starterkit.instrumentation import Profiler
+from oasc_starterkit.model_io import SELECTORS, create_named_selector
+
+STAGES = ["read_train", "fit", "save_model", "read_test", "predict"]
+
+RESULT_FIELDS = ["scenario", "out_fn", "model_fn", "n_train", "n_test", "seconds"] + \
+    ["%s_sec" % (stage) for stage in STAGES] + ["error"]
+
+
+def find_scenarios(dn: str, train_suffix: str = "-TRAIN", test_suffix: str = "-TEST") -> list:
+    '''
+        finds all pairs of training and test scenarios in dn
+
+        Returns
+        -------
+        list of dicts with keys scenario, train_as and test_as (sorted by scenario)
+    '''
+    entries = []
+    for name in sorted(os.listdir(dn)):
+        if not name.endswith(train_suffix):
+            continue
+        scenario = name[:-len(train_suffix)]
+        train_as = os.path.join(dn, name)
+        test_as = os.path.join(dn, scenario + test_suffix)
+        if not os.path.isdir(train_as):
+            continue
+        if not os.path.isdir(test_as):
+            logging.getLogger("MultiScenario").warning("Found no test scenario for %s" % (train_as))
+            continue
+        entries.append({"scenario": scenario, "train_as": train_as, "test_as": test_as})
+    return entries
+
+
+def _new_row(job: dict) -> dict:
+    '''
+        result row of a job without results
+    '''
+    row = OrderedDict((field, None) for field in RESULT_FIELDS)
+    row["scenario"] = job["scenario"]
+    row["out_fn"] = job["out_fn"]
+    row["model_fn"] = job["model_fn"]
+    return row
+
+
+def _run_scenario(job: dict) -> dict:
+    '''
+        reads, fits and predicts one scenario (in a worker process)
+
+        Returns
+        -------
+        dict with RESULT_FIELDS
+    '''
+    row = _new_row(job)
+
+    start = time.perf_counter()
+    selector = create_named_selector(job["selector"])
+    selector.profiler = Profiler(trace_memory=False)
+    try:
+        for fn in [job["out_fn"], job["model_fn"]]:
+            if fn and os.path.dirname(fn):
+                os.makedirs(os.path.dirname(fn), exist_ok=True)
+        selector.main(train_scenario_dn=job["train_as"],
+                      test_scenario_dn=job["test_as"],
+                      cache_dn=job["cache_dn"],
+                      use_cache=job["use_cache"],
+                      out_fn=job["out_fn"],
+                      model_fn=job["model_fn"])
+    except (Exception, SystemExit) as err:
+        logging.getLogger("MultiScenario").debug(traceback.format_exc())
+        row["error"] = "%s: %s" % (err.__class__.__name__, err)
+    row["seconds"] = time.perf_counter() - start
+
+    for record in selector.profiler.stages:
+        if record["name"] in STAGES and "seconds" in record:
+            row["%s_sec" % (record["name"])] = record["seconds"]
+        if record["name"] == "read_train":
+            row["n_train"] = record.get("n_instances")
+        elif record["name"] == "read_test":
+            row["n_test"] = record.get("n_instances")
+    return row
+
+
+class MultiScenarioRunner(object):
+
+    def __init__(self, selector: str = "single_best", n_jobs: int = None,
+                 out_fn: str = "results/{scenario}/results.json", model_fn: str = None,
+                 cache_dn: str = None, use_cache: bool = True):
+        '''
+            Arguments
+            ---------
+            selector: str
+                name of the selector (key of SELECTORS)
+            n_jobs: int
+                number of worker processes (default: number of cores)
+            out_fn: str
+                results file of each scenario; "{scenario}" is replaced
+                by the scenario name (e.g., SAT11-INDU)
+            model_fn: str
+                if given, the fitted models are saved to this file
+                ("{scenario}" is replaced as in out_fn)
+            cache_dn: str
+                directory of scenario cache (see scenario_cache.py)
+            use_cache: bool
+                use the scenario cache
+        '''
+        if selector not in SELECTORS:
+            raise ValueError("Unknown selector %s (choose from %s)" % (selector, sorted(SELECTORS)))
+        if "{scenario}" not in out_fn:
+            raise ValueError("out_fn has to contain {scenario} (otherwise all scenarios write to the same file)")
+        if model_fn is not None and "{scenario}" not in model_fn:
+            raise ValueError("model_fn has to contain {scenario}")
+        self.selector = selector
+        self.n_jobs = n_jobs
+        self.out_fn = out_fn
+        self.model_fn = model_fn
+        self.cache_dn = cache_dn
+        self.use_cache = use_cache
+        self.logger = logging.getLogger("MultiScenario")
+
+    def run(self, entries: list):
+        '''
+            processes all scenarios
+
+            Arguments
+            ---------
+            entries: list
+                see find_scenarios
+
+            Returns
+            -------
+            rows: list
+                dicts with RESULT_FIELDS (in the order of entries)
+            summary: dict
+                total time and throughput
+        '''
+        jobs = [{"scenario": entry["scenario"],
+                 "train_as": entry["train_as"],
+                 "test_as": entry["test_as"],
+                 "out_fn": self.out_fn.format(scenario=entry["scenario"]),
+                 "model_fn": self.model_fn.format(scenario=entry["scenario"]) if self.model_fn else None,
+                 "selector": self.selector,
+                 "cache_dn": self.cache_dn,
+                 "use_cache": self.use_cache} for entry in entries]
+        out_fns = [job["out_fn"] for job in jobs]
+        if len(set(out_fns)) < len(out_fns):
+            raise ValueError("Several scenarios would write to the same results file")
+
+        start = time.perf_counter()
+        rows = {}
+        n_jobs = min(self.n_jobs or multiprocessing.cpu_count(), len(jobs))
+        results = self._run_workers(jobs, n_jobs=n_jobs) if n_jobs > 1 else map(_run_scenario, jobs)
+        for row in results:
+            rows[row["scenario"]] = row
+            self._log_row(row)
+        seconds = time.perf_counter() - start
+
+        rows = [rows[job["scenario"]] for job in jobs]
+        summary = self.get_summary(rows=rows, seconds=seconds, n_jobs=n_jobs)
+        self.show(summary)
+        return rows, summary
+
+    def _run_workers(self, jobs: list, n_jobs: int):
+        '''
+            runs each job in its own worker process (at most n_jobs at once);
+            a new process per scenario releases the memory of the previous scenario,
+            and a dead worker process only fails its own scenario
+            (instead of blocking or breaking a shared pool)
+
+            Returns
+            -------
+            generator of dicts with RESULT_FIELDS (in the order of completion)
+        '''
+        pending = iter(jobs)
+        running = {}
+
+        def submit(job):
+            executor = ProcessPoolExecutor(max_workers=1)
+            running[executor.submit(_run_scenario, job)] = (job, executor, time.perf_counter())
+
+        for job in itertools.islice(pending, n_jobs):
+            submit(job)
+        try:
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, executor, start = running.pop(future)
+                    try:
+                        row = future.result()
+                    except Exception as err:
+                        # e.g., BrokenProcessPool if the worker process died
+                        row = _new_row(job)
+                        row["error"] = "%s: %s" % (err.__class__.__name__, err)
+                        row["seconds"] = time.perf_counter() - start
+                    executor.shutdown()
+                    next_job = next(pending, None)
+                    if next_job is not None:
+                        submit(next_job)
+                    yield row
+        finally:
+            for _, executor, _ in running.values():
+                executor.shutdown(wait=False)
+
+    def _log_row(self, row: dict):
+        if row["error"]:
+            self.logger.error("%s failed: %s" % (row["scenario"], row["error"]))
+        else:
+            self.logger.info("%s: %d training and %d test instances in %.2f sec -> %s" %
+                             (row["scenario"], row["n_train"] or 0, row["n_test"] or 0,
+                              row["seconds"], row["out_fn"]))
+
+    def get_summary(self, rows: list, seconds: float, n_jobs: int) -> dict:
+        '''
+            total time and throughput of all scenarios
+        '''
+        done = [row for row in rows if not row["error"]]
+        n_instances = sum((row["n_train"] or 0) + (row["n_test"] or 0) for row in done)
+        return {"scenarios": len(rows),
+                "failed": len(rows) - len(done),
+                "n_jobs": n_jobs,
+                "seconds": seconds,
+                "worker_seconds": sum(row["seconds"] for row in rows),
+                "instances": n_instances,
+                "scenarios_per_sec": len(done) / seconds if seconds > 0 else 0.0,
+                "instances_per_sec": n_instances / seconds if seconds > 0 else 0.0}
+
+    def show(self, summary: dict):
+        self.logger.info("Processed %d scenarios (%d failed) with %d workers in %.2f sec "
+                         "(%.2f sec in the workers)" % (summary["scenarios"], summary["failed"], summary["n_jobs"],
+                                                        summary["seconds"], summary["worker_seconds"]))
+        self.logger.info("Throughput: %.3f scenarios/sec, %.1f instances/sec" %
+                         (summary["scenarios_per_sec"], summary["instances_per_sec"]))
+
+
+def write_report(rows: list, summary: dict, fn: str):
+    '''
+        writes the rows as CSV or the rows and the summary as JSON (if fn ends with .json)
+    '''
+    with open(fn, "w") as fp:
+        if fn.endswith(".json"):
+            json.dump({"summary": summary, "scenarios": rows}, fp, indent=2)
+        else:
+            writer = csv.DictWriter(fp, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--scenarios_dir", help="Directory with pairs of scenarios <name>-TRAIN and <name>-TEST in ASlib format")
+    parser.add_argument("--scenarios", nargs="*", default=None, help="Only process these scenarios (names without -TRAIN/-TEST)")
+    parser.add_argument("--selector", default="single_best", choices=sorted(SELECTORS), help="Algorithm selector")
+    parser.add_argument("--n_jobs", type=int, default=None, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("--out_fn", default="results/{scenario}/results.json", help="Results file of each scenario ({scenario} is replaced by its name)")
+    parser.add_argument("--save_model", default=None, help="Save the fitted models to this file ({scenario} is replaced by its name)")
+    parser.add_argument("--report", default=None, help="Write per-scenario times and errors to this file (.csv or .json)")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+    parser.add_argument("--verbose", default="INFO", choices=["DEBUG", "INFO", "WARNING"], help="Logging level")
+
+    args_ = parser.parse_args()
+
+    logging.basicConfig(level=args_.verbose)
+    # one line per scenario instead of the log messages of each selector
+    if args_.verbose != "DEBUG":
+        for name in ["SingleBest", "RegressionSelector", "ScheduleBuilder"]:
+            logging.getLogger(name).setLevel("WARNING")
+
+    entries = find_scenarios(args_.scenarios_dir)
+    if args_.scenarios:
+        unknown = set(args_.scenarios).difference(entry["scenario"] for entry in entries)
+        if unknown:
+            parser.error("Unknown scenarios: %s" % (", ".join(sorted(unknown))))
+        entries = [entry for entry in entries if entry["scenario"] in args_.scenarios]
+
+    runner = MultiScenarioRunner(selector=args_.selector, n_jobs=args_.n_jobs,
+                                 out_fn=args_.out_fn, model_fn=args_.save_model,
+                                 cache_dn=args_.cache_dir, use_cache=not args_.no_cache)
+    rows, summary = runner.run(entries=entries)
+    if args_.report:
+        write_report(rows=rows, summary=summary, fn=args_.report)
+    if summary["failed"]:
+        sys.exit(1)
@@ -0,0 +1,79 @@
+# Author: Marius Lindauer
+# License: BSD
+# Predictions with a saved model
+#
+# Loads a model saved by
+#   single_best.py / regression_selector.py / schedule_builder.py --save_model model.npz
+# and predicts on a test scenario
+# without reading the training data or fitting again.
+
+import logging
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+from oasc_starterkit.lazy_scenario import LazyScenario
+from oasc_starterkit.model_io import load_model
+from oasc_starterkit.instrumentation import Profiler, NULL_PROFILER
+
+
+def predict(model_fn: str, test_scenario_dn: str, out_fn: str = "results.json",
+            profiler: Profiler = None):
+    '''
+        predicts schedules for all instances of a test scenario
+
+        Arguments
+        ---------
+        model_fn: str
+            model artifact (see model_io.py)
+        test_scenario_dn: str
+            directory name with ASlib scenario test data
+            (performance data is missing)
+        out_fn: str
+            file name of the results file (.json or .jsonl)
+        profiler: Profiler
+            records the stages (see instrumentation.py)
+
+        Returns
+        -------
+        see SingleBest.predict
+    '''
+    logger = logging.getLogger("Predict")
+    profiler = profiler if profiler is not None else NULL_PROFILER
+
+    with profiler.stage("load_model"):
+        selector, meta = load_model(model_fn)
+    logger.info("Loaded %s fitted on %s (%d instances)" % (meta["selector_class"], meta["scenario_id"],
+                                                            meta["n_train_instances"]))
+
+    with profiler.stage("read_test") as stage:
+        scenario = LazyScenario(dn=test_scenario_dn)
+        stage["n_instances"] = scenario.feature_data.shape[0]
+
+    unknown = set(meta["algorithms"]).difference(scenario.algorithms)
+    if unknown:
+        raise ValueError("Algorithms of the model are not part of the test scenario: %s" % (sorted(unknown)))
+    if scenario.performance_type[0] != meta["performance_type"]:
+        raise ValueError("Model was fitted on a %s scenario but the test scenario is of type %s" %
+                         (meta["performance_type"], scenario.performance_type[0]))
+
+    selector.profiler = profiler
+    with profiler.stage("predict", n_instances=scenario.feature_data.shape[0]):
+        return selector.predict(scenario=scenario, out_fn=out_fn)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--model", help="Model file saved with --save_model")
+    parser.add_argument("--test_as", help="Directory with test data in ASlib format")
+    parser.add_argument("--out_fn", default="results.json", help="Results file (.json or .jsonl with one instance per line)")
+    parser.add_argument("--profile", default=None, help="Write timing and memory report of all stages to this JSON file")
+
+    args_ = parser.parse_args()
+
+    logging.basicConfig(level="INFO")
+
+    profiler = Profiler() if args_.profile else NULL_PROFILER
+    predict(model_fn=args_.model, test_scenario_dn=args_.test_as, out_fn=args_.out_fn, profiler=profiler)
+    if args_.profile:
+        profiler.show()
+        profiler.write(args_.profile)
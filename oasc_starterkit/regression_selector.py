@@ -0,0 +1,432 @@
+# Author: Marius Lindauer
+# License: BSD
+# Feature-based algorithm selector
+# (in the spirit of the runtime regression of SATzilla/AutoFolio)
+#
+# For each algorithm, a ridge regression model predicts the
+# performance (log10 PAR10 for runtime) from the instance features;
+# the algorithm with the best predicted performance is selected.
+# All algorithms are fitted with a single linear solve and
+# all test instances are predicted with a single matrix product.
+#
+# The model is fitted from additive sufficient statistics
+# (sums of products of the features, missing-value masks and targets),
+# such that mean imputation and standardization of the features
+# can be derived without keeping the training data.
+
+import logging
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+import numpy as np
+import pandas as pd
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.runstatus import get_feature_status
+
+# lower bound of runtimes before the log transformation
+MIN_RUNTIME = 0.005
+
+
+def order_feature_steps(feature_group_dict: dict, steps: list) -> list:
+    '''
+        adds all feature steps required by steps
+        and orders them such that each step comes after its requirements
+
+        Arguments
+        ---------
+        feature_group_dict: dict
+            feature step description of the scenario (description.txt)
+        steps: list
+            feature step names
+
+        Returns
+        -------
+        list of feature step names
+    '''
+    ordered = []
+
+    def add(step, path):
+        if step in ordered:
+            return
+        if step in path:
+            raise ValueError("Cyclic requirements of feature step %s" % (step))
+        for req in feature_group_dict[step].get("requires") or []:
+            add(req, path + [step])
+        ordered.append(step)
+
+    for step in steps:
+        add(step, [])
+    return ordered
+
+
+class RidgeStatistics(object):
+
+    def __init__(self, n_features: int, n_targets: int, shift: np.ndarray = None):
+        '''
+            sufficient statistics of a multi-target ridge regression
+            with mean imputation of missing features
+
+            with X0 the features (missing values set to 0),
+            U the mask of missing values and Y the targets,
+            the imputed features are X0 + U * mu
+            and all required products can be derived from
+            X0'X0, X0'U, U'U, X0'Y, U'Y and column sums
+
+            Arguments
+            ---------
+            n_features: int
+                number of features
+            n_targets: int
+                number of targets (algorithms)
+            shift: np.ndarray
+                subtracted from all features before the statistics are computed
+                (avoids cancellation for features with large values);
+                set by the first update if None
+        '''
+        self.n = 0
+        self.shift = shift
+        self.sum_x = np.zeros(n_features)
+        self.count_x = np.zeros(n_features)
+        self.xx = np.zeros((n_features, n_features))
+        self.xu = np.zeros((n_features, n_features))
+        self.uu = np.zeros((n_features, n_features))
+        self.xy = np.zeros((n_features, n_targets))
+        self.uy = np.zeros((n_features, n_targets))
+        self.sum_y = np.zeros(n_targets)
+
+    def update(self, X: np.ndarray, Y: np.ndarray):
+        '''
+            adds instances to the statistics
+
+            Arguments
+            ---------
+            X: np.ndarray
+                features (instances x features); NaN if missing
+            Y: np.ndarray
+                targets (instances x algorithms)
+        '''
+        X = np.asarray(X, dtype=np.float64)
+        Y = np.asarray(Y, dtype=np.float64)
+        if self.shift is None:
+            with np.errstate(invalid="ignore"):
+                counts = (~np.isnan(X)).sum(axis=0)
+                self.shift = np.where(counts > 0, np.nansum(X, axis=0) / np.maximum(counts, 1), 0.0)
+
+        observed = ~np.isnan(X)
+        X0 = np.where(observed, X - self.shift, 0.0)
+        U = (~observed).astype(np.float64)
+
+        self.n += X.shape[0]
+        self.sum_x += X0.sum(axis=0)
+        self.count_x += observed.sum(axis=0)
+        self.xx += X0.T @ X0
+        self.xu += X0.T @ U
+        self.uu += U.T @ U
+        self.xy += X0.T @ Y
+        self.uy += U.T @ Y
+        self.sum_y += Y.sum(axis=0)
+
+    def solve(self, alpha: float) -> dict:
+        '''
+            fits the ridge regression
+            (standardized features, unpenalized intercept)
+
+            Arguments
+            ---------
+            alpha: float
+                regularization of the coefficients
+
+            Returns
+            -------
+            dict with the model arrays (see RegressionSelector.predict_performance)
+        '''
+        n = self.n
+        if n == 0:
+            raise ValueError("No training instances")
+
+        # imputed values (in shifted space)
+        mu = np.where(self.count_x > 0, self.sum_x / np.maximum(self.count_x, 1), 0.0)
+
+        xu_mu = self.xu * mu[np.newaxis, :]
+        gram = self.xx + xu_mu + xu_mu.T + self.uu * np.outer(mu, mu)
+        xy = self.xy + mu[:, np.newaxis] * self.uy
+
+        mean = (self.sum_x + mu * (n - self.count_x)) / n
+        y_mean = self.sum_y / n
+
+        cov = gram - n * np.outer(mean, mean)
+        cov_y = xy - n * np.outer(mean, y_mean)
+
+        scale = np.sqrt(np.maximum(np.diag(cov), 0) / n)
+        scale[scale <= 1e-12] = 1.0
+
+        cov = cov / np.outer(scale, scale)
+        cov_y = cov_y / scale[:, np.newaxis]
+        coef = np.linalg.solve(cov + alpha * np.eye(cov.shape[0]), cov_y)
+
+        return {"shift": self.shift,
+                "imputation": mu,
+                "mean": mean,
+                "scale": scale,
+                "coef": coef,
+                "intercept": y_mean}
+
+
+class RegressionSelector(SingleBest):
+
+    def __init__(self, alpha: float = 1.0, feature_steps: list = None):
+        '''
+            Arguments
+            ---------
+            alpha: float
+                regularization of the ridge regression
+            feature_steps: list
+                feature steps whose features are used
+                (default: all feature steps of the scenario)
+        '''
+        super().__init__()
+        self.alpha = alpha
+        self.feature_steps = feature_steps
+
+        self.logger = logging.getLogger("RegressionSelector")
+
+        # fitted state
+        self.algorithms = None
+        self.features = None
+        self.step_features = None
+        self.schedule_steps = None
+        self.performance_type = None
+        self.model = None
+
+        # training statistics for partial_fit (not part of the saved state)
+        self.stats = None
+        self.train_instances = None
+        self.perf_sum = None
+        self.perf_count = None
+
+    def fit(self, scenario: ASlibScenario, X: np.ndarray = None):
+        '''
+            fits one regression model per algorithm
+
+            Arguments
+            ---------
+            scenario: ASlibScenario
+                scenario with training data
+            X: np.ndarray
+                feature matrix of the training instances
+                (rows as scenario.performance_data, columns as set_features);
+                computed with get_features if not given
+        '''
+        # single best is used as fallback for instances without any features
+        # (see select_from_features)
+        perf_data = scenario.performance_data
+        self.single_best = perf_data.mean(axis=0).idxmin()
+
+        self.algorithms = list(perf_data.columns)
+        self.performance_type = scenario.performance_type[0]
+
+        self.set_features(scenario=scenario)
+        if X is None:
+            X = self.get_features(scenario=scenario, instances=perf_data.index)
+        stats = RidgeStatistics(n_features=X.shape[1], n_targets=len(self.algorithms))
+        stats.update(X, self.get_targets(perf_data.values))
+        self.model = stats.solve(alpha=self.alpha)
+
+        self.stats = stats
+        self.train_instances = set(perf_data.index)
+        self.perf_sum = np.nansum(perf_data.values, axis=0)
+        self.perf_count = (~np.isnan(perf_data.values)).sum(axis=0)
+
+        self.logger.debug("Fitted %d algorithms on %d instances and %d features" %
+                          (len(self.algorithms), X.shape[0], X.shape[1]))
+
+        return stats
+
+    def set_features(self, scenario: ASlibScenario):
+        '''
+            sets the features of the used feature steps
+            (and the feature steps of the schedules) of scenario
+        '''
+        steps = self.feature_steps if self.feature_steps is not None else scenario.feature_steps
+        self.schedule_steps = order_feature_steps(scenario.feature_group_dict, steps)
+        self.step_features = dict((step, [f for f in scenario.feature_group_dict[step]["provides"]
+                                          if f in scenario.feature_data.columns])
+                                  for step in steps)
+        used = set(f for step in steps for f in self.step_features[step])
+        self.features = [f for f in scenario.feature_data.columns if f in used]
+
+    def partial_fit(self, scenario: ASlibScenario):
+        '''
+            adds new training instances to a fitted selector
+            (same model as fit on all instances, up to rounding);
+            the regression statistics are updated with the new instances only
+
+            Arguments
+            ---------
+            scenario: ASlibScenario
+                scenario with the performance and feature data of the new instances
+                (e.g., RunStatistics.get_run_matrix(new_instances).apply_to(scenario))
+        '''
+        if self.stats is None:
+            raise ValueError("partial_fit requires a selector fitted with fit")
+        perf_data = scenario.performance_data
+        known = [inst for inst in perf_data.index if inst in self.train_instances]
+        if known:
+            raise ValueError("%d instances (e.g., %s) were already used for fitting; "
+                             "changed runs of known instances require fit" % (len(known), known[0]))
+        unknown_algos = [algo for algo in perf_data.columns if algo not in self.algorithms]
+        if unknown_algos:
+            raise ValueError("New algorithms (%s) require fit" % (", ".join(unknown_algos)))
+
+        perf = perf_data.reindex(columns=self.algorithms).values.astype(np.float64)
+        X = self.get_features(scenario=scenario, instances=perf_data.index)
+        self.stats.update(X, self.get_targets(perf))
+        self.model = self.stats.solve(alpha=self.alpha)
+
+        self.train_instances.update(perf_data.index)
+        self.perf_sum += np.nansum(perf, axis=0)
+        self.perf_count += (~np.isnan(perf)).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average = self.perf_sum / self.perf_count
+        self.single_best = pd.Series(average, index=self.algorithms).idxmin()
+
+        self.logger.debug("Added %d instances (%d in total)" % (perf.shape[0], self.stats.n))
+
+    def get_targets(self, perf: np.ndarray) -> np.ndarray:
+        '''
+            regression targets of a performance matrix
+            (log10 for runtime)
+        '''
+        if self.performance_type == "runtime":
+            return np.log10(np.maximum(perf, MIN_RUNTIME))
+        return perf
+
+    def get_features(self, scenario: ASlibScenario, instances=None) -> np.ndarray:
+        '''
+            returns the feature matrix of scenario;
+            features of feature steps without status "ok"
+            in feature_runstatus are NaN
+
+            Arguments
+            ---------
+            scenario: ASlibScenario
+                scenario with feature_data (and feature_runstatus_data)
+            instances: list
+                rows of the matrix (default: scenario.feature_data.index)
+
+            Returns
+            -------
+            np.ndarray (instances x features)
+        '''
+        if instances is None:
+            instances = scenario.feature_data.index
+        X = scenario.feature_data.reindex(index=instances, columns=self.features).values.astype(np.float64)
+
+        status = get_feature_status(scenario)
+        if status is not None:
+            steps = list(self.step_features)
+            not_ok = ~status.reindex(instances, steps).ok
+            col_map = dict((f, pos) for pos, f in enumerate(self.features))
+            for s_idx, step in enumerate(steps):
+                rows = not_ok[:, s_idx]
+                if rows.any():
+                    cols = [col_map[f] for f in self.step_features[step]]
+                    X[np.ix_(rows, cols)] = np.nan
+        return X
+
+    def predict_performance(self, X: np.ndarray) -> np.ndarray:
+        '''
+            predicts the performance of all algorithms
+
+            Arguments
+            ---------
+            X: np.ndarray
+                features (instances x features); NaN if missing
+
+            Returns
+            -------
+            np.ndarray (instances x algorithms)
+                in the target space of the regression (see get_targets)
+        '''
+        model = self.model
+        X = np.asarray(X, dtype=np.float64) - model["shift"]
+        X = np.where(np.isnan(X), model["imputation"], X)
+        Z = (X - model["mean"]) / model["scale"]
+        return Z @ model["coef"] + model["intercept"]
+
+    def select_from_features(self, X: np.ndarray) -> np.ndarray:
+        '''
+            selects the algorithm with the best predicted performance;
+            the single best algorithm for instances without any features
+            (e.g., all feature steps failed)
+
+            Returns
+            -------
+            np.ndarray of algorithm names
+        '''
+        X = np.asarray(X, dtype=np.float64)
+        pred = self.predict_performance(X)
+        selection = np.asarray(self.algorithms, dtype=object)[pred.argmin(axis=1)]
+        if X.shape[1] > 0:
+            selection[np.isnan(X).all(axis=1)] = self.single_best
+        return selection
+
+    def select(self, scenario: ASlibScenario):
+        return self.select_from_features(self.get_features(scenario=scenario))
+
+    def get_feature_names(self):
+        return list(self.features)
+
+    def get_schedule(self, algo: str, scenario: ASlibScenario):
+        '''
+            computes the feature steps (and pays their costs)
+            before running the selected algorithm
+        '''
+        return list(self.schedule_steps) + super().get_schedule(algo=algo, scenario=scenario)
+
+    def get_state(self):
+        state = super().get_state()
+        state.update({"alpha": self.alpha,
+                      "algorithms": self.algorithms,
+                      "features": self.features,
+                      "step_features": self.step_features,
+                      "schedule_steps": self.schedule_steps,
+                      "performance_type": self.performance_type,
+                      "model": self.model})
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self.alpha = state["alpha"]
+        self.algorithms = list(state["algorithms"])
+        self.features = list(state["features"])
+        self.step_features = dict((step, list(features)) for step, features in state["step_features"].items())
+        self.feature_steps = list(self.step_features)
+        self.schedule_steps = list(state["schedule_steps"])
+        self.performance_type = state["performance_type"]
+        self.model = dict((key, np.asarray(value, dtype=np.float64)) for key, value in state["model"].items())
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--train_as", help="Directory with training data in ASlib format")
+    parser.add_argument("--test_as", help="Directory with test data in ASlib format")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Regularization of the ridge regression")
+    parser.add_argument("--feature_steps", nargs="*", default=None, help="Feature steps to use (default: all)")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+    parser.add_argument("--out_fn", default="results.json", help="Results file (.json or .jsonl with one instance per line)")
+    parser.add_argument("--save_model", default=None, help="Save the fitted model to this file (.npz; see predict.py)")
+
+    args_ = parser.parse_args()
+
+    selector = RegressionSelector(alpha=args_.alpha, feature_steps=args_.feature_steps)
+    selector.main(train_scenario_dn=args_.train_as,
+                  test_scenario_dn=args_.test_as,
+                  cache_dn=args_.cache_dir,
+                  use_cache=not args_.no_cache,
+                  out_fn=args_.out_fn,
+                  model_fn=args_.save_model)
@@ -0,0 +1,126 @@
+# Author: Marius Lindauer
+# License: BSD
+# Reading and writing of result files
+#
+# Two formats are supported:
+#   *.json  -- one JSON dictionary {instance name -> schedule} (competition format)
+#   *.jsonl -- JSON Lines with one {instance name: schedule} dictionary per line;
+#              can be written and read instance by instance;
+#              a truncated last line (interrupted writer) is skipped
+
+import json
+import logging
+import itertools
+
+
+def is_streamed(fn: str) -> bool:
+    '''
+        True if fn is a JSON Lines result file
+    '''
+    return fn.endswith(".jsonl")
+
+
+class ResultsWriter(object):
+
+    def __init__(self, fn: str):
+        '''
+            writes predictions instance by instance
+
+            for *.jsonl, each prediction is written immediately;
+            for *.json, the predictions are collected and
+            dumped as one dictionary on close
+
+            Arguments
+            ---------
+            fn: str
+                file name of result file
+        '''
+        self.fn = fn
+        self.streamed = is_streamed(fn)
+        self.predictions = {}
+        self.fp = open(fn, "w")
+
+    def write(self, inst: str, schedule: list):
+        if self.streamed:
+            self.fp.write(json.dumps({inst: schedule}))
+            self.fp.write("\n")
+        else:
+            self.predictions[inst] = schedule
+
+    def close(self):
+        if not self.streamed:
+            json.dump(self.predictions, fp=self.fp, indent=2)
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_results(fn: str):
+    '''
+        iterates over the predictions of a result file
+
+        for *.jsonl files, an instance that occurs more than once
+        is only returned the first time and an incomplete last line
+        (without line break) is skipped; both are logged as warnings
+
+        Returns
+        -------
+        generator of (instance name, schedule)
+    '''
+    if not is_streamed(fn):
+        with open(fn) as fp:
+            predictions = json.load(fp)
+        for item in predictions.items():
+            yield item
+        return
+
+    logger = logging.getLogger("ResultsIO")
+    seen = set()
+    with open(fn) as fp:
+        for line in fp:
+            if not line.strip():
+                continue
+            try:
+                predictions = json.loads(line)
+            except ValueError:
+                if line.endswith("\n"):
+                    raise
+                logger.warning("Skipping truncated last line of %s" % (fn))
+                return
+            for inst, schedule in predictions.items():
+                if inst in seen:
+                    logger.warning("Skipping duplicate prediction for %s in %s" % (inst, fn))
+                    continue
+                seen.add(inst)
+                yield inst, schedule
+
+
+def load_results(fn: str):
+    '''
+        loads a result file
+
+        Returns
+        -------
+        dict {instance name -> schedule} for *.json files;
+        generator of (instance name, schedule) for *.jsonl files
+    '''
+    if is_streamed(fn):
+        return iter_results(fn)
+    with open(fn) as fp:
+        return json.load(fp)
+
+
+def iter_chunks(items, chunk_size: int):
+    '''
+        splits an iterable into lists of at most chunk_size elements
+    '''
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
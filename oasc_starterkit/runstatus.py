@@ -0,0 +1,207 @@
+# Author: Marius Lindauer
+# License: BSD
+# Compact encoding of ASlib run status values
+#
+# algorithm runs and feature steps share one code table;
+# code 0 is reserved for missing entries
+
+import numpy as np
+import pandas as pd
+
+MISSING = 0
+
+# ordered by "severity":
+# if repetitions of a run have different status,
+# the largest code is kept (i.e., "ok" only if all repetitions are "ok")
+STATUS_NAMES = ["ok",
+                "presolved",
+                "timeout",
+                "memout",
+                "not_applicable",
+                "crash",
+                "other",
+                "unknown"]
+
+STATUS_CODES = dict((name, code) for code, name in enumerate(STATUS_NAMES, start=1))
+
+OK = STATUS_CODES["ok"]
+PRESOLVED = STATUS_CODES["presolved"]
+TIMEOUT = STATUS_CODES["timeout"]
+
+
+def encode_status(values) -> np.ndarray:
+    '''
+        encodes an array-like of status strings as uint8 codes
+
+        missing values (None, NaN) get code MISSING;
+        status strings that are not in STATUS_NAMES are encoded as "other"
+    '''
+    values = np.asarray(values, dtype=object)
+    flat = pd.Series(values.ravel())
+    codes = flat.map(STATUS_CODES)
+    codes[codes.isna() & flat.notna()] = STATUS_CODES["other"]
+    return codes.fillna(MISSING).values.astype(np.uint8).reshape(values.shape)
+
+
+def decode_status(codes: np.ndarray) -> np.ndarray:
+    '''
+        decodes uint8 codes to an object array of status strings (None if missing)
+    '''
+    names = np.array([None] + STATUS_NAMES, dtype=object)
+    return names[codes]
+
+
+# all status frames use the same categories (in the order of the code table),
+# i.e., the pandas codes of a column are the status codes - 1
+STATUS_DTYPE = pd.CategoricalDtype(categories=STATUS_NAMES)
+
+
+class StatusMatrix(object):
+
+    def __init__(self, codes: np.ndarray, index, columns):
+        '''
+            status codes of a set of runs (instances x algorithms or feature steps)
+            with precomputed boolean masks
+
+            Arguments
+            ---------
+            codes: np.ndarray
+                uint8 status codes (see STATUS_CODES)
+            index: list
+                instance names
+            columns: list
+                algorithm or feature step names
+        '''
+        self.codes = codes
+        self.index = pd.Index(index)
+        self.columns = pd.Index(columns)
+
+        self.ok = codes == OK
+        self.timeout = codes == TIMEOUT
+        self.presolved = codes == PRESOLVED
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame):
+        '''
+            encodes a data frame with status strings (or STATUS_DTYPE columns)
+        '''
+        codes = np.empty(frame.shape, dtype=np.uint8)
+        for pos, col in enumerate(frame.columns):
+            column = frame[col]
+            if isinstance(column.dtype, pd.CategoricalDtype) and list(column.cat.categories) == STATUS_NAMES:
+                codes[:, pos] = column.cat.codes.values + 1
+            else:
+                codes[:, pos] = encode_status(column.values)
+        return cls(codes=codes, index=frame.index, columns=frame.columns)
+
+    def mask(self, name: str) -> np.ndarray:
+        '''
+            boolean mask of runs with status name
+        '''
+        return self.codes == STATUS_CODES[name]
+
+    def reindex(self, index, columns):
+        '''
+            returns a StatusMatrix with the given rows and columns
+            (unknown rows or columns are MISSING)
+        '''
+        if self.index.equals(pd.Index(index)) and self.columns.equals(pd.Index(columns)):
+            return self
+        rows = self.index.get_indexer(index)
+        cols = self.columns.get_indexer(columns)
+        codes = self.codes[rows][:, cols]
+        codes[rows < 0, :] = MISSING
+        codes[:, cols < 0] = MISSING
+        return StatusMatrix(codes=codes, index=index, columns=columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        '''
+            data frame with one STATUS_DTYPE column per algorithm or feature step
+        '''
+        return pd.DataFrame(dict((col, pd.Categorical.from_codes(self.codes[:, pos].astype(np.int8) - 1,
+                                                                 dtype=STATUS_DTYPE))
+                                 for pos, col in enumerate(self.columns)),
+                            index=self.index, columns=self.columns)
+
+
+class ScenarioStatus(object):
+
+    def __init__(self, runs: StatusMatrix, features: StatusMatrix,
+                 runstatus_data: pd.DataFrame, feature_runstatus_data: pd.DataFrame):
+        '''
+            encoded runstatus and feature runstatus of a scenario
+
+            Arguments
+            ---------
+            runs: StatusMatrix
+                status of algorithm runs
+            features: StatusMatrix
+                status of feature steps (None if not available)
+            runstatus_data, feature_runstatus_data: pd.DataFrame
+                the encoded frames; used to detect whether
+                the scenario data was replaced (e.g., by ASlibScenario.get_split)
+        '''
+        self.runs = runs
+        self.features = features
+        self._frames = (runstatus_data, feature_runstatus_data)
+
+        # instances that were not solved by any algorithm
+        self.unsolvable = None if runs is None else ~runs.ok.any(axis=1)
+
+    def describes(self, scenario) -> bool:
+        return self._frames[0] is scenario.runstatus_data and \
+            self._frames[1] is scenario.feature_runstatus_data
+
+    def describes_features(self, scenario) -> bool:
+        return self._frames[1] is scenario.feature_runstatus_data
+
+
+def encode_scenario_status(scenario) -> ScenarioStatus:
+    '''
+        encodes runstatus_data and feature_runstatus_data of an ASlibScenario
+
+        the frames of the scenario are replaced by frames with categorical
+        columns (1 byte per entry instead of one python object),
+        and the encoded status is stored as scenario.status
+
+        Returns
+        -------
+        ScenarioStatus
+    '''
+    runs, features = None, None
+    if scenario.runstatus_data is not None:
+        runs = StatusMatrix.from_frame(scenario.runstatus_data)
+        scenario.runstatus_data = runs.to_frame()
+    if scenario.feature_runstatus_data is not None:
+        features = StatusMatrix.from_frame(scenario.feature_runstatus_data)
+        scenario.feature_runstatus_data = features.to_frame()
+    scenario.status = ScenarioStatus(runs=runs, features=features,
+                                     runstatus_data=scenario.runstatus_data,
+                                     feature_runstatus_data=scenario.feature_runstatus_data)
+    return scenario.status
+
+
+def get_status(scenario) -> ScenarioStatus:
+    '''
+        returns the encoded status of scenario;
+        encodes it if it is missing or outdated
+    '''
+    status = getattr(scenario, "status", None)
+    if status is None or not status.describes(scenario):
+        status = encode_scenario_status(scenario)
+    return status
+
+
+def get_feature_status(scenario) -> StatusMatrix:
+    '''
+        returns the encoded status of the feature steps of scenario
+        (None if not available);
+        in contrast to get_status, the algorithm runs are not accessed
+        (i.e., a LazyScenario does not read them)
+    '''
+    status = getattr(scenario, "status", None)
+    if status is not None and status.describes_features(scenario):
+        return status.features
+    if scenario.feature_runstatus_data is None:
+        return None
+    return StatusMatrix.from_frame(scenario.feature_runstatus_data)
@@ -0,0 +1,412 @@
+# Author: Marius Lindauer
+# License: BSD
+# On-disk cache for parsed ASlib scenarios
+#
+# Parsing the text ARFF files and description.txt is by far the most
+# expensive step of the starter kit. The cache stores all pandas data
+# frames of a parsed ASlibScenario as numpy .npy files (one file per dtype
+# block of columns, string columns as categorical codes) plus an index.json
+# with the file fingerprints and the layout of the frames. All other
+# (small) attributes of the scenario are pickled.
+#
+# The cache is keyed on the scenario files: path, mtime, size and sha1
+# of their content. If only the mtime changed, the content hash decides
+# whether the cache is still valid.
+# By default, the caches are stored in $XDG_CACHE_HOME/oasc_starterkit
+# (~/.cache/oasc_starterkit), i.e., scenario directories are never written.
+
+import os
+import uuid
+import json
+import errno
+import pickle
+import shutil
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.arff_stream import read_scenario_streamed
+from oasc_starterkit.lazy_scenario import LazyScenario
+from oasc_starterkit.runstatus import get_status
+
+CACHE_VERSION = 1
+
+SCENARIO_FILES = ["description.txt",
+                  "algorithm_runs.arff",
+                  "feature_values.arff",
+                  "feature_runstatus.arff",
+                  "feature_costs.arff",
+                  "ground_truth.arff",
+                  "cv.arff"]
+
+# attributes of ASlibScenario that cannot (and need not) be stored
+SKIP_ATTRIBUTES = ["logger", "read_funcs", "status", "baselines"]
+
+
+def default_cache_dn() -> str:
+    '''
+        user cache directory of the starter kit:
+        $XDG_CACHE_HOME/oasc_starterkit (fallback: ~/.cache/oasc_starterkit)
+    '''
+    base_dn = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_dn, "oasc_starterkit")
+
+
+def file_hash(fn: str, block_size: int = 1 << 20) -> str:
+    '''
+        sha1 of file content
+    '''
+    sha = hashlib.sha1()
+    with open(fn, "rb") as fp:
+        for block in iter(lambda: fp.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def scenario_fingerprint(dn: str, previous: dict = None) -> dict:
+    '''
+        fingerprint (mtime, size, sha1) of all ASlib files in a scenario directory
+
+        Arguments
+        ---------
+        dn: str
+            scenario directory
+        previous: dict
+            previous fingerprint; the content hash of files
+            with unchanged mtime and size is taken from it
+
+        Returns
+        -------
+        dict: file name -> {"mtime", "size", "sha1"}
+    '''
+    previous = previous or {}
+    fingerprint = {}
+    for fn in SCENARIO_FILES:
+        path = os.path.join(dn, fn)
+        if not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        entry = {"mtime": stat.st_mtime, "size": stat.st_size}
+        old = previous.get(fn)
+        if old and old["mtime"] == entry["mtime"] and old["size"] == entry["size"]:
+            entry["sha1"] = old["sha1"]
+        else:
+            entry["sha1"] = file_hash(path)
+        fingerprint[fn] = entry
+    return fingerprint
+
+
+def same_content(fingerprint_a: dict, fingerprint_b: dict) -> bool:
+    '''
+        True if both fingerprints describe the same set of files and contents
+    '''
+    if set(fingerprint_a) != set(fingerprint_b):
+        return False
+    return all(fingerprint_a[fn]["sha1"] == fingerprint_b[fn]["sha1"] for fn in fingerprint_a)
+
+
+class ScenarioCache(object):
+
+    def __init__(self, cache_dn: str = None, stream_runs: bool = False, keep_repetitions: bool = False):
+        '''
+            Arguments
+            ---------
+            cache_dn: str
+                directory for all cached scenarios;
+                if None, see default_cache_dn
+            stream_runs: bool
+                parse algorithm_runs.arff with the streaming reader
+                (see arff_stream.read_scenario_streamed)
+            keep_repetitions: bool
+                keep all repetitions of the algorithm runs as scenario.run_cube
+                (implies stream_runs; see arff_stream.RunCube)
+        '''
+        self.cache_dn = cache_dn
+        self.stream_runs = stream_runs or keep_repetitions
+        self.keep_repetitions = keep_repetitions
+        self.logger = logging.getLogger("ScenarioCache")
+
+    def get_cache_dn(self, dn: str) -> str:
+        '''
+            cache directory of scenario directory dn
+        '''
+        key = hashlib.sha1(os.path.abspath(dn).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dn or default_cache_dn(), key)
+
+    def read_scenario(self, dn: str) -> ASlibScenario:
+        '''
+            read scenario from cache if the cache is up-to-date;
+            otherwise parse the scenario files and update the cache
+
+            Arguments
+            ---------
+            dn: str
+                scenario directory
+
+            Returns
+            -------
+            ASlibScenario
+        '''
+        cache_dn = self.get_cache_dn(dn)
+        index = self._read_index(cache_dn)
+        fingerprint = scenario_fingerprint(dn, previous=index["files"] if index else None)
+
+        if index and index.get("stream_runs") == self.stream_runs and \
+                index.get("keep_repetitions", False) == self.keep_repetitions and \
+                same_content(index["files"], fingerprint):
+            try:
+                scenario = self._load(cache_dn, index)
+                get_status(scenario)
+                self.logger.debug("Loaded %s from cache %s" % (dn, cache_dn))
+                if index["files"] != fingerprint:
+                    # only mtimes changed; avoid re-hashing next time
+                    index["files"] = fingerprint
+                    self._write_index(cache_dn, index)
+                return scenario
+            except (OSError, ValueError, KeyError, pickle.UnpicklingError) as err:
+                self.logger.warning("Could not load cache %s (%s); re-parsing scenario" % (cache_dn, err))
+        elif index:
+            self.logger.info("Cache of %s is stale; re-parsing scenario" % (dn))
+
+        scenario = parse_scenario(dn=dn, stream_runs=self.stream_runs, keep_repetitions=self.keep_repetitions)
+        get_status(scenario)
+
+        try:
+            self._save(cache_dn, dn, scenario, fingerprint)
+        except (OSError, TypeError, pickle.PicklingError) as err:
+            self.logger.warning("Could not write cache %s: %s" % (cache_dn, err))
+        return scenario
+
+    def _read_index(self, cache_dn: str):
+        fn = os.path.join(cache_dn, "index.json")
+        if not os.path.isfile(fn):
+            return None
+        try:
+            with open(fn) as fp:
+                index = json.load(fp)
+        except ValueError:
+            return None
+        if index.get("version") != CACHE_VERSION:
+            return None
+        return index
+
+    def _write_index(self, cache_dn: str, index: dict):
+        # per-process name: concurrent writers do not share the temporary file
+        tmp_fn = os.path.join(cache_dn, "index.json.tmp%d" % (os.getpid()))
+        with open(tmp_fn, "w") as fp:
+            json.dump(index, fp, indent=2)
+        os.replace(tmp_fn, os.path.join(cache_dn, "index.json"))
+
+    def _save(self, cache_dn: str, dn: str, scenario: ASlibScenario, fingerprint: dict):
+        '''
+            writes all frames and attributes of scenario to a fresh cache directory
+        '''
+        # unique name: concurrent writers of the same scenario do not share it
+        tmp_dn = "%s.tmp%s" % (cache_dn, uuid.uuid4().hex)
+        os.makedirs(tmp_dn)
+        try:
+            self._write_frames(tmp_dn, dn, scenario, fingerprint)
+            self._publish(tmp_dn, cache_dn)
+        finally:
+            shutil.rmtree(tmp_dn, ignore_errors=True)
+
+    def _write_frames(self, tmp_dn: str, dn: str, scenario: ASlibScenario, fingerprint: dict):
+        frames = {}
+        attributes = {}
+        for name, value in vars(scenario).items():
+            if name in SKIP_ATTRIBUTES or callable(value):
+                continue
+            if isinstance(value, pd.DataFrame):
+                frames[name] = save_frame(value, os.path.join(tmp_dn, name))
+            else:
+                attributes[name] = value
+
+        with open(os.path.join(tmp_dn, "attributes.pkl"), "wb") as fp:
+            pickle.dump(attributes, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+        index = {"version": CACHE_VERSION,
+                 "dn": os.path.abspath(dn),
+                 "stream_runs": self.stream_runs,
+                 "keep_repetitions": self.keep_repetitions,
+                 "files": fingerprint,
+                 "frames": frames}
+        self._write_index(tmp_dn, index)
+
+    def _publish(self, tmp_dn: str, cache_dn: str):
+        '''
+            atomically moves the complete cache tmp_dn to cache_dn;
+            a stale cache in cache_dn is moved out of the way first;
+            if another process published cache_dn in the meantime, its cache is kept
+        '''
+        if os.path.isdir(cache_dn):
+            old_dn = "%s.old%s" % (cache_dn, uuid.uuid4().hex)
+            try:
+                os.replace(cache_dn, old_dn)
+            except FileNotFoundError:
+                pass
+            shutil.rmtree(old_dn, ignore_errors=True)
+        try:
+            os.replace(tmp_dn, cache_dn)
+        except OSError as err:
+            if not isinstance(err, FileExistsError) and err.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                raise
+            self.logger.debug("Cache %s was written by another process" % (cache_dn))
+            return
+        self.logger.debug("Wrote cache %s" % (cache_dn))
+
+    def _load(self, cache_dn: str, index: dict) -> ASlibScenario:
+        scenario = ASlibScenario()
+        with open(os.path.join(cache_dn, "attributes.pkl"), "rb") as fp:
+            attributes = pickle.load(fp)
+        for name, value in attributes.items():
+            setattr(scenario, name, value)
+        for name, meta in index["frames"].items():
+            setattr(scenario, name, load_frame(os.path.join(cache_dn, name), meta))
+        return scenario
+
+
+def save_frame(frame: pd.DataFrame, prefix: str) -> dict:
+    '''
+        stores a data frame as .npy files
+
+        columns are grouped into blocks of the same dtype;
+        each block is stored as one 2D array (column-major).
+        Columns with python objects (e.g., runstatus strings)
+        are stored as categorical codes plus the list of categories.
+
+        Arguments
+        ---------
+        frame: pd.DataFrame
+            data frame to store
+        prefix: str
+            path prefix of all files of the frame
+
+        Returns
+        -------
+        dict: layout of the frame (see load_frame)
+    '''
+    meta = {"columns": _save_labels(frame.columns, prefix + ".columns.npy"),
+            "index": _save_labels(frame.index, prefix + ".index.npy"),
+            "blocks": []}
+
+    blocks = {}
+    for pos, dtype in enumerate(frame.dtypes):
+        if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+            key = dtype.str
+        else:
+            key = "codes"
+        blocks.setdefault(key, []).append(pos)
+
+    for b_idx, (key, positions) in enumerate(sorted(blocks.items())):
+        fn = "%s.%d.npy" % (prefix, b_idx)
+        block = {"columns": positions, "file": os.path.basename(fn)}
+        if key == "codes":
+            values = frame.iloc[:, positions].astype(object).values
+            cat = pd.Categorical(values.ravel(order="F"))
+            if not all(isinstance(c, str) for c in cat.categories):
+                raise TypeError("Cannot cache non-string object column(s) %s" % (list(frame.columns[positions])))
+            np.save(fn, cat.codes.reshape(values.shape, order="F"))
+            cat_fn = "%s.%d.categories.npy" % (prefix, b_idx)
+            np.save(cat_fn, np.array(cat.categories, dtype=str))
+            block["categories"] = os.path.basename(cat_fn)
+        else:
+            np.save(fn, np.asfortranarray(frame.iloc[:, positions].values))
+        meta["blocks"].append(block)
+    return meta
+
+
+def load_frame(prefix: str, meta: dict) -> pd.DataFrame:
+    '''
+        loads a data frame stored by save_frame
+
+        numeric blocks are memory-mapped (copy-on-write),
+        i.e., only the pages that are accessed are read from disk
+    '''
+    dn = os.path.dirname(prefix)
+    columns = _load_labels(meta["columns"], prefix + ".columns.npy")
+    index = _load_labels(meta["index"], prefix + ".index.npy")
+
+    data = {}
+    for block in meta["blocks"]:
+        if "categories" in block:
+            codes = np.load(os.path.join(dn, block["file"]))
+            categories = np.load(os.path.join(dn, block["categories"])).astype(object)
+            # code -1 (missing value) picks the appended None
+            values = np.append(categories, None)[codes]
+        else:
+            values = np.load(os.path.join(dn, block["file"]), mmap_mode="c")
+        for b_pos, pos in enumerate(block["columns"]):
+            data[pos] = values[:, b_pos]
+
+    if len(meta["blocks"]) == 1 and "categories" not in meta["blocks"][0]:
+        # single numeric block: avoid copying column by column
+        return pd.DataFrame(values, index=index, columns=columns)
+    frame = pd.DataFrame(dict((columns[pos], data[pos]) for pos in range(len(columns))),
+                         index=index, columns=columns)
+    return frame
+
+
+def _save_labels(labels: pd.Index, fn: str):
+    if isinstance(labels, pd.RangeIndex):
+        return {"range": [labels.start, labels.stop, labels.step], "name": labels.name}
+    np.save(fn, np.array(labels, dtype=str))
+    return {"file": os.path.basename(fn), "name": labels.name}
+
+
+def _load_labels(meta: dict, fn: str) -> pd.Index:
+    if "range" in meta:
+        return pd.RangeIndex(*meta["range"], name=meta["name"])
+    return pd.Index(np.load(fn).astype(object), name=meta["name"])
+
+
+def parse_scenario(dn: str, stream_runs: bool = False, keep_repetitions: bool = False) -> ASlibScenario:
+    '''
+        parses all files of an ASlib scenario (without cache)
+    '''
+    if stream_runs or keep_repetitions:
+        return read_scenario_streamed(dn=dn, keep_repetitions=keep_repetitions)
+    scenario = ASlibScenario()
+    scenario.read_scenario(dn=dn)
+    return scenario
+
+
+def read_scenario(dn: str, cache_dn: str = None, use_cache: bool = True,
+                  stream_runs: bool = False, keep_repetitions: bool = False,
+                  lazy: bool = False) -> ASlibScenario:
+    '''
+        reads an ASlib scenario, using the on-disk cache if possible
+
+        Arguments
+        ---------
+        dn: str
+            scenario directory
+        cache_dn: str
+            cache directory (see ScenarioCache)
+        use_cache: bool
+            if False, always parse the scenario files
+        stream_runs: bool
+            parse algorithm_runs.arff with the streaming reader
+            (float32 performance matrix, bounded memory)
+        keep_repetitions: bool
+            keep all repetitions of the algorithm runs as scenario.run_cube
+            (see arff_stream.RunCube)
+        lazy: bool
+            read each file on first access instead of using the cache
+            (see lazy_scenario.py)
+
+        Returns
+        -------
+        ASlibScenario
+    '''
+    if lazy:
+        return LazyScenario(dn=dn, stream_runs=stream_runs, keep_repetitions=keep_repetitions)
+    if not use_cache:
+        scenario = parse_scenario(dn=dn, stream_runs=stream_runs, keep_repetitions=keep_repetitions)
+        get_status(scenario)
+        return scenario
+    return ScenarioCache(cache_dn=cache_dn, stream_runs=stream_runs,
+                         keep_repetitions=keep_repetitions).read_scenario(dn=dn)
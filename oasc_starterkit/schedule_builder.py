@@ -0,0 +1,250 @@
+# Author: Marius Lindauer
+# License: BSD
+# Schedules with presolving for runtime scenarios
+#
+# The schedule of an instance is
+#   [(presolver, budget), ..., feature steps, (selected algorithm, cutoff)]
+# (the format of Validator.validate_runtime).
+# The presolvers are chosen greedily on the training data:
+# in each round, all (algorithm, budget) candidates are evaluated at once
+# for their PAR10 score of the whole schedule
+# (incl. feature costs and instances presolved during the feature computation).
+
+import logging
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+import numpy as np
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.regression_selector import RegressionSelector, order_feature_steps
+from oasc_starterkit.runstatus import get_status
+from oasc_starterkit.model_io import create_selector
+
+# candidate presolving budgets (fractions of the cutoff)
+DEFAULT_BUDGETS = [0.005, 0.01, 0.02, 0.05, 0.1]
+
+
+class ScheduleBuilder(SingleBest):
+
+    def __init__(self, selector: SingleBest = None, budgets: list = DEFAULT_BUDGETS,
+                 max_presolvers: int = 1, max_presolving_time: float = 0.1):
+        '''
+            Arguments
+            ---------
+            selector: SingleBest
+                selector of the final algorithm (with the SingleBest interface);
+                its schedule (e.g., feature steps + algorithm) follows the presolvers
+            budgets: list
+                candidate budgets of a presolver (fractions of the cutoff)
+            max_presolvers: int
+                maximal number of presolvers
+            max_presolving_time: float
+                maximal total budget of all presolvers (fraction of the cutoff)
+        '''
+        super().__init__()
+        self.selector = selector if selector is not None else SingleBest()
+        self.budgets = list(budgets)
+        self.max_presolvers = max_presolvers
+        self.max_presolving_time = max_presolving_time
+
+        self.logger = logging.getLogger("ScheduleBuilder")
+
+        # list of (algorithm, budget)
+        self.presolvers = []
+
+    def fit(self, scenario: ASlibScenario):
+        '''
+            fits the selector and chooses the presolvers
+
+            Arguments
+            ---------
+            scenario: ASlibScenario
+                scenario with training data
+        '''
+        self.selector.fit(scenario=scenario)
+        self.fit_presolvers(scenario=scenario)
+
+    def fit_presolvers(self, scenario: ASlibScenario):
+        '''
+            chooses the presolvers for the already fitted selector
+
+            Arguments
+            ---------
+            scenario: ASlibScenario
+                scenario with training data
+        '''
+        self.single_best = self.selector.single_best
+        self.presolvers = []
+        if scenario.performance_type[0] == "runtime":
+            self.presolvers = self.optimize(scenario=scenario)
+
+    def select(self, scenario: ASlibScenario):
+        return self.selector.select(scenario=scenario)
+
+    def select_from_features(self, X):
+        return self.selector.select_from_features(X)
+
+    def get_feature_names(self):
+        return self.selector.get_feature_names()
+
+    def get_schedule(self, algo: str, scenario: ASlibScenario):
+        return [(presolver, budget) for presolver, budget in self.presolvers] + \
+            self.selector.get_schedule(algo=algo, scenario=scenario)
+
+    def get_state(self):
+        return {"presolvers": [list(p) for p in self.presolvers],
+                "selector_class": type(self.selector).__name__,
+                "selector": self.selector.get_state()}
+
+    def set_state(self, state: dict):
+        if type(self.selector).__name__ != state["selector_class"]:
+            self.selector = create_selector(state["selector_class"])
+        self.selector.set_state(state["selector"])
+        self.single_best = self.selector.single_best
+        self.presolvers = [(algo, float(budget)) for algo, budget in state["presolvers"]]
+
+    def _get_feature_steps(self):
+        '''
+            feature steps that the selector puts in its schedules
+        '''
+        return list(getattr(self.selector, "schedule_steps", None) or [])
+
+    def _get_tail(self, scenario: ASlibScenario, perf: np.ndarray, ok: np.ndarray):
+        '''
+            outcome of the schedule after the presolvers
+            (feature steps + selected algorithm),
+            relative to the time the presolvers used
+
+            Returns
+            -------
+            feat_solve: np.ndarray
+                time until a feature step presolved an instance (inf if none)
+            feat_cost: np.ndarray
+                time of all feature steps
+            algo_time: np.ndarray
+                runtime of the selected algorithm
+            algo_ok: np.ndarray
+                selected algorithm solved the instance
+        '''
+        perf_data = scenario.performance_data
+        n_insts = perf.shape[0]
+
+        feat_solve = np.full(n_insts, np.inf)
+        feat_cost = np.zeros(n_insts)
+        steps = order_feature_steps(scenario.feature_group_dict, self._get_feature_steps())
+        if steps:
+            if scenario.feature_cost_data is not None:
+                costs = scenario.feature_cost_data.reindex(index=perf_data.index, columns=steps).values
+                costs = np.nan_to_num(costs.astype(np.float64))
+            else:
+                costs = np.zeros((n_insts, len(steps)))
+            cum_costs = np.cumsum(costs, axis=1)
+            feat_cost = cum_costs[:, -1]
+            status = get_status(scenario).features
+            if status is not None:
+                presolved = status.reindex(perf_data.index, steps).presolved
+                feat_solve = np.where(presolved, cum_costs, np.inf).min(axis=1)
+
+        selection = np.asarray(self.selector.select(scenario=scenario), dtype=object)
+        selection = dict(zip(scenario.feature_data.index, selection))
+        algo_map = dict((algo, idx) for idx, algo in enumerate(perf_data.columns))
+        sel_idx = np.array([algo_map[selection.get(inst, self.single_best)] for inst in perf_data.index],
+                           dtype=np.int64)
+        rows = np.arange(n_insts)
+        return feat_solve, feat_cost, perf[rows, sel_idx], ok[rows, sel_idx]
+
+    def optimize(self, scenario: ASlibScenario) -> list:
+        '''
+            greedily chooses presolvers that minimize the PAR10 score
+            of the schedules on the training data
+
+            Returns
+            -------
+            list of (algorithm, budget)
+        '''
+        perf_data = scenario.performance_data
+        cutoff = float(scenario.algorithm_cutoff_time)
+        algorithms = list(perf_data.columns)
+        perf = perf_data.values.astype(np.float64)
+        ok = get_status(scenario).runs.reindex(perf_data.index, algorithms).ok
+
+        feat_solve, feat_cost, algo_time, algo_ok = self._get_tail(scenario=scenario, perf=perf, ok=ok)
+
+        def tail_par10(start):
+            # start: time used by the presolvers (any shape with instances as first axis)
+            shape = (-1,) + (1,) * (start.ndim - 1)
+            f_solve = feat_solve.reshape(shape)
+            a_time = (feat_cost + algo_time).reshape(shape)
+            a_ok = algo_ok.reshape(shape)
+            return np.where(start + f_solve <= cutoff, start + f_solve,
+                            np.where(a_ok & (start + a_time <= cutoff), start + a_time, 10 * cutoff))
+
+        # state after the chosen presolvers
+        used = np.zeros(perf.shape[0])
+        done = np.zeros(perf.shape[0], dtype=bool)
+        done_time = np.zeros(perf.shape[0])
+        score = tail_par10(used).sum()
+        self.logger.debug("PAR10 without presolving: %f" % (score / perf.shape[0]))
+
+        budgets = np.array(self.budgets) * cutoff
+        presolvers = []
+        presolving_time = 0.0
+        for _ in range(self.max_presolvers):
+            # instances x algorithms x budgets
+            t = perf[:, :, np.newaxis]
+            start = used[:, np.newaxis, np.newaxis]
+            solved = ~done[:, np.newaxis, np.newaxis] & ok[:, :, np.newaxis] & \
+                (t <= budgets) & (start + t <= cutoff)
+            par10 = np.where(done[:, np.newaxis, np.newaxis], done_time[:, np.newaxis, np.newaxis],
+                             np.where(solved, start + t, tail_par10(start + budgets)))
+            totals = par10.sum(axis=0)
+
+            # forbidden candidates
+            totals[:, presolving_time + budgets > self.max_presolving_time * cutoff + 1e-9] = np.inf
+            for algo, _budget in presolvers:
+                totals[algorithms.index(algo), :] = np.inf
+
+            a_idx, b_idx = np.unravel_index(np.argmin(totals), totals.shape)
+            if not totals[a_idx, b_idx] < score:
+                break
+
+            score = totals[a_idx, b_idx]
+            budget = float(budgets[b_idx])
+            presolvers.append((algorithms[a_idx], budget))
+            presolving_time += budget
+            new_solved = solved[:, a_idx, b_idx]
+            done_time = np.where(new_solved, used + perf[:, a_idx], done_time)
+            done |= new_solved
+            used = used + budget
+            self.logger.debug("Presolver %s with budget %f: PAR10 %f" % (algorithms[a_idx], budget,
+                                                                           score / perf.shape[0]))
+
+        return presolvers
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--train_as", help="Directory with training data in ASlib format")
+    parser.add_argument("--test_as", help="Directory with test data in ASlib format")
+    parser.add_argument("--selector", default="single_best", choices=["single_best", "regression"], help="Selector of the final algorithm")
+    parser.add_argument("--max_presolvers", type=int, default=1, help="Maximal number of presolvers")
+    parser.add_argument("--max_presolving_time", type=float, default=0.1, help="Maximal presolving time (fraction of the cutoff)")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+    parser.add_argument("--out_fn", default="results.json", help="Results file (.json or .jsonl with one instance per line)")
+    parser.add_argument("--save_model", default=None, help="Save the fitted model to this file (.npz; see predict.py)")
+
+    args_ = parser.parse_args()
+
+    selector = RegressionSelector() if args_.selector == "regression" else SingleBest()
+    builder = ScheduleBuilder(selector=selector, max_presolvers=args_.max_presolvers,
+                              max_presolving_time=args_.max_presolving_time)
+    builder.main(train_scenario_dn=args_.train_as,
+                 test_scenario_dn=args_.test_as,
+                 cache_dn=args_.cache_dir,
+                 use_cache=not args_.no_cache,
+                 out_fn=args_.out_fn,
+                 model_fn=args_.save_model)
@@ -0,0 +1,352 @@
+# Author: Marius Lindauer
+# License: BSD
+# Local HTTP server answering algorithm selection queries
+#
+# The selector is fitted once at startup (or loaded from a saved model).
+# Clients POST the features of one or more instances to /select
+# and get their schedules in the format of results.json
+# (i.e., the format Validator.validate_runtime accepts).
+# Queries that arrive close together are grouped into a single
+# vectorized call of select_from_features (micro-batching).
+# GET /stats returns latency and throughput counters.
+#
+# Example query:
+#   curl -X POST localhost:8080/select -d '{"instances": {"inst1": {"feat_a": 1.0, "feat_b": null}}}'
+
+import json
+import time
+import queue
+import logging
+import threading
+import collections
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+import numpy as np
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.scenario_cache import read_scenario
+from oasc_starterkit.model_io import SELECTORS, create_named_selector, load_model, scenario_from_meta
+
+
+class MicroBatcher(object):
+
+    def __init__(self, select_func, max_batch_size: int = 1024, max_wait: float = 0.002):
+        '''
+            groups feature matrices of concurrent requests
+            into one call of select_func
+
+            Arguments
+            ---------
+            select_func: callable
+                maps a feature matrix (instances x features) to a list of algorithms
+            max_batch_size: int
+                maximal number of instances per call
+                (a single larger request is not split;
+                a request that does not fit starts the next batch)
+            max_wait: float
+                seconds to wait for further requests after the first one arrived
+        '''
+        self.select_func = select_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.n_batches = 0
+        self.n_batched_instances = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, X: np.ndarray) -> list:
+        '''
+            selects algorithms for the rows of X
+            (blocks until the batch containing X was processed)
+        '''
+        item = {"X": X, "done": threading.Event(), "result": None, "error": None}
+        self._queue.put(item)
+        item["done"].wait()
+        if item["error"] is not None:
+            raise item["error"]
+        return item["result"]
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        # request that did not fit into the previous batch
+        pending = None
+        while True:
+            item = pending if pending is not None else self._queue.get()
+            pending = None
+            if item is None:
+                return
+            batch = [item]
+            size = item["X"].shape[0]
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._process(batch)
+                    return
+                if size + item["X"].shape[0] > self.max_batch_size:
+                    pending = item
+                    break
+                batch.append(item)
+                size += item["X"].shape[0]
+            self._process(batch)
+
+    def _process(self, batch: list):
+        try:
+            X = np.vstack([item["X"] for item in batch])
+            selection = list(self.select_func(X))
+        except Exception as err:
+            for item in batch:
+                item["error"] = err
+                item["done"].set()
+            return
+
+        self.n_batches += 1
+        self.n_batched_instances += X.shape[0]
+        start = 0
+        for item in batch:
+            end = start + item["X"].shape[0]
+            item["result"] = selection[start:end]
+            start = end
+            item["done"].set()
+
+
+class ServerStats(object):
+
+    def __init__(self, window: int = 10000):
+        '''
+            request counters and latencies of the last window requests
+        '''
+        self.start_time = time.time()
+        self.n_requests = 0
+        self.n_instances = 0
+        self.n_errors = 0
+        # requests answered with an internal server error (see add_failure)
+        self.n_failures = 0
+        self.latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, n_instances: int, latency: float, error: bool = False):
+        with self._lock:
+            self.n_requests += 1
+            self.n_instances += n_instances
+            self.n_errors += int(error)
+            self.latencies.append(latency)
+
+    def add_failure(self):
+        with self._lock:
+            self.n_failures += 1
+
+    def get(self, batcher: MicroBatcher = None) -> dict:
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            uptime = time.time() - self.start_time
+            stats = {"uptime_sec": uptime,
+                     "requests": self.n_requests,
+                     "instances": self.n_instances,
+                     "errors": self.n_errors,
+                     "internal_errors": self.n_failures,
+                     "instances_per_sec": self.n_instances / uptime if uptime > 0 else 0.0}
+        if latencies.size:
+            stats.update({"latency_ms_mean": float(latencies.mean()),
+                          "latency_ms_p50": float(np.percentile(latencies, 50)),
+                          "latency_ms_p95": float(np.percentile(latencies, 95)),
+                          "latency_ms_p99": float(np.percentile(latencies, 99)),
+                          "latency_ms_max": float(latencies.max())})
+        if batcher is not None:
+            stats.update({"batches": batcher.n_batches,
+                          "mean_batch_size": batcher.n_batched_instances / batcher.n_batches
+                          if batcher.n_batches else 0.0})
+        return stats
+
+
+class SelectionService(object):
+
+    def __init__(self, selector: SingleBest, scenario: ASlibScenario,
+                 max_batch_size: int = 1024, max_wait: float = 0.002):
+        '''
+            Arguments
+            ---------
+            selector: SingleBest
+                fitted selector (with select_from_features, get_feature_names and get_schedule)
+            scenario: ASlibScenario
+                scenario with performance_type and algorithm_cutoff_time
+                (used to build the schedules)
+            max_batch_size, max_wait:
+                see MicroBatcher
+        '''
+        self.selector = selector
+        self.scenario = scenario
+        self.feature_names = list(selector.get_feature_names())
+        self.feature_index = dict((f, idx) for idx, f in enumerate(self.feature_names))
+        self.batcher = MicroBatcher(select_func=selector.select_from_features,
+                                    max_batch_size=max_batch_size, max_wait=max_wait)
+        self.stats = ServerStats()
+        self.logger = logging.getLogger("SelectionService")
+
+    def get_matrix(self, instances: dict) -> np.ndarray:
+        '''
+            converts the features of the query into a matrix
+
+            Arguments
+            ---------
+            instances: dict
+                instance name -> dict {feature name -> value (None if missing)}
+                or list of values (in the order of get_feature_names)
+        '''
+        X = np.full((len(instances), len(self.feature_names)), np.nan)
+        for row, features in enumerate(instances.values()):
+            if isinstance(features, dict):
+                for feature, value in features.items():
+                    col = self.feature_index.get(feature)
+                    if col is not None and value is not None:
+                        X[row, col] = value
+            else:
+                if len(features) != len(self.feature_names):
+                    raise ValueError("Expected %d feature values but got %d" %
+                                     (len(self.feature_names), len(features)))
+                X[row, :] = [np.nan if value is None else value for value in features]
+        return X
+
+    def select(self, instances: dict) -> dict:
+        '''
+            Returns
+            -------
+            dict instance name -> schedule
+        '''
+        start = time.perf_counter()
+        try:
+            selection = self.batcher.submit(self.get_matrix(instances))
+            schedules = dict((inst, self.selector.get_schedule(algo=algo, scenario=self.scenario))
+                             for inst, algo in zip(instances, selection))
+        except Exception:
+            self.stats.add(n_instances=len(instances), latency=time.perf_counter() - start, error=True)
+            raise
+        self.stats.add(n_instances=len(instances), latency=time.perf_counter() - start)
+        return schedules
+
+    def get_stats(self) -> dict:
+        return self.stats.get(batcher=self.batcher)
+
+    def close(self):
+        self.batcher.close()
+
+
+class SelectionRequestHandler(BaseHTTPRequestHandler):
+
+    # set by make_server
+    service = None
+
+    def _send(self, code: int, data: dict):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send(200, self.service.get_stats())
+        elif self.path == "/features":
+            self._send(200, {"features": self.service.feature_names})
+        elif self.path == "/health":
+            self._send(200, {"status": "ok"})
+        else:
+            self._send(404, {"error": "unknown path %s" % (self.path)})
+
+    def do_POST(self):
+        if self.path != "/select":
+            self._send(404, {"error": "unknown path %s" % (self.path)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            query = json.loads(self.rfile.read(length).decode("utf-8"))
+            instances = query["instances"]
+            if not isinstance(instances, dict):
+                raise ValueError("'instances' has to map instance names to features")
+        except (ValueError, KeyError, TypeError) as err:
+            self._send(400, {"error": "%s: %s" % (err.__class__.__name__, err)})
+            return
+        try:
+            self._send(200, self.service.select(instances))
+        except (ValueError, TypeError) as err:
+            self._send(400, {"error": "%s: %s" % (err.__class__.__name__, err)})
+        except Exception as err:
+            # e.g., a failing selector; the server keeps answering further queries
+            logging.getLogger("SelectionServer").exception("Could not answer query of %d instance(s)" %
+                                                           (len(instances)))
+            self.service.stats.add_failure()
+            self._send(500, {"error": "%s: %s" % (err.__class__.__name__, err)})
+
+    def log_message(self, format, *args):
+        # one debug message per request instead of stderr output
+        logging.getLogger("SelectionServer").debug(format % args)
+
+
+class SelectionServer(ThreadingHTTPServer):
+
+    # many clients may connect at the same time
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def make_server(service: SelectionService, host: str = "127.0.0.1", port: int = 8080) -> SelectionServer:
+    '''
+        returns a HTTP server answering queries with service
+        (call serve_forever() to start it)
+    '''
+    handler = type("BoundSelectionRequestHandler", (SelectionRequestHandler,), {"service": service})
+    return SelectionServer((host, port), handler)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--train_as", help="Directory with training data in ASlib format")
+    parser.add_argument("--model", default=None, help="Load a model saved with --save_model instead of fitting on --train_as")
+    parser.add_argument("--selector", default="regression", choices=sorted(SELECTORS), help="Algorithm selector")
+    parser.add_argument("--host", default="127.0.0.1", help="Host name")
+    parser.add_argument("--port", type=int, default=8080, help="Port")
+    parser.add_argument("--max_batch_size", type=int, default=1024, help="Maximal number of instances per batch")
+    parser.add_argument("--max_wait_ms", type=float, default=2.0, help="Time to wait for further requests of a batch")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+
+    args_ = parser.parse_args()
+
+    logging.basicConfig(level="INFO")
+
+    if args_.model:
+        selector, meta = load_model(args_.model)
+        scenario = scenario_from_meta(meta)
+    else:
+        scenario = read_scenario(dn=args_.train_as, cache_dn=args_.cache_dir, use_cache=not args_.no_cache)
+        selector = create_named_selector(args_.selector)
+        selector.fit(scenario=scenario)
+
+    service = SelectionService(selector=selector, scenario=scenario,
+                               max_batch_size=args_.max_batch_size, max_wait=args_.max_wait_ms / 1000)
+    server = make_server(service=service, host=args_.host, port=args_.port)
+    logging.getLogger("SelectionServer").info("Listening on %s:%d" % (args_.host, args_.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
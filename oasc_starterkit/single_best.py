@@ -4,20 +4,54 @@
 # a baseline predictor can be implemented
 # based on an ASlib Scenario
 
-import os
-import json
+import logging
+
+import numpy as np
+import pandas as pd
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 
 from aslib_scenario.aslib_scenario import ASlibScenario
 
+from oasc_starterkit.scenario_cache import read_scenario
+from oasc_starterkit.results_io import ResultsWriter, is_streamed
+from oasc_starterkit.instrumentation import Profiler, NULL_PROFILER
+from oasc_starterkit.model_io import save_model
+from oasc_starterkit.arff_stream import get_run_cube
+from oasc_starterkit.lazy_scenario import LazyScenario
+
+# criteria to choose the single best algorithm
+# (mean: average of performance_data, i.e., repetitions are averaged first;
+#  par10: average PAR10 score of all runs;
+#  solved: expected number of solved instances (over the repetitions))
+AGGREGATIONS = ["mean", "par10", "solved"]
+
 class SingleBest(object):
     
-    def __init__(self):
+    def __init__(self, aggregation:str="mean"):
+        '''
+            Arguments
+            ---------
+            aggregation: str
+                criterion to choose the single best (see AGGREGATIONS)
+        '''
+        if aggregation not in AGGREGATIONS:
+            raise ValueError("Unknown aggregation %s (choose from %s)" % (aggregation, AGGREGATIONS))
+        self.aggregation = aggregation
         self.single_best = None
+        self.logger = logging.getLogger("SingleBest")
+        # records the stages of main and predict (see instrumentation.py)
+        self.profiler = NULL_PROFILER
     
     def main(self,
              train_scenario_dn:str,
-             test_scenario_dn:str=None):
+             test_scenario_dn:str=None,
+             cache_dn:str=None,
+             use_cache:bool=True,
+             stream_runs:bool=False,
+             keep_repetitions:bool=False,
+             lazy:bool=False,
+             out_fn:str="results.json",
+             model_fn:str=None):
         '''
             main method
             
@@ -28,25 +62,63 @@ class SingleBest(object):
             test_scenarios_dn:str
                 directory name with ASlib scenario test data 
                 (performance data is missing)
+            cache_dn:str
+                directory of the scenario cache 
+                (default: $XDG_CACHE_HOME/oasc_starterkit)
+            use_cache:bool
+                read training data from (and write it to) the scenario cache
+            stream_runs:bool
+                read algorithm_runs.arff chunk by chunk 
+                (bounded memory; see arff_stream.py)
+            keep_repetitions:bool
+                keep all repetitions of the training runs 
+                (used by the aggregations par10 and solved)
+            lazy:bool
+                read the training files only when they are accessed
+                (e.g., SingleBest.fit reads only algorithm_runs.arff; 
+                see lazy_scenario.py)
+            out_fn:str
+                file name of the results file 
+                (*.jsonl: one instance per line, written incrementally)
+            model_fn:str
+                if given, the fitted model is saved to this file
+                (see model_io.py and predict.py)
         '''
         
         # Read scenario files
-        scenario = ASlibScenario()
-        scenario.read_scenario(dn=train_scenario_dn)
+        # (binary cache is used if it is up-to-date)
+        with self.profiler.stage("read_train") as stage:
+            scenario = read_scenario(dn=train_scenario_dn, 
+                                     cache_dn=cache_dn, use_cache=use_cache,
+                                     stream_runs=stream_runs,
+                                     keep_repetitions=keep_repetitions,
+                                     lazy=lazy)
+            stage["n_instances"] = len(scenario.instances)
         
         # fit on training data
-        self.fit(scenario=scenario)
+        with self.profiler.stage("fit", n_instances=len(scenario.instances)):
+            self.fit(scenario=scenario)
+        
+        # store fitted model 
+        # such that predict.py can predict on new data without fitting again
+        if model_fn is not None:
+            with self.profiler.stage("save_model"):
+                save_model(selector=self, scenario=scenario, fn=model_fn)
+        
+        if lazy:
+            self.logger.info("Read training files: %s" % (", ".join(scenario.get_loaded_components())))
         
         # Read test files
-        # ASlibScenario is not designed to read partial scenarios
-        # therefore, we have to cheat a bit
-        scenario = ASlibScenario()
-        scenario.read_description(fn=os.path.join(test_scenario_dn,"description.txt"))
-        scenario.read_feature_values(fn=os.path.join(test_scenario_dn,"feature_values.arff"))
-        scenario.read_feature_runstatus(fn=os.path.join(test_scenario_dn,"feature_runstatus.arff"))
+        # (only the files required for the predictions,
+        #  e.g., feature values and feature runstatus)
+        with self.profiler.stage("read_test") as stage:
+            scenario = LazyScenario(dn=test_scenario_dn)
+            stage["n_instances"] = scenario.feature_data.shape[0]
         
         # predict on test data
-        self.predict(scenario=scenario)
+        with self.profiler.stage("predict", n_instances=scenario.feature_data.shape[0]):
+            self.predict(scenario=scenario, out_fn=out_fn)
+        self.logger.debug("Read test files: %s" % (", ".join(scenario.get_loaded_components())))
 
     def fit(self, scenario:ASlibScenario):
         '''
@@ -65,26 +137,84 @@ class SingleBest(object):
                 scenario with training data
         '''
         
+        if self.aggregation != "mean":
+            self.single_best = self._fit_repetitions(scenario=scenario)
+            self.logger.info("Single best: %s" % (self.single_best))
+            return
+        
         # get performance data
         perf_data = scenario.performance_data
         
         # average performance for each algorithm
         average_perf = perf_data.mean(axis=0)
-        print(average_perf)
+        self.logger.debug("Average performance:\n%s" % (average_perf))
         
         # get best performing algorithm
         # assumption minimization -- 
         # ASlibScenario automatically multiplies by -1 
         # if performance measure has to be maximized
-        self.single_best = average_perf.argmin()
-        print(self.single_best)
+        # (idxmin returns the algorithm name; 
+        #  argmin returns its position in recent pandas versions)
+        self.single_best = average_perf.idxmin()
+        self.logger.info("Single best: %s" % (self.single_best))
+    
+    def _fit_repetitions(self, scenario:ASlibScenario):
+        '''
+            single best according to the aggregations par10 or solved
+            of all repetitions of the runs
+            (scenario.run_cube; see read_scenario(keep_repetitions=True))
+        '''
+        cube = get_run_cube(scenario)
+        if self.aggregation == "par10":
+            if scenario.performance_type[0] != "runtime":
+                raise ValueError("Aggregation par10 requires a runtime scenario")
+            par10 = cube.aggregate("par10", algorithm_cutoff_time=scenario.algorithm_cutoff_time)
+            score = pd.Series(np.nanmean(par10, axis=0), index=cube.algorithms)
+            self.logger.debug("Average PAR10 of all runs:\n%s" % (score))
+            return score.idxmin()
+        # solved
+        solved = pd.Series(np.nansum(cube.aggregate("solve_probability"), axis=0), index=cube.algorithms)
+        self.logger.debug("Expected number of solved instances:\n%s" % (solved))
+        return solved.idxmax()
+    
+    def fit_statistics(self, run_stats):
+        '''
+            fit the single best on running statistics of the algorithm runs
+            (same result as fit on the full scenario; 
+            after an update of the statistics, only this cheap step has to be repeated)
+            
+            Arguments
+            ---------
+            run_stats: RunStatistics
+                see incremental.py
+        '''
+        average_perf = run_stats.get_average()
+        self.logger.debug("Average performance:\n%s" % (average_perf))
+        self.single_best = average_perf.idxmin()
+        self.logger.info("Single best: %s" % (self.single_best))
         
-    def predict(self, scenario:ASlibScenario):
+    def predict(self, scenario:ASlibScenario, out_fn:str="results.json"):
         '''
             select an algorithm for each instance in given scenario
             
             the scenario will have the pandas for 
             feature_data, feature_runstatus_data
+            
+            Arguments
+            ---------
+            scenario: ASlibScenario
+                scenario with test data
+            out_fn: str
+                file name of the results file; 
+                if None, the predictions are not written to disk;
+                if it ends with .jsonl, each prediction is written
+                as one line as soon as it is computed
+                (see results_io.py)
+                
+            Returns
+            -------
+            dict: instance name -> schedule
+                (None if the predictions are streamed to a .jsonl file)
         '''
         
         # get features
@@ -93,32 +223,119 @@ class SingleBest(object):
         #print("Test Features")
         #print(features)
         
-        # we ignore the features in this example
-        # and only iterate over all instances
+        # select an algorithm for all instances at once
+        # (SingleBest ignores the features; see regression_selector.py)
+        with self.profiler.stage("select", n_instances=features.shape[0]):
+            selection = self.select(scenario=scenario)
+        
+        # iterate over all instances
         # and build result dictionary
-        predictions = {}
-        for inst_ in features.index:
-            # always predict single best algorithm
-            # as a show case, distinguish between runtime and quality
-            if scenario.performance_type[0] == "runtime":
-                predictions[inst_] = [(self.single_best,scenario.algorithm_cutoff_time)]
-            elif scenario.performance_type[0] == "solution_quality":
-                predictions[inst_] = [(self.single_best,999999999999)]
-                
+        # streamed results are not kept in memory
+        streamed = out_fn is not None and is_streamed(out_fn)
+        predictions = None if streamed else {}
+        
         # dump results to disk
         # overwrites old results!
-        with open("results.json", "w") as fp:
-            json.dump(predictions, fp=fp, indent=2)
+        writer = ResultsWriter(out_fn) if out_fn is not None else None
+        try:
+            with self.profiler.stage("build_schedules", n_instances=features.shape[0]):
+                for inst_, algo in zip(features.index, selection):
+                    schedule = self.get_schedule(algo=algo, scenario=scenario)
+                    if writer is not None:
+                        writer.write(inst_, schedule)
+                    if predictions is not None:
+                        predictions[inst_] = schedule
+        finally:
+            if writer is not None:
+                # (writes the whole file if it is not streamed)
+                with self.profiler.stage("dump_results", n_instances=features.shape[0]):
+                    writer.close()
+        
+        return predictions
+    
+    def select(self, scenario:ASlibScenario):
+        '''
+            selects an algorithm for each instance in scenario.feature_data
+            
+            Returns
+            -------
+            list of algorithm names (in the order of scenario.feature_data.index)
+        '''
+        # always predict single best algorithm
+        return [self.single_best] * scenario.feature_data.shape[0]
+    
+    def select_from_features(self, X):
+        '''
+            selects an algorithm for each row of a feature matrix
+            (columns as in get_feature_names)
+            
+            Returns
+            -------
+            list of algorithm names
+        '''
+        return [self.single_best] * len(X)
+    
+    def get_feature_names(self):
+        '''
+            features required by select_from_features
+        '''
+        return []
+    
+    def get_schedule(self, algo:str, scenario:ASlibScenario):
+        '''
+            returns the schedule to run algo on an instance of scenario
+        '''
+        # as a show case, distinguish between runtime and quality
+        if scenario.performance_type[0] == "runtime":
+            return [(algo,scenario.algorithm_cutoff_time)]
+        elif scenario.performance_type[0] == "solution_quality":
+            return [(algo,999999999999)]
+    
+    def get_state(self):
+        '''
+            returns the fitted state as a dictionary 
+            (JSON-serializable, except for numpy arrays)
+        '''
+        return {"single_best": self.single_best}
+    
+    def set_state(self, state:dict):
+        '''
+            restores a state returned by get_state
+        '''
+        self.single_best = state["single_best"]
                 
 if __name__ == "__main__":
 
     parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
     parser.add_argument("--train_as", help="Directory with training data in ASlib format")
     parser.add_argument("--test_as", help="Directory with test data in ASlib format")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+    parser.add_argument("--stream_runs", default=False, action="store_true", help="Read algorithm_runs.arff chunk by chunk (bounded memory)")
+    parser.add_argument("--aggregation", default="mean", choices=AGGREGATIONS, help="Criterion to choose the single best")
+    parser.add_argument("--repetitions", default=False, action="store_true", help="Keep all repetitions of the algorithm runs (for --aggregation par10 or solved)")
+    parser.add_argument("--lazy", default=False, action="store_true", help="Read only the training files that are required (no cache)")
+    parser.add_argument("--out_fn", default="results.json", help="Results file (.json or .jsonl with one instance per line)")
+    parser.add_argument("--profile", default=None, help="Write timing and memory report of all stages to this JSON file")
+    parser.add_argument("--save_model", default=None, help="Save the fitted model to this file (.npz; see predict.py)")
     
     args_ = parser.parse_args()
     
-    sb = SingleBest()
+    logging.basicConfig(level="INFO")
+    
+    sb = SingleBest(aggregation=args_.aggregation)
+    if args_.profile:
+        sb.profiler = Profiler()
     sb.main(train_scenario_dn=args_.train_as,
-            test_scenario_dn=args_.test_as)
+            test_scenario_dn=args_.test_as,
+            cache_dn=args_.cache_dir,
+            use_cache=not args_.no_cache,
+            stream_runs=args_.stream_runs,
+            keep_repetitions=args_.repetitions,
+            lazy=args_.lazy,
+            out_fn=args_.out_fn,
+            model_fn=args_.save_model)
+    if args_.profile:
+        sb.profiler.show()
+        sb.profiler.write(args_.profile)
         
\ No newline at end of file
@@ -0,0 +1,537 @@
+# Author: Marius Lindauer
+# License: BSD
+# Sweep over selector configurations
+#
+# A grid of selector configurations (e.g., the aggregation of SingleBest,
+# the feature steps of RegressionSelector and the number of presolvers
+# of ScheduleBuilder) is cross-validated on the folds of cv.arff.
+# Each fold runs in its own worker process (forked after the scenario
+# was loaded, as in cross_validation.py) and evaluates all configurations.
+#
+# Intermediate artifacts are memoized in a content-addressed LRU cache
+# (see artifact_cache.py):
+#   - the cv folds (training and test scenario) and their oracle and SBS
+#   - the feature matrix of each set of feature steps
+#     (computed once for all instances before the workers are forked)
+#   - the fitted selectors
+#     (e.g., ScheduleBuilder reuses the fitted RegressionSelector of the fold)
+# With --results_cache, the validation results of each fold and configuration
+# are stored on disk, such that a repeated sweep evaluates only new configurations.
+
+import csv
+import time
+import json
+import hashlib
+import inspect
+import logging
+import itertools
+import multiprocessing
+from collections import OrderedDict
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+import numpy as np
+import pandas as pd
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.single_best import AGGREGATIONS
+from oasc_starterkit.regression_selector import RegressionSelector
+from oasc_starterkit.schedule_builder import ScheduleBuilder
+from oasc_starterkit.scenario_cache import read_scenario
+from oasc_starterkit.cross_validation import CrossValidator
+from oasc_starterkit.artifact_cache import LRUCache, DiskLRUCache, content_key
+from oasc_starterkit.model_io import SELECTORS, get_selector_class
+from validation.validate import Stats, Validator
+from validation.baselines import get_baselines
+
+# part of the keys of stored results;
+# has to be increased if the evaluation changes
+SWEEP_VERSION = 2
+
+# final selector of "schedule" if not given
+DEFAULT_FINAL = {"selector": "single_best"}
+
+REPORT_FIELDS = ["config", "selector", "n_folds", "cached_folds",
+                 "score", "oracle", "sbs", "closed_gap",
+                 "fit_sec", "predict_sec", "validate_sec"]
+
+# data shared with forked worker processes
+_SHARED = {}
+
+
+def normalize_config(config: dict) -> dict:
+    '''
+        removes the arguments with default values,
+        such that equal configurations have the same content key
+    '''
+    name = config["selector"]
+    if name not in SELECTORS:
+        raise ValueError("Unknown selector %s (choose from %s)" % (name, sorted(SELECTORS)))
+    params = inspect.signature(get_selector_class(SELECTORS[name]).__init__).parameters
+    normalized = {"selector": name}
+    for arg, value in config.items():
+        if arg == "selector":
+            continue
+        if name == "schedule" and arg == "final":
+            value = normalize_config(value)
+            if value["selector"] == "schedule":
+                raise ValueError("The final selector of a schedule cannot be a schedule")
+            if value != DEFAULT_FINAL:
+                normalized[arg] = value
+            continue
+        if arg not in params or arg in ["self", "selector"]:
+            raise ValueError("Unknown argument %s of selector %s" % (arg, name))
+        if value != params[arg].default:
+            normalized[arg] = value
+    return normalized
+
+
+def expand_grid(grid: list) -> list:
+    '''
+        expands a grid of selector configurations
+
+        Arguments
+        ---------
+        grid: list
+            dicts with the name of the selector (key "selector", see SELECTORS)
+            and a list of alternative values for each argument of the selector;
+            "final" of "schedule" is a list of grids of the final selector, e.g.,
+            [{"selector": "regression", "alpha": [0.1, 1.0], "feature_steps": [null, ["Pre"]]},
+             {"selector": "schedule", "max_presolvers": [1, 2], "final": [{"selector": "regression"}]}]
+
+        Returns
+        -------
+        list of configurations (dicts with one value per argument; without duplicates)
+    '''
+    configs = OrderedDict()
+    for entry in grid:
+        args = sorted(arg for arg in entry if arg != "selector")
+        alternatives = []
+        for arg in args:
+            values = entry[arg] if isinstance(entry[arg], list) else [entry[arg]]
+            if arg == "final":
+                values = expand_grid(values)
+            alternatives.append(values)
+        for values in itertools.product(*alternatives):
+            config = dict(zip(args, values))
+            config["selector"] = entry["selector"]
+            config = normalize_config(config)
+            configs[content_key(config)] = config
+    return list(configs.values())
+
+
+def default_grid(scenario: ASlibScenario) -> list:
+    '''
+        grid of the aggregations of SingleBest,
+        the feature steps of RegressionSelector
+        (all, default and each single step)
+        and 0-2 presolvers of ScheduleBuilder (runtime only)
+    '''
+    runtime = scenario.performance_type[0] == "runtime"
+    steps = [None]
+    if scenario.feature_steps_default and \
+            sorted(scenario.feature_steps_default) != sorted(scenario.feature_steps):
+        steps.append(list(scenario.feature_steps_default))
+    if len(scenario.feature_steps) > 1:
+        steps.extend([step] for step in scenario.feature_steps)
+    grid = [{"selector": "single_best",
+             "aggregation": [agg for agg in AGGREGATIONS if runtime or agg != "par10"]},
+            {"selector": "regression", "feature_steps": steps}]
+    if runtime:
+        grid.append({"selector": "schedule", "max_presolvers": [0, 1, 2],
+                     "final": [{"selector": "single_best"}, {"selector": "regression"}]})
+    return grid
+
+
+def config_name(config: dict) -> str:
+    '''
+        short description of a configuration, e.g., "schedule(max_presolvers=2, final=regression())"
+    '''
+    args = []
+    for arg in sorted(config):
+        if arg == "selector":
+            continue
+        value = config[arg]
+        if isinstance(value, dict):
+            value = config_name(value)
+        elif isinstance(value, list):
+            value = "+".join(str(v) for v in value)
+        args.append("%s=%s" % (arg, value))
+    return "%s(%s)" % (config["selector"], ", ".join(args))
+
+
+def build_selector(config: dict):
+    '''
+        unfitted selector of a configuration
+    '''
+    args = dict((arg, value) for arg, value in config.items() if arg not in ["selector", "final"])
+    if config["selector"] == "schedule":
+        args["selector"] = build_selector(config.get("final", DEFAULT_FINAL))
+    return get_selector_class(SELECTORS[config["selector"]])(**args)
+
+
+def scenario_digest(scenario: ASlibScenario) -> str:
+    '''
+        content hash of the data and the description of a scenario
+    '''
+    parts = [scenario.performance_type, scenario.maximize, scenario.algorithm_cutoff_time,
+             scenario.feature_group_dict]
+    for name in ["performance_data", "runstatus_data", "feature_data", "feature_runstatus_data",
+                 "feature_cost_data", "cv_data"]:
+        frame = getattr(scenario, name)
+        if frame is None:
+            parts.append(None)
+            continue
+        values = pd.util.hash_pandas_object(frame, index=True).values
+        parts.append([list(map(str, frame.columns)), hashlib.sha1(values.tobytes()).hexdigest()])
+    return content_key(*parts)
+
+
+def _stats_to_dict(stat: Stats) -> dict:
+    return dict((attr, float(getattr(stat, attr))) for attr in Stats.COUNTERS)
+
+
+def _get_feature_matrix(selector: RegressionSelector):
+    '''
+        feature matrix of all instances of the shared scenario
+        for the features of selector (see RegressionSelector.set_features)
+
+        Returns
+        -------
+        index: pd.Index
+            instances (rows)
+        X: np.ndarray
+    '''
+    scenario = _SHARED["scenario"]
+
+    def compute():
+        instances = scenario.feature_data.index
+        return instances, selector.get_features(scenario=scenario, instances=instances)
+
+    key = content_key(_SHARED["digest"], "features", selector.features, selector.step_features)
+    return _SHARED["cache"].get_or_compute(key, compute)
+
+
+def _get_features(selector: RegressionSelector, scenario: ASlibScenario, instances) -> np.ndarray:
+    '''
+        rows of the memoized feature matrix
+    '''
+    index, X = _get_feature_matrix(selector)
+    rows = index.get_indexer(instances)
+    if (rows < 0).any():
+        # e.g., instances with runs but without features
+        return selector.get_features(scenario=scenario, instances=instances)
+    return X[rows]
+
+
+def _get_fold(fold: int):
+    '''
+        test and training scenario of a fold (and their oracle and SBS)
+    '''
+    def compute():
+        test_scenario, train_scenario = _SHARED["scenario"].get_split(indx=fold)
+        baselines = get_baselines(test_scenario=test_scenario, train_scenario=train_scenario)
+        return test_scenario, train_scenario, baselines
+
+    return _SHARED["cache"].get_or_compute(content_key(_SHARED["digest"], "fold", fold), compute)
+
+
+def _get_fitted(config: dict, fold: int, train_scenario: ASlibScenario):
+    '''
+        selector of config fitted on the training instances of fold
+    '''
+    cache = _SHARED["cache"]
+    key = content_key(_SHARED["digest"], "model", fold, config)
+    selector = cache.get(key)
+    if selector is not None:
+        return selector
+
+    selector = build_selector(config)
+    if isinstance(selector, ScheduleBuilder):
+        # the fitted final selector is not modified by the schedule builder
+        selector.selector = _get_fitted(config.get("final", DEFAULT_FINAL), fold, train_scenario)
+        selector.fit_presolvers(scenario=train_scenario)
+    elif isinstance(selector, RegressionSelector):
+        selector.set_features(scenario=train_scenario)
+        X = _get_features(selector, train_scenario, train_scenario.performance_data.index)
+        selector.fit(scenario=train_scenario, X=X)
+    else:
+        selector.fit(scenario=train_scenario)
+    cache.put(key, selector)
+    return selector
+
+
+def _predict(selector, test_scenario: ASlibScenario) -> OrderedDict:
+    '''
+        schedules of all test instances
+        (as SingleBest.predict, but with the memoized feature matrix)
+    '''
+    instances = test_scenario.feature_data.index
+    source = selector.selector if isinstance(selector, ScheduleBuilder) else selector
+    if isinstance(source, RegressionSelector):
+        X = _get_features(source, test_scenario, instances)
+    else:
+        X = np.empty((len(instances), 0))
+    selection = selector.select_from_features(X)
+    return OrderedDict((inst, selector.get_schedule(algo=algo, scenario=test_scenario))
+                       for inst, algo in zip(instances, selection))
+
+
+def _run_fold(task):
+    '''
+        fits, predicts and validates configurations on one cv fold
+        (on the scenario shared by SweepRunner.run)
+
+        Arguments
+        ---------
+        task: tuple
+            fold and indices of the configurations
+
+        Returns
+        -------
+        fold: int
+        results: dict index of configuration -> dict with the Stats counters
+            and the seconds of fit, predict and validate
+        cache_stats: dict
+            hits, misses and evictions of the memory cache during the task
+    '''
+    fold, config_ids = task
+    cache = _SHARED["cache"]
+    before = cache.get_stats()
+    test_scenario, train_scenario, baselines = _get_fold(fold)
+    runtime = test_scenario.performance_type[0] == "runtime"
+
+    results = {}
+    for idx in config_ids:
+        config = _SHARED["configs"][idx]
+        start = time.perf_counter()
+        selector = _get_fitted(config, fold, train_scenario)
+        fitted = time.perf_counter()
+        schedules = _predict(selector, test_scenario)
+        predicted = time.perf_counter()
+        validator = Validator(log_instances=False)
+        if runtime:
+            stat = validator.validate_runtime(schedules=schedules, test_scenario=test_scenario,
+                                              train_scenario=train_scenario, baselines=baselines)
+        else:
+            stat = validator.validate_quality(schedules=schedules, test_scenario=test_scenario,
+                                              train_scenario=train_scenario, baselines=baselines)
+        result = _stats_to_dict(stat)
+        result.update({"fit_sec": fitted - start,
+                       "predict_sec": predicted - fitted,
+                       "validate_sec": time.perf_counter() - predicted})
+        results[idx] = result
+
+    after = cache.get_stats()
+    cache_stats = dict((name, after[name] - before[name]) for name in ["hits", "misses", "evictions"])
+    return fold, results, cache_stats
+
+
+class SweepRunner(object):
+
+    def __init__(self, configs: list, n_jobs: int = None, cache_mb: float = 1024,
+                 results_dn: str = None, results_mb: float = 256):
+        '''
+            Arguments
+            ---------
+            configs: list
+                selector configurations (see expand_grid)
+            n_jobs: int
+                number of worker processes (default: number of cores);
+                folds run sequentially if n_jobs == 1 or if
+                worker processes cannot be forked on this platform
+            cache_mb: float
+                size of the memory cache of each worker process
+                (folds, feature matrices and fitted selectors)
+            results_dn: str
+                directory of the stored validation results (None: not stored)
+            results_mb: float
+                maximal size of results_dn
+        '''
+        self.configs = [normalize_config(config) for config in configs]
+        for config in self.configs:
+            build_selector(config)
+        self.n_jobs = n_jobs
+        self.cache_mb = cache_mb
+        self.results_dn = results_dn
+        self.results_mb = results_mb
+        self.logger = logging.getLogger("Sweep")
+
+    def run(self, scenario: ASlibScenario):
+        '''
+            cross-validates all configurations
+
+            Arguments
+            ---------
+            scenario: ASlibScenario
+                scenario with training data and cv.arff
+
+            Returns
+            -------
+            rows: list
+                dicts with REPORT_FIELDS (in the order of the configurations)
+            summary: dict
+                number of evaluations, time and cache statistics
+        '''
+        start = time.perf_counter()
+        folds = CrossValidator().get_folds(scenario)
+        digest = scenario_digest(scenario)
+        store = DiskLRUCache(self.results_dn, max_mb=self.results_mb) if self.results_dn else None
+
+        # results stored by a previous sweep
+        results = {}
+        keys = {}
+        pending = OrderedDict()
+        for fold in folds:
+            for idx, config in enumerate(self.configs):
+                keys[(idx, fold)] = content_key(SWEEP_VERSION, digest, fold, config)
+                result = store.get(keys[(idx, fold)]) if store else None
+                if result is not None:
+                    results[(idx, fold)] = dict(result, cached=True)
+                else:
+                    pending.setdefault(fold, []).append(idx)
+        n_cached = len(results)
+
+        cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        n_jobs = min(self.n_jobs or multiprocessing.cpu_count(), max(len(pending), 1))
+        _SHARED.update({"scenario": scenario, "digest": digest, "configs": self.configs,
+                        "cache": LRUCache(max_mb=self.cache_mb)})
+        try:
+            if pending:
+                # the workers share the feature matrices computed here
+                self._prepare_features(pending)
+            if n_jobs > 1 and "fork" in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context("fork")
+                with ctx.Pool(processes=n_jobs) as pool:
+                    fold_results = list(pool.imap_unordered(_run_fold, pending.items()))
+            else:
+                fold_results = list(map(_run_fold, pending.items()))
+        finally:
+            _SHARED.clear()
+
+        for fold, fold_result, task_stats in fold_results:
+            for idx, result in fold_result.items():
+                results[(idx, fold)] = result
+                if store:
+                    store.put(keys[(idx, fold)], result)
+            for name in cache_stats:
+                cache_stats[name] += task_stats[name]
+        if store:
+            store.evict()
+
+        rows = [self._aggregate(scenario, idx, folds, results) for idx in range(len(self.configs))]
+        summary = {"configs": len(self.configs), "folds": len(folds),
+                   "evaluated": len(results) - n_cached, "cached": n_cached,
+                   "n_jobs": n_jobs, "seconds": time.perf_counter() - start,
+                   "cache": cache_stats}
+        self.show(rows, summary)
+        return rows, summary
+
+    def _prepare_features(self, pending: OrderedDict):
+        '''
+            computes the feature matrices of all feature-based configurations
+        '''
+        scenario = _SHARED["scenario"]
+        configs = [self.configs[idx] for idx in sorted(set(itertools.chain(*pending.values())))]
+        for config in configs:
+            if config["selector"] == "schedule":
+                config = config.get("final", DEFAULT_FINAL)
+            selector = build_selector(config)
+            if isinstance(selector, RegressionSelector):
+                selector.set_features(scenario=scenario)
+                _get_feature_matrix(selector)
+
+    def _aggregate(self, scenario: ASlibScenario, idx: int, folds: list, results: dict) -> OrderedDict:
+        '''
+            statistics of a configuration over all folds
+        '''
+        runtime = scenario.performance_type[0] == "runtime"
+        stat = Stats(runtime_cutoff=scenario.algorithm_cutoff_time if runtime else None,
+                     maximize=scenario.maximize[0])
+        row = OrderedDict((field, None) for field in REPORT_FIELDS)
+        row["config"] = config_name(self.configs[idx])
+        row["selector"] = self.configs[idx]["selector"]
+        row["n_folds"] = len(folds)
+        row["cached_folds"] = 0
+        for field in ["fit_sec", "predict_sec", "validate_sec"]:
+            row[field] = 0.0
+        for fold in folds:
+            result = results[(idx, fold)]
+            fold_stat = Stats(runtime_cutoff=stat.runtime_cutoff, maximize=stat.maximize)
+            for attr in Stats.COUNTERS:
+                setattr(fold_stat, attr, result[attr])
+            stat.add(fold_stat)
+            if result.get("cached"):
+                row["cached_folds"] += 1
+            else:
+                for field in ["fit_sec", "predict_sec", "validate_sec"]:
+                    row[field] += result[field]
+        remove_unsolvable = runtime
+        row["score"] = float(stat.get_score(remove_unsolvable))
+        row["oracle"] = float(stat.get_score_oracle(remove_unsolvable))
+        row["sbs"] = float(stat.get_score_sbs(remove_unsolvable))
+        row["closed_gap"] = float(stat.get_closed_gap(remove_unsolvable))
+        return row
+
+    def show(self, rows: list, summary: dict):
+        '''
+            logs the configurations ordered by closed gap
+        '''
+        self.logger.info("Closed gap\tScore\tFit [sec]\tConfiguration")
+        for row in sorted(rows, key=lambda row: -row["closed_gap"] if not np.isnan(row["closed_gap"]) else np.inf):
+            self.logger.info("%.4f\t%.4f\t%.2f\t%s" % (row["closed_gap"], row["score"], row["fit_sec"], row["config"]))
+        self.logger.info("%d configurations x %d folds: %d evaluated, %d stored results, "
+                         "%.2f sec with %d workers" % (summary["configs"], summary["folds"], summary["evaluated"],
+                                                       summary["cached"], summary["seconds"], summary["n_jobs"]))
+        self.logger.info("Memory cache: %d hits, %d misses, %d evictions" %
+                         (summary["cache"]["hits"], summary["cache"]["misses"], summary["cache"]["evictions"]))
+
+
+def write_report(rows: list, summary: dict, fn: str):
+    '''
+        writes the rows as CSV or the rows and the summary as JSON (if fn ends with .json)
+    '''
+    with open(fn, "w") as fp:
+        if fn.endswith(".json"):
+            json.dump({"summary": summary, "configs": rows}, fp, indent=2)
+        else:
+            writer = csv.DictWriter(fp, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--train_as", help="Directory with training data in ASlib format (incl. cv.arff)")
+    parser.add_argument("--grid", default=None, help="JSON file with the grid of selector configurations (default: see default_grid)")
+    parser.add_argument("--n_jobs", type=int, default=None, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("--memory_cache_mb", type=float, default=1024, help="Size of the memory cache of each worker (folds, feature matrices, fitted selectors)")
+    parser.add_argument("--results_cache", default=None, help="Directory to store the validation results of each fold and configuration")
+    parser.add_argument("--results_cache_mb", type=float, default=256, help="Maximal size of the results directory")
+    parser.add_argument("--report", default=None, help="Write the scores of all configurations to this file (.csv or .json)")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+    parser.add_argument("--verbose", default="INFO", choices=["DEBUG", "INFO", "WARNING"], help="Logging level")
+
+    args_ = parser.parse_args()
+
+    logging.basicConfig(level=args_.verbose)
+    # one line per configuration instead of the statistics of each validation
+    if args_.verbose != "DEBUG":
+        for name in ["SingleBest", "RegressionSelector", "ScheduleBuilder", "Validation", "Stats"]:
+            logging.getLogger(name).setLevel("WARNING")
+
+    scenario = read_scenario(dn=args_.train_as, cache_dn=args_.cache_dir,
+                             use_cache=not args_.no_cache)
+    if args_.grid:
+        with open(args_.grid) as fp:
+            grid = json.load(fp)
+    else:
+        grid = default_grid(scenario)
+
+    runner = SweepRunner(configs=expand_grid(grid), n_jobs=args_.n_jobs, cache_mb=args_.memory_cache_mb,
+                         results_dn=args_.results_cache, results_mb=args_.results_cache_mb)
+    rows, summary = runner.run(scenario=scenario)
+    if args_.report:
+        write_report(rows=rows, summary=summary, fn=args_.report)
@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+from oasc_starterkit.scenario_cache import read_scenario
+
+__license__ = "BSD"
+
+EXAMPLE_DN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_files")
+TRAIN_DN = os.path.join(EXAMPLE_DN, "SAT11-INDU-TRAIN")
+TEST_DN = os.path.join(EXAMPLE_DN, "SAT11-INDU-TEST")
+
+
+@pytest.fixture(scope="session")
+def train_scenario():
+    """
+        SAT11-INDU-TRAIN parsed by ASlibScenario (without cache);
+        tests must not modify it
+    """
+    return read_scenario(dn=TRAIN_DN, use_cache=False)
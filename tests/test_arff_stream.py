@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from oasc_starterkit.arff_stream import read_scenario_streamed
+from oasc_starterkit.runstatus import get_status
+
+from conftest import TRAIN_DN
+
+__license__ = "BSD"
+
+
+@pytest.mark.parametrize("chunk_size,keep_repetitions", [(100000, False), (1000, False), (1000, True)])
+def test_streamed_equals_aslib_parse(train_scenario, chunk_size, keep_repetitions):
+    streamed = read_scenario_streamed(dn=TRAIN_DN, chunk_size=chunk_size, keep_repetitions=keep_repetitions)
+    insts, algos = train_scenario.performance_data.index, train_scenario.performance_data.columns
+    assert sorted(streamed.instances) == sorted(train_scenario.instances)
+    assert sorted(streamed.performance_data.columns) == sorted(algos)
+
+    perf = streamed.performance_data.reindex(index=insts, columns=algos)
+    status = streamed.runstatus_data.reindex(index=insts, columns=algos)
+    # float32 performance matrix
+    np.testing.assert_allclose(perf.values, train_scenario.performance_data.values, rtol=1e-6)
+    np.testing.assert_array_equal(status.astype(object).values,
+                                  train_scenario.runstatus_data.astype(object).values)
+
+    # timeouts are imputed with PAR10
+    cutoff = train_scenario.algorithm_cutoff_time
+    timeouts = train_scenario.runstatus_data.values == "timeout"
+    assert timeouts.any()
+    np.testing.assert_array_equal(perf.values[timeouts], 10 * cutoff)
+    np.testing.assert_array_equal(get_status(streamed).runs.reindex(insts, algos).timeout, timeouts)
+    par10 = np.where(status.values == "ok", perf.values, 10 * cutoff)
+    np.testing.assert_allclose(par10.mean(), train_scenario.performance_data.values.mean(), rtol=1e-6)
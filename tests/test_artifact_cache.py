@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+
+from oasc_starterkit.artifact_cache import LRUCache, DiskLRUCache, content_key, estimate_nbytes
+
+__license__ = "BSD"
+
+
+def test_lru_cache():
+    cache = LRUCache(max_mb=300 / 1024. / 1024.)
+    assert cache.max_bytes == 300
+    for key in ["a", "b", "c"]:
+        cache.put(key, key.upper(), nbytes=100)
+    assert cache.nbytes == 300 and len(cache) == 3
+
+    # "a" was used last; "b" is the least recently used entry
+    assert cache.get("a") == "A"
+    cache.put("d", "D", nbytes=100)
+    assert list(cache.entries) == ["c", "a", "d"]
+    assert cache.nbytes == 300 and cache.evictions == 1
+
+    # a larger entry evicts several entries
+    cache.put("e", "E", nbytes=250)
+    assert list(cache.entries) == ["e"]
+    assert cache.nbytes == 250 and cache.evictions == 4
+
+    # replacing an entry updates the size
+    cache.put("e", "E2", nbytes=50)
+    assert cache.get("e") == "E2" and cache.nbytes == 50
+
+    # an entry larger than the cache is not stored (and does not evict anything)
+    cache.put("big", np.zeros(100), nbytes=None)
+    assert estimate_nbytes(np.zeros(100)) == 800
+    assert "big" not in cache and list(cache.entries) == ["e"] and cache.nbytes == 50
+    assert cache.get_or_compute("big", lambda: "computed") == "computed"
+    assert cache.get("missing", default=1) == 1
+    assert cache.get_stats()["hits"] == 2 and cache.get_stats()["misses"] == 2
+
+
+def test_disk_lru_cache(tmpdir):
+    cache = DiskLRUCache(str(tmpdir.join("results")), max_mb=2500 / 1024. / 1024.)
+    keys = [content_key("result", idx) for idx in range(3)]
+    for age, key in zip([300, 200, 100], keys):
+        cache.put(key, {"value": "x" * 1000})
+        fn = os.path.join(cache.dn, "%s.json" % (key))
+        mtime = os.stat(fn).st_mtime - age
+        os.utime(fn, (mtime, mtime))
+    assert cache.evict() == 1
+    # the oldest file was removed
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) == {"value": "x" * 1000}
+
+    # get marks keys[1] as used; keys[2] is now the oldest file
+    cache.put(content_key("result", 3), {"value": "y" * 1000})
+    assert cache.evict() == 1
+    assert cache.get(keys[2]) is None
+    assert cache.get(keys[1]) is not None
+    assert cache.get(content_key("result", 3)) == {"value": "y" * 1000}
+    assert cache.evict() == 0
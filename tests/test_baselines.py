@@ -0,0 +1,44 @@
+import os
+import copy
+import shutil
+
+import numpy as np
+
+from validation.baselines import BaselineIndex, get_baselines
+
+from conftest import TRAIN_DN
+
+__license__ = "BSD"
+
+
+def test_index_location_and_mode(tmp_path, monkeypatch, train_scenario):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    scenario_dn = str(tmp_path / "SAT11-INDU-TRAIN")
+    shutil.copytree(TRAIN_DN, scenario_dn)
+    files = sorted(os.listdir(scenario_dn))
+
+    # copies: the baselines are memorized in the test scenario (the fixture must not be modified)
+    scenario = copy.copy(train_scenario)
+    index = BaselineIndex()
+    prefix = index._get_prefix(scenario_dn, scenario_dn)
+    assert prefix.startswith(str(tmp_path / "xdg" / "oasc_starterkit" / "baselines"))
+    baselines = index.get(test_dn=scenario_dn, train_dn=scenario_dn,
+                          test_scenario=scenario, train_scenario=scenario)
+    assert sorted(os.listdir(scenario_dn)) == files
+    assert os.path.isfile(prefix + ".npz")
+
+    # different reading modes of the algorithm runs are stored separately
+    prefixes = set([prefix] + [BaselineIndex(stream_runs=True, aggregate=agg)._get_prefix(scenario_dn, scenario_dn)
+                               for agg in ["mean", "median"]] +
+                   [BaselineIndex(keep_repetitions=True)._get_prefix(scenario_dn, scenario_dn)])
+    assert len(prefixes) == 4
+
+    # loaded from the index, not memorized
+    scenario = copy.copy(train_scenario)
+    scenario.baselines = None
+    loaded = BaselineIndex().get(test_dn=scenario_dn, train_dn=scenario_dn,
+                                 test_scenario=scenario, train_scenario=scenario)
+    computed = get_baselines(test_scenario=scenario, train_scenario=scenario)
+    assert loaded is computed and loaded is not baselines
+    assert loaded.sbs == baselines.sbs
+    np.testing.assert_array_equal(loaded.oracle, baselines.oracle)
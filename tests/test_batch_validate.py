@@ -0,0 +1,80 @@
+import copy
+import json
+
+import pytest
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.regression_selector import RegressionSelector
+from validation.validate import Validator
+from validation.baselines import get_baselines
+from validation.batch_validate import BatchValidator
+
+from conftest import TRAIN_DN
+
+__license__ = "BSD"
+
+
+@pytest.fixture(scope="module")
+def submissions(train_scenario, tmp_path_factory):
+    # SAT11-INDU-TEST has no algorithm runs; the submissions are validated on the training data
+    dn = tmp_path_factory.mktemp("submissions")
+    fns = []
+    for selector in [SingleBest(), RegressionSelector()]:
+        selector.fit(scenario=train_scenario)
+        fn = str(dn / ("%s.json" % (selector.__class__.__name__)))
+        selector.predict(scenario=train_scenario, out_fn=fn)
+        fns.append(fn)
+    return fns
+
+
+def entry(result_fn, test_as=TRAIN_DN):
+    return {"scenario": "SAT11-INDU", "train_as": TRAIN_DN, "test_as": test_as, "result_fn": result_fn}
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_batch_equals_validator(train_scenario, submissions, n_jobs):
+    rows = BatchValidator(n_jobs=n_jobs, use_cache=False).run([entry(fn) for fn in submissions])
+    # a copy: the baselines are memorized in the test scenario
+    scenario = copy.copy(train_scenario)
+    baselines = get_baselines(test_scenario=scenario, train_scenario=scenario)
+    for fn, row in zip(submissions, rows):
+        with open(fn) as fp:
+            schedules = json.load(fp)
+        stat = Validator(log_instances=False).validate_runtime(
+            schedules=schedules, test_scenario=scenario,
+            train_scenario=scenario, baselines=baselines)
+        assert row["result_fn"] == fn
+        assert row["error"] is None
+        assert row["par1"] == stat.get_par1(True)
+        assert row["par10"] == stat.get_par10(True)
+        assert row["timeouts"] == stat.get_time_outs(True)
+        assert row["solved"] == stat.solved
+        assert row["unsolvable"] == stat.unsolvable
+        assert row["closed_gap"] == stat.get_closed_gap(True)
+
+
+def test_errors_are_reported_per_entry(tmp_path, submissions):
+    broken_fn = str(tmp_path / "broken.json")
+    with open(broken_fn, "w") as fp:
+        fp.write("{\"inst\": ")
+    incomplete_fn = str(tmp_path / "incomplete.json")
+    with open(submissions[0]) as fp:
+        schedules = json.load(fp)
+    with open(incomplete_fn, "w") as fp:
+        json.dump(dict(list(schedules.items())[:10]), fp)
+    missing_dn = str(tmp_path / "no_such_scenario")
+
+    entries = [entry(broken_fn), entry(submissions[0]), entry(str(tmp_path / "missing.json")),
+               entry(incomplete_fn), entry(submissions[0], test_as=missing_dn),
+               entry(submissions[1], test_as=missing_dn)]
+    rows = BatchValidator(n_jobs=1, use_cache=False).run(entries)
+
+    assert [row["result_fn"] for row in rows] == [e["result_fn"] for e in entries]
+    assert rows[0]["error"].startswith("JSONDecodeError")
+    assert rows[1]["error"] is None and rows[1]["par10"] is not None
+    assert rows[2]["error"].startswith("FileNotFoundError")
+    assert rows[3]["error"] == "missing predictions"
+    # each entry of a scenario pair that cannot be loaded gets an error row
+    for row in rows[4:]:
+        assert row["error"] is not None and row["par10"] is None
+    assert rows[4]["error"] == rows[5]["error"]
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.regression_selector import RegressionSelector
+from validation.validate import Validator
+from validation.bootstrap import bootstrap, permutation_test
+
+__license__ = "BSD"
+
+
+def validate(selector, scenario, seed=1, bootstrap_samples=500):
+    test_scenario, train_scenario = scenario.get_split(indx=1)
+    selector.fit(scenario=train_scenario)
+    schedules = selector.predict(scenario=test_scenario, out_fn=None)
+    return Validator(log_instances=False, bootstrap_samples=bootstrap_samples, seed=seed).validate_runtime(
+        schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario)
+
+
+def test_same_seed_same_result(train_scenario):
+    stat = validate(RegressionSelector(), train_scenario)
+    for _ in range(2):
+        again = validate(RegressionSelector(), train_scenario)
+        for metric in ["score", "closed_gap"]:
+            for key in ["mean", "ci_low", "ci_high"]:
+                assert again.bootstrap[metric][key] == stat.bootstrap[metric][key]
+            assert again.permutation[metric]["p_value"] == stat.permutation[metric]["p_value"]
+
+    outcomes = stat.outcomes
+    for remove_unsolvable in [True, False]:
+        first = bootstrap(outcomes, remove_unsolvable=remove_unsolvable, n_samples=300, seed=7)
+        second = bootstrap(outcomes, remove_unsolvable=remove_unsolvable, n_samples=300, seed=7)
+        np.testing.assert_array_equal(first["samples"]["score"], second["samples"]["score"])
+        first = permutation_test(outcomes, remove_unsolvable=remove_unsolvable, n_permutations=300, seed=7)
+        second = permutation_test(outcomes, remove_unsolvable=remove_unsolvable, n_permutations=300, seed=7)
+        assert first["score"]["p_value"] == second["score"]["p_value"]
+        np.testing.assert_array_equal(first["score"]["null"], second["score"]["null"])
+
+    other_seed = bootstrap(outcomes, n_samples=300, seed=8)
+    assert not np.array_equal(other_seed["samples"]["score"],
+                              bootstrap(outcomes, n_samples=300, seed=7)["samples"]["score"])
+
+
+def test_sbs_has_p_value_one(train_scenario):
+    selector = SingleBest()
+    stat = validate(selector, train_scenario)
+    assert selector.single_best == stat.baselines.sbs
+    assert stat.get_score(True) == pytest.approx(stat.get_score_sbs(True))
+    assert stat.permutation["score"]["observed_diff"] == pytest.approx(0.0)
+    assert stat.permutation["score"]["p_value"] == 1.0
+    assert stat.bootstrap["closed_gap"]["ci_low"] == pytest.approx(0.0, abs=1e-9)
+    assert stat.bootstrap["closed_gap"]["ci_high"] == pytest.approx(0.0, abs=1e-9)
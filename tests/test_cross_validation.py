@@ -0,0 +1,46 @@
+import pytest
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.regression_selector import RegressionSelector
+from oasc_starterkit.cross_validation import CrossValidator
+from validation.validate import Stats, Validator
+
+__license__ = "BSD"
+
+
+def sequential_folds(selector_factory, scenario):
+    """
+        reference: fits, predicts and validates each fold in turn
+        without CrossValidator
+    """
+    fold_stats = {}
+    stat = Stats(runtime_cutoff=scenario.algorithm_cutoff_time, maximize=scenario.maximize[0])
+    for fold in sorted(int(fold) for fold in scenario.cv_data["fold"].unique()):
+        test_scenario, train_scenario = scenario.get_split(indx=fold)
+        selector = selector_factory()
+        selector.fit(scenario=train_scenario)
+        schedules = selector.predict(scenario=test_scenario, out_fn=None)
+        fold_stats[fold] = Validator(log_instances=False).validate_runtime(
+            schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario)
+        stat.add(fold_stats[fold])
+    return fold_stats, stat
+
+
+def assert_same_stats(stat, expected):
+    for attr in Stats.COUNTERS:
+        assert getattr(stat, attr) == pytest.approx(getattr(expected, attr)), attr
+    for remove_unsolvable in [True, False]:
+        assert stat.get_score(remove_unsolvable) == pytest.approx(expected.get_score(remove_unsolvable))
+        assert stat.get_closed_gap(remove_unsolvable) == pytest.approx(expected.get_closed_gap(remove_unsolvable))
+
+
+@pytest.mark.parametrize("selector_factory", [SingleBest, RegressionSelector])
+def test_parallel_equals_sequential(train_scenario, selector_factory):
+    expected_folds, expected = sequential_folds(selector_factory, train_scenario)
+
+    for n_jobs in [1, 2]:
+        fold_stats, stat = CrossValidator(selector_factory=selector_factory, n_jobs=n_jobs).run(train_scenario)
+        assert sorted(fold_stats) == sorted(expected_folds)
+        for fold in expected_folds:
+            assert_same_stats(fold_stats[fold], expected_folds[fold])
+        assert_same_stats(stat, expected)
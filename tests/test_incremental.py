@@ -0,0 +1,128 @@
+import os
+import copy
+
+import numpy as np
+import pytest
+
+from oasc_starterkit.incremental import RunStatistics
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.regression_selector import RegressionSelector
+
+from conftest import TRAIN_DN
+
+__license__ = "BSD"
+
+
+@pytest.fixture
+def split_runs(tmp_path, train_scenario):
+    '''
+        algorithm_runs.arff with the runs of the first half of the instances
+        and a function appending the runs of the other instances
+    '''
+    with open(os.path.join(TRAIN_DN, "algorithm_runs.arff")) as fp:
+        lines = fp.readlines()
+    data_start = [line.strip().upper() for line in lines].index("@DATA") + 1
+    first_insts = set(train_scenario.instances[:len(train_scenario.instances) // 2])
+    first, rest = [], []
+    for line in lines[data_start:]:
+        if line.strip() and not line.startswith("%"):
+            (first if line.split(",")[0] in first_insts else rest).append(line)
+
+    fn = str(tmp_path / "algorithm_runs.arff")
+    with open(fn, "w") as fp:
+        fp.writelines(lines[:data_start] + first)
+
+    def append_rest():
+        with open(fn, "a") as fp:
+            fp.writelines(rest)
+
+    return fn, append_rest
+
+
+def get_scenario(train_scenario, run_stats, instances):
+    scenario = copy.copy(train_scenario)
+    run_stats.get_run_matrix(instances).apply_to(scenario)
+    return scenario
+
+
+def test_incremental_equals_fresh_fit(train_scenario, split_runs):
+    fn, append_rest = split_runs
+    run_stats = RunStatistics.from_scenario(train_scenario)
+    first_insts = run_stats.read_runs(fn)
+    selector = RegressionSelector()
+    selector.fit(scenario=get_scenario(train_scenario, run_stats, first_insts))
+
+    append_rest()
+    new_insts = run_stats.read_runs(fn)
+    assert sorted(first_insts + new_insts) == sorted(train_scenario.instances)
+    selector.partial_fit(scenario=get_scenario(train_scenario, run_stats, new_insts))
+
+    # RunStatistics and single best
+    fresh_stats = RunStatistics.from_scenario(train_scenario)
+    fresh_stats.read_runs(os.path.join(TRAIN_DN, "algorithm_runs.arff"))
+    np.testing.assert_allclose(run_stats.get_average().values, fresh_stats.get_average().values, rtol=1e-12)
+    average = train_scenario.performance_data.mean(axis=0)
+    np.testing.assert_allclose(run_stats.get_average()[average.index].values, average.values, rtol=1e-9)
+    counts = ["instances", "unsolved", "timeouts"]
+    assert (run_stats.get_summary()[counts] == fresh_stats.get_summary().loc[run_stats.algorithms, counts]).all().all()
+
+    single_best = SingleBest()
+    single_best.fit_statistics(run_stats)
+    fresh_single_best = SingleBest()
+    fresh_single_best.fit(scenario=train_scenario)
+    assert single_best.single_best == fresh_single_best.single_best
+
+    # regression model
+    fresh = RegressionSelector()
+    fresh.fit(scenario=train_scenario)
+    order = [selector.algorithms.index(algo) for algo in fresh.algorithms]
+    for key in ["coef", "intercept"]:
+        np.testing.assert_allclose(selector.model[key][..., order], fresh.model[key], rtol=1e-6, atol=1e-9)
+    assert selector.single_best == fresh.single_best
+
+
+def test_partial_fit_rejects_new_algorithms(train_scenario, split_runs):
+    fn, append_rest = split_runs
+    run_stats = RunStatistics.from_scenario(train_scenario)
+    first_insts = run_stats.read_runs(fn)
+    selector = RegressionSelector()
+    selector.fit(scenario=get_scenario(train_scenario, run_stats, first_insts))
+
+    append_rest()
+    new_insts = run_stats.read_runs(fn)
+    scenario = get_scenario(train_scenario, run_stats, new_insts)
+    scenario.performance_data = scenario.performance_data.assign(new_solver_2017=1.0)
+    with pytest.raises(ValueError, match="New algorithms \\(new_solver_2017\\) require fit"):
+        selector.partial_fit(scenario=scenario)
+    # already used instances cannot be added again
+    with pytest.raises(ValueError, match="already used for fitting"):
+        selector.partial_fit(scenario=get_scenario(train_scenario, run_stats, first_insts))
+
+
+def test_small_blocks_and_incomplete_line(train_scenario, split_runs):
+    fn, append_rest = split_runs
+    append_rest()
+    with open(fn, "rb") as fp:
+        size = len(fp.read())
+    # an incomplete last line is not read ...
+    with open(fn, "a") as fp:
+        fp.write("new_instance,1,%s,1.0" % (train_scenario.algorithms[0]))
+
+    fresh_stats = RunStatistics.from_scenario(train_scenario)
+    fresh_stats.read_runs(fn)
+    block_stats = RunStatistics.from_scenario(train_scenario)
+    block_stats.read_runs(fn, chunk_size=50, block_size=4096)
+    for run_stats in [fresh_stats, block_stats]:
+        assert run_stats.offsets[os.path.abspath(fn)] == size
+        assert "new_instance" not in run_stats.instances
+        assert run_stats.n_runs == fresh_stats.n_runs
+    assert block_stats.instances == fresh_stats.instances
+    np.testing.assert_allclose(block_stats.get_average().values, fresh_stats.get_average().values, rtol=1e-12)
+    counts = ["instances", "unsolved", "timeouts"]
+    assert (block_stats.get_summary()[counts] == fresh_stats.get_summary()[counts]).all().all()
+
+    # ... until it is complete
+    with open(fn, "a") as fp:
+        fp.write(",ok\n")
+    assert block_stats.read_runs(fn, block_size=7) == ["new_instance"]
+    assert block_stats.n_runs == fresh_stats.n_runs + 1
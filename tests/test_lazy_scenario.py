@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from oasc_starterkit.lazy_scenario import LazyScenario, COMPONENTS
+from oasc_starterkit.arff_stream import read_scenario_streamed
+
+from conftest import TRAIN_DN, TEST_DN
+
+__license__ = "BSD"
+
+FRAMES = ["performance_data", "runstatus_data", "feature_data", "feature_runstatus_data",
+          "feature_cost_data", "ground_truth_data", "cv_data"]
+
+# attributes accessed first (i.e., files read in different orders)
+ACCESS_ORDERS = [[], ["instances"], ["feature_data", "instances"],
+                 ["cv_data", "feature_cost_data", "instances"], ["performance_data"]]
+
+
+def as_objects(frame: pd.DataFrame) -> pd.DataFrame:
+    # runstatus frames may be categorical (see runstatus.get_status)
+    return frame.apply(lambda col: col.astype(object) if isinstance(col.dtype, pd.CategoricalDtype) else col)
+
+
+def assert_equal_frames(lazy, eager):
+    for name in FRAMES:
+        expected = getattr(eager, name)
+        if expected is None:
+            assert getattr(lazy, name) is None, name
+        else:
+            pd.testing.assert_frame_equal(as_objects(getattr(lazy, name)), as_objects(expected),
+                                          check_dtype=False, obj=name)
+
+
+@pytest.mark.parametrize("order", ACCESS_ORDERS)
+def test_lazy_equals_eager(train_scenario, order):
+    lazy = LazyScenario(dn=TRAIN_DN)
+    for attr in order:
+        getattr(lazy, attr)
+    assert lazy.instances == train_scenario.instances
+    assert_equal_frames(lazy, train_scenario)
+    assert set(lazy.get_loaded_components()) == set(["description.txt"] + list(COMPONENTS))
+
+    test_scenario, _ = lazy.get_split(indx=1)
+    eager_test, _ = train_scenario.get_split(indx=1)
+    assert test_scenario.instances == eager_test.instances
+    assert_equal_frames(test_scenario, eager_test)
+
+
+@pytest.mark.parametrize("order", ACCESS_ORDERS)
+def test_lazy_streamed_equals_streamed(order):
+    eager = read_scenario_streamed(dn=TRAIN_DN)
+    lazy = LazyScenario(dn=TRAIN_DN, stream_runs=True)
+    for attr in order:
+        getattr(lazy, attr)
+    assert lazy.instances == eager.instances
+    assert_equal_frames(lazy, eager)
+
+
+def test_lazy_without_runs():
+    # e.g., the test data of the competition
+    lazy = LazyScenario(dn=TEST_DN)
+    assert lazy.instances == list(lazy.feature_data.index)
+    assert lazy.get_loaded_components() == ["description.txt", "feature_values.arff"]
+    assert lazy.performance_data is None
@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+
+from conftest import TEST_DN
+from oasc_starterkit.model_io import SELECTORS, KNOWN_SELECTORS, ARTIFACT_VERSION, create_named_selector, \
+    get_selector_class, save_model, load_model, scenario_from_meta
+from oasc_starterkit.predict import predict
+from oasc_starterkit.lazy_scenario import LazyScenario
+from oasc_starterkit.regression_selector import RegressionSelector
+from oasc_starterkit.schedule_builder import ScheduleBuilder
+from oasc_starterkit.sweep import build_selector
+
+__license__ = "BSD"
+
+
+def test_named_selectors():
+    assert set(SELECTORS.values()) <= set(KNOWN_SELECTORS)
+    for name, cls_name in SELECTORS.items():
+        assert isinstance(create_named_selector(name), get_selector_class(cls_name))
+    # the command line tools select the final algorithm of a schedule with the regression selector
+    assert isinstance(create_named_selector("schedule").selector, RegressionSelector)
+    # sweep.py configures it (default: single best)
+    selector = build_selector({"selector": "schedule"})
+    assert isinstance(selector, ScheduleBuilder) and not isinstance(selector.selector, RegressionSelector)
+    with pytest.raises(ValueError):
+        create_named_selector("random_forest")
+
+
+def rewrite_meta(fn, **changes):
+    '''
+        changes entries of the meta data of a saved model
+    '''
+    with np.load(fn, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        arrays = dict((key, data[key]) for key in data.files if key != "meta")
+    meta.update(changes)
+    with open(fn, "wb") as fp:
+        np.savez_compressed(fp, meta=np.array(json.dumps(meta)), **arrays)
+
+
+@pytest.mark.parametrize("name", sorted(SELECTORS))
+def test_round_trip(train_scenario, tmpdir, name):
+    selector = create_named_selector(name)
+    selector.fit(scenario=train_scenario)
+    model_fn = str(tmpdir.join("model.npz"))
+    save_model(selector, train_scenario, model_fn)
+
+    loaded, meta = load_model(model_fn)
+    assert type(loaded) is type(selector)
+    assert meta["selector_class"] == SELECTORS[name]
+    assert meta["algorithms"] == list(train_scenario.algorithms)
+    assert loaded.single_best == selector.single_best
+
+    test_scenario = LazyScenario(dn=TEST_DN)
+    expected = selector.predict(scenario=test_scenario, out_fn=None)
+    assert loaded.predict(scenario=test_scenario, out_fn=None) == expected
+    assert predict(model_fn=model_fn, test_scenario_dn=TEST_DN, out_fn=None) == expected
+
+    # schedules built on the scenario description of the model (as in selection_server.py)
+    described = scenario_from_meta(meta)
+    assert described.algorithm_cutoff_time == train_scenario.algorithm_cutoff_time
+    for algo in train_scenario.algorithms:
+        assert loaded.get_schedule(algo=algo, scenario=described) == \
+            selector.get_schedule(algo=algo, scenario=train_scenario)
+
+
+def test_rejected_models(train_scenario, tmpdir):
+    selector = create_named_selector("single_best")
+    selector.fit(scenario=train_scenario)
+    model_fn = str(tmpdir.join("model.npz"))
+
+    save_model(selector, train_scenario, model_fn)
+    rewrite_meta(model_fn, version=ARTIFACT_VERSION + 1)
+    with pytest.raises(ValueError, match="version"):
+        load_model(model_fn)
+
+    save_model(selector, train_scenario, model_fn)
+    rewrite_meta(model_fn, selector_class="RandomForest")
+    with pytest.raises(ValueError, match="Unknown selector class"):
+        load_model(model_fn)
+
+    with pytest.raises(FileNotFoundError):
+        load_model(str(tmpdir.join("missing.npz")))
@@ -0,0 +1,46 @@
+import os
+import multiprocessing
+
+import pytest
+
+import oasc_starterkit.multi_scenario as multi_scenario
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.multi_scenario import MultiScenarioRunner, find_scenarios
+
+from conftest import TRAIN_DN, TEST_DN
+
+__license__ = "BSD"
+
+
+class DyingSelector(SingleBest):
+    '''
+        single best whose worker process dies on scenarios named BROKEN
+    '''
+
+    def main(self, train_scenario_dn: str, **kwargs):
+        if "BROKEN" in train_scenario_dn:
+            os._exit(1)
+        return super().main(train_scenario_dn=train_scenario_dn, **kwargs)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="the patched selector is only inherited by forked workers")
+def test_dead_worker(tmpdir, monkeypatch):
+    scenarios_dn = tmpdir.mkdir("scenarios")
+    for name in ["BROKEN", "SAT11-INDU"]:
+        os.symlink(TRAIN_DN, str(scenarios_dn.join(name + "-TRAIN")))
+        os.symlink(TEST_DN, str(scenarios_dn.join(name + "-TEST")))
+    entries = find_scenarios(str(scenarios_dn))
+    assert [entry["scenario"] for entry in entries] == ["BROKEN", "SAT11-INDU"]
+
+    monkeypatch.setattr(multi_scenario, "create_named_selector", lambda name: DyingSelector())
+    runner = MultiScenarioRunner(n_jobs=2, out_fn=str(tmpdir.join("{scenario}", "results.json")),
+                                 use_cache=False)
+    rows, summary = runner.run(entries)
+
+    broken, ok = rows
+    assert broken["scenario"] == "BROKEN" and "BrokenProcessPool" in broken["error"]
+    assert not os.path.exists(broken["out_fn"])
+    assert ok["scenario"] == "SAT11-INDU" and not ok["error"]
+    assert os.path.isfile(ok["out_fn"]) and ok["n_test"] > 0
+    assert summary["scenarios"] == 2 and summary["failed"] == 1
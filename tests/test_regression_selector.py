@@ -0,0 +1,23 @@
+import numpy as np
+
+from oasc_starterkit.regression_selector import RegressionSelector
+
+__license__ = "BSD"
+
+
+def test_single_best_without_features(train_scenario):
+    selector = RegressionSelector()
+    selector.fit(scenario=train_scenario)
+    assert selector.single_best == train_scenario.performance_data.mean(axis=0).idxmin()
+
+    X = selector.get_features(scenario=train_scenario)
+    expected = selector.select_from_features(X)
+
+    X[0, :] = np.nan
+    X[1, 1:] = np.nan
+    selection = selector.select_from_features(X)
+    assert selection[0] == selector.single_best
+    # an instance with some features is still predicted by the model
+    assert selection[1] == np.asarray(selector.algorithms, dtype=object)[
+        selector.predict_performance(X[1:2]).argmin(axis=1)][0]
+    assert list(selection[2:]) == list(expected[2:])
@@ -0,0 +1,152 @@
+import os
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from benchmarks.generate_scenario import ScenarioGenerator
+from oasc_starterkit.arff_stream import get_run_cube
+from oasc_starterkit.runstatus import MISSING, STATUS_CODES
+from oasc_starterkit.scenario_cache import read_scenario
+from oasc_starterkit.single_best import SingleBest
+from validation.validate import Stats, Validator
+
+__license__ = "BSD"
+
+N_REPETITIONS = 3
+
+
+@pytest.fixture(scope="module")
+def runs_scenario(tmp_path_factory):
+    '''
+        synthetic runtime scenario with 3 repetitions per run,
+        some of them missing;
+        returns the scenario (with run_cube) and the runs
+        {(instance, algorithm) -> {repetition -> (performance, status)}}
+    '''
+    dn = str(tmp_path_factory.mktemp("repetitions"))
+    ScenarioGenerator(n_instances=40, n_algorithms=4, n_features=4, n_feature_steps=2,
+                      n_repetitions=N_REPETITIONS, timeout_rate=0.3, crash_rate=0.1, seed=3).write(dn)
+
+    fn = os.path.join(dn, "algorithm_runs.arff")
+    with open(fn) as fp:
+        lines = fp.readlines()
+    data_start = [line.strip().upper() for line in lines].index("@DATA") + 1
+    runs = defaultdict(dict)
+    kept = []
+    for n_line, line in enumerate(lines[data_start:]):
+        inst, rep, algo, perf, status = line.strip().split(",")
+        # drop every 7th run (never all repetitions of a run)
+        if n_line % 7 == 3 and int(rep) != 1:
+            continue
+        runs[(inst, algo)][int(rep)] = (float(perf), status)
+        kept.append(line)
+    assert len(kept) < len(lines) - data_start
+    with open(fn, "w") as fp:
+        fp.writelines(lines[:data_start] + kept)
+
+    scenario = read_scenario(dn=dn, use_cache=False, keep_repetitions=True)
+    return scenario, runs
+
+
+def reference(runs, cube, func):
+    '''
+        applies func to the repetitions of each run
+        (instances x algorithms in the order of cube)
+    '''
+    return np.array([[func(runs[(inst, algo)]) for algo in cube.algorithms] for inst in cube.instances],
+                    dtype=np.float64)
+
+
+def test_aggregate(runs_scenario):
+    scenario, runs = runs_scenario
+    cube = get_run_cube(scenario)
+    cutoff = scenario.algorithm_cutoff_time
+    assert cube.n_repetitions == N_REPETITIONS
+
+    def par10(reps):
+        return np.mean([perf if status == "ok" else 10 * cutoff for perf, status in reps.values()])
+
+    expected = {"mean": reference(runs, cube, lambda reps: np.mean([perf for perf, _ in reps.values()])),
+                "median": reference(runs, cube, lambda reps: np.median([perf for perf, _ in reps.values()])),
+                "par10": reference(runs, cube, par10),
+                "solve_probability": reference(runs, cube, lambda reps: np.mean([status == "ok"
+                                                                               for _, status in reps.values()]))}
+    for aggregate, values in expected.items():
+        np.testing.assert_allclose(cube.aggregate(aggregate, algorithm_cutoff_time=cutoff), values,
+                                   rtol=1e-6, err_msg=aggregate)
+
+    # missing repetitions are NaN / MISSING
+    n_runs = reference(runs, cube, len)
+    assert (n_runs < N_REPETITIONS).any()
+    np.testing.assert_array_equal(cube.get_n_runs(), n_runs)
+    for rep in range(N_REPETITIONS):
+        present = reference(runs, cube, lambda reps: rep + 1 in reps).astype(bool)
+        assert np.isnan(cube.performance[:, :, rep][~present]).all()
+        assert (cube.runstatus[:, :, rep][~present] == MISSING).all()
+        assert not np.isnan(cube.performance[:, :, rep][present]).any()
+
+
+def test_get_repetition(runs_scenario):
+    scenario, runs = runs_scenario
+    cube = get_run_cube(scenario)
+    status = reference(runs, cube, lambda reps: max(STATUS_CODES[s] for _, s in reps.values()))
+    mean = reference(runs, cube, lambda reps: np.mean([perf for perf, _ in reps.values()]))
+
+    for rep in range(N_REPETITIONS):
+        def get_perf(reps):
+            return reps[rep + 1][0] if rep + 1 in reps else np.nan
+
+        def get_status(reps):
+            return STATUS_CODES[reps[rep + 1][1]] if rep + 1 in reps else MISSING
+
+        perf = reference(runs, cube, get_perf)
+        codes = reference(runs, cube, get_status)
+        missing = codes == MISSING
+
+        runs_rep = cube.get_repetition(rep)
+        np.testing.assert_allclose(runs_rep.performance, perf, rtol=1e-6)
+        np.testing.assert_array_equal(runs_rep.runstatus, codes)
+
+        filled = cube.get_repetition(rep, fill_missing=True)
+        np.testing.assert_allclose(filled.performance, np.where(missing, mean, perf), rtol=1e-6)
+        np.testing.assert_array_equal(filled.runstatus, np.where(missing, status, codes))
+
+
+def test_single_best_aggregations(runs_scenario):
+    scenario, runs = runs_scenario
+    cube = get_run_cube(scenario)
+    cutoff = scenario.algorithm_cutoff_time
+
+    par10 = reference(runs, cube, lambda reps: np.mean([perf if status == "ok" else 10 * cutoff
+                                                        for perf, status in reps.values()]))
+    solved = reference(runs, cube, lambda reps: np.mean([status == "ok" for _, status in reps.values()]))
+    for aggregation, expected in [("par10", cube.algorithms[par10.mean(axis=0).argmin()]),
+                                  ("solved", cube.algorithms[solved.sum(axis=0).argmax()])]:
+        selector = SingleBest(aggregation=aggregation)
+        selector.fit(scenario=scenario)
+        assert selector.single_best == expected, aggregation
+
+
+def test_validate_repetitions(runs_scenario):
+    scenario, runs = runs_scenario
+    cube = get_run_cube(scenario)
+    cutoff = scenario.algorithm_cutoff_time
+    selector = SingleBest()
+    selector.fit(scenario=scenario)
+    schedules = selector.predict(scenario=scenario, out_fn=None)
+
+    rep_stats, stat = Validator(log_instances=False).validate_repetitions(
+        schedules=schedules, test_scenario=scenario, train_scenario=scenario)
+    assert len(rep_stats) == N_REPETITIONS
+    for attr in Stats.COUNTERS:
+        assert getattr(stat, attr) == pytest.approx(sum(getattr(rep_stat, attr) for rep_stat in rep_stats)), attr
+
+    # a missing repetition is not solved
+    for rep, rep_stat in enumerate(rep_stats):
+        n_solved = sum(1 for inst in cube.instances
+                       if rep + 1 in runs[(inst, selector.single_best)] and
+                       runs[(inst, selector.single_best)][rep + 1][1] == "ok" and
+                       runs[(inst, selector.single_best)][rep + 1][0] <= cutoff)
+        assert rep_stat.solved == n_solved
+    assert stat.solved < len(cube.instances) * N_REPETITIONS
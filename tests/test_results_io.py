@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.results_io import ResultsWriter, iter_results, iter_chunks, load_results
+from validation.validate import Stats, Validator
+
+__license__ = "BSD"
+
+
+def assert_same_stats(stat, expected):
+    for attr in Stats.COUNTERS:
+        assert getattr(stat, attr) == pytest.approx(getattr(expected, attr)), attr
+    assert stat.get_score(True) == pytest.approx(expected.get_score(True))
+
+
+def test_writer_round_trip(tmpdir):
+    predictions = [("inst_%d" % (i), [["algo_%d" % (i % 3), 100]]) for i in range(7)]
+    for fn in [str(tmpdir.join("results.json")), str(tmpdir.join("results.jsonl"))]:
+        with ResultsWriter(fn) as writer:
+            for inst, schedule in predictions:
+                writer.write(inst, schedule)
+        assert sorted(iter_results(fn)) == sorted(predictions)
+        assert dict(load_results(fn)) == dict(predictions)
+
+    with open(str(tmpdir.join("results.jsonl"))) as fp:
+        assert len(fp.readlines()) == len(predictions)
+
+
+def test_iter_chunks():
+    assert [chunk for chunk in iter_chunks(range(7), 3)] == [[0, 1, 2], [3, 4, 5], [6]]
+    assert [chunk for chunk in iter_chunks(iter(range(6)), 3)] == [[0, 1, 2], [3, 4, 5]]
+    assert [chunk for chunk in iter_chunks([], 3)] == []
+
+
+def test_truncated_line_and_duplicate(tmpdir):
+    fn = str(tmpdir.join("results.jsonl"))
+    with ResultsWriter(fn) as writer:
+        writer.write("a", [["algo_1", 10]])
+        writer.write("b", [["algo_2", 10]])
+    with open(fn, "a") as fp:
+        fp.write(json.dumps({"a": [["algo_3", 10]]}) + "\n")
+        fp.write('{"c": [["algo_')
+    assert list(iter_results(fn)) == [("a", [["algo_1", 10]]), ("b", [["algo_2", 10]])]
+
+    # an undecodable line that is not the last line is an error
+    with open(fn, "a") as fp:
+        fp.write("\n" + json.dumps({"d": [["algo_1", 10]]}) + "\n")
+    with pytest.raises(ValueError):
+        list(iter_results(fn))
+
+
+def test_json_and_jsonl_validate_identically(train_scenario, tmpdir):
+    test_scenario, train_part = train_scenario.get_split(indx=1)
+    selector = SingleBest()
+    selector.fit(scenario=train_part)
+
+    json_fn = str(tmpdir.join("results.json"))
+    jsonl_fn = str(tmpdir.join("results.jsonl"))
+    predictions = selector.predict(scenario=test_scenario, out_fn=json_fn)
+    assert selector.predict(scenario=test_scenario, out_fn=jsonl_fn) is None
+    # (schedules are tuples in memory and lists in JSON)
+    assert dict(iter_results(jsonl_fn)) == dict((inst, [list(entry) for entry in schedule])
+                                                for inst, schedule in predictions.items())
+
+    # duplicate of the first instance with another schedule and a truncated last line
+    first = next(iter_results(jsonl_fn))[0]
+    other = [algo for algo in test_scenario.algorithms if algo != selector.single_best][0]
+    with open(jsonl_fn, "a") as fp:
+        fp.write(json.dumps({first: [[other, test_scenario.algorithm_cutoff_time]]}) + "\n")
+        fp.write(json.dumps({"truncated": []})[:-3])
+
+    def validate(schedules, chunk_size=10000):
+        return Validator(log_instances=False).validate_runtime(
+            schedules=schedules, test_scenario=test_scenario, train_scenario=train_part, chunk_size=chunk_size)
+
+    expected = validate(predictions)
+    assert_same_stats(validate(load_results(json_fn)), expected)
+    assert_same_stats(validate(load_results(jsonl_fn)), expected)
+    assert_same_stats(validate(iter_results(jsonl_fn), chunk_size=7), expected)
+    assert_same_stats(validate(dict(iter_results(jsonl_fn))), expected)
@@ -0,0 +1,119 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from oasc_starterkit import scenario_cache
+from oasc_starterkit.scenario_cache import ScenarioCache, default_cache_dn
+from oasc_starterkit.runstatus import get_status
+
+from conftest import TRAIN_DN
+
+__license__ = "BSD"
+
+FRAMES = ["performance_data", "runstatus_data", "feature_data",
+          "feature_runstatus_data", "feature_cost_data", "cv_data"]
+
+
+@pytest.fixture
+def scenario_dn(tmp_path):
+    dn = str(tmp_path / "SAT11-INDU-TRAIN")
+    shutil.copytree(TRAIN_DN, dn)
+    return dn
+
+
+@pytest.fixture
+def count_parses(monkeypatch):
+    calls = []
+    parse_scenario = scenario_cache.parse_scenario
+
+    def counting_parse(*args, **kwargs):
+        calls.append(kwargs.get("dn"))
+        return parse_scenario(*args, **kwargs)
+
+    monkeypatch.setattr(scenario_cache, "parse_scenario", counting_parse)
+    return calls
+
+
+def test_default_location(tmp_path, monkeypatch, scenario_dn):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert default_cache_dn() == str(tmp_path / "xdg" / "oasc_starterkit")
+    cache_dn = ScenarioCache().get_cache_dn(scenario_dn)
+    assert os.path.dirname(cache_dn) == default_cache_dn()
+    assert ScenarioCache().get_cache_dn(scenario_dn + "/") == cache_dn
+
+    files = sorted(os.listdir(scenario_dn))
+    ScenarioCache().read_scenario(scenario_dn)
+    assert sorted(os.listdir(scenario_dn)) == files
+    assert os.listdir(default_cache_dn()) == [os.path.basename(cache_dn)]
+
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    assert default_cache_dn() == os.path.join(os.path.expanduser("~"), ".cache", "oasc_starterkit")
+
+
+def test_roundtrip(tmp_path, scenario_dn, count_parses):
+    cache = ScenarioCache(cache_dn=str(tmp_path / "cache"))
+    parsed = cache.read_scenario(scenario_dn)
+    cached = cache.read_scenario(scenario_dn)
+    assert len(count_parses) == 1
+
+    for name in FRAMES:
+        pd.testing.assert_frame_equal(getattr(cached, name), getattr(parsed, name), check_dtype=False)
+    assert cached.instances == parsed.instances
+    assert cached.algorithms == parsed.algorithms
+    assert cached.feature_group_dict == parsed.feature_group_dict
+
+    status_parsed, status_cached = get_status(parsed), get_status(cached)
+    np.testing.assert_array_equal(status_cached.runs.codes, status_parsed.runs.codes)
+    np.testing.assert_array_equal(status_cached.features.codes, status_parsed.features.codes)
+    assert list(status_cached.runs.columns) == list(status_parsed.runs.columns)
+
+
+def test_invalidation(tmp_path, scenario_dn, count_parses):
+    cache = ScenarioCache(cache_dn=str(tmp_path / "cache"))
+    cache.read_scenario(scenario_dn)
+    runs_fn = os.path.join(scenario_dn, "algorithm_runs.arff")
+
+    # new mtime, same content: the content hash keeps the cache valid
+    stat = os.stat(runs_fn)
+    os.utime(runs_fn, (stat.st_atime, stat.st_mtime + 10))
+    cache.read_scenario(scenario_dn)
+    assert len(count_parses) == 1
+
+    # changed content: the cache is renewed
+    with open(runs_fn) as fp:
+        lines = fp.read().splitlines()
+    data_start = [l.strip().upper() for l in lines].index("@DATA") + 1
+    fields = lines[data_start].split(",")
+    inst, algo, runtime = fields[0], fields[2], float(fields[3]) / 2
+    fields[3] = str(runtime)
+    lines[data_start] = ",".join(fields)
+    with open(runs_fn, "w") as fp:
+        fp.write("\n".join(lines) + "\n")
+    os.utime(runs_fn, (stat.st_atime, stat.st_mtime + 20))
+
+    scenario = cache.read_scenario(scenario_dn)
+    assert len(count_parses) == 2
+    assert scenario.performance_data.loc[inst, algo] == pytest.approx(runtime)
+    # the renewed cache is used afterwards
+    assert cache.read_scenario(scenario_dn).performance_data.loc[inst, algo] == pytest.approx(runtime)
+    assert len(count_parses) == 2
+    assert not [fn for fn in os.listdir(str(tmp_path / "cache")) if ".tmp" in fn or ".old" in fn]
+
+
+def test_publish_race(tmp_path, monkeypatch):
+    cache = ScenarioCache(cache_dn=str(tmp_path / "cache"))
+    cache_dn = str(tmp_path / "cache" / "key")
+    tmp_dn = cache_dn + ".tmp"
+    for dn, content in [(cache_dn, "other"), (tmp_dn, "own")]:
+        os.makedirs(dn)
+        with open(os.path.join(dn, "index.json"), "w") as fp:
+            fp.write(content)
+    # another process publishes cache_dn after the check for a stale cache
+    isdir = os.path.isdir
+    monkeypatch.setattr(os.path, "isdir", lambda dn: False if dn == cache_dn else isdir(dn))
+    cache._publish(tmp_dn=tmp_dn, cache_dn=cache_dn)
+    with open(os.path.join(cache_dn, "index.json")) as fp:
+        assert fp.read() == "other"
@@ -0,0 +1,103 @@
+import json
+import threading
+import urllib.request
+import urllib.error
+
+import numpy as np
+import pytest
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.selection_server import MicroBatcher, SelectionService, make_server
+
+__license__ = "BSD"
+
+
+@pytest.fixture
+def server(train_scenario):
+    selector = SingleBest()
+    selector.fit(scenario=train_scenario)
+    service = SelectionService(selector=selector, scenario=train_scenario)
+    server = make_server(service=service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def request(server, path, data=None):
+    url = "http://127.0.0.1:%d%s" % (server.server_address[1], path)
+    body = None if data is None else json.dumps(data).encode("utf-8")
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=body)) as response:
+            return response.status, json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as err:
+        return err.code, json.loads(err.read().decode("utf-8"))
+
+
+def test_select(server, train_scenario):
+    # the single best needs no features
+    instances = dict((inst, {}) for inst in train_scenario.instances[:3])
+    code, schedules = request(server, "/select", {"instances": instances})
+    assert code == 200
+    assert sorted(schedules) == sorted(instances)
+    code, _ = request(server, "/select", {"instances": [1, 2]})
+    assert code == 400
+
+
+def test_internal_error(server, train_scenario, monkeypatch):
+    service = server.RequestHandlerClass.service
+
+    def failing_select(X):
+        raise RuntimeError("selector failed")
+
+    monkeypatch.setattr(service.batcher, "select_func", failing_select)
+    code, data = request(server, "/select", {"instances": {"inst": {}}})
+    assert code == 500
+    assert data == {"error": "RuntimeError: selector failed"}
+
+    code, stats = request(server, "/stats")
+    assert stats["internal_errors"] == 1 and stats["errors"] == 1
+    # the server keeps answering
+    assert request(server, "/health") == (200, {"status": "ok"})
+
+
+def test_micro_batcher():
+    calls = []
+
+    def select_func(X):
+        calls.append(X.shape[0])
+        return ["algo_%d" % (int(v)) for v in X[:, 0]]
+
+    n_requests = 20
+    max_batch_size = 8
+    batcher = MicroBatcher(select_func=select_func, max_batch_size=max_batch_size, max_wait=0.5)
+    barrier = threading.Barrier(n_requests)
+    results = {}
+
+    def submit(idx):
+        # request idx has 1 + idx % 3 rows with value idx
+        X = np.full((1 + idx % 3, 2), idx, dtype=np.float64)
+        barrier.wait()
+        results[idx] = batcher.submit(X)
+
+    threads = [threading.Thread(target=submit, args=(idx,)) for idx in range(n_requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    for idx in range(n_requests):
+        assert results[idx] == ["algo_%d" % (idx)] * (1 + idx % 3)
+    assert len(calls) < n_requests
+    assert max(calls) <= max_batch_size
+    assert sum(calls) == sum(1 + idx % 3 for idx in range(n_requests))
+    assert batcher.n_batches == len(calls)
+    assert batcher.n_batched_instances == sum(calls)
+
+    # a single larger request is not split
+    batcher = MicroBatcher(select_func=select_func, max_batch_size=2, max_wait=0.01)
+    assert batcher.submit(np.zeros((5, 2))) == ["algo_0"] * 5
+    batcher.close()
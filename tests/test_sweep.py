@@ -0,0 +1,46 @@
+import pytest
+
+from oasc_starterkit.cross_validation import CrossValidator
+from oasc_starterkit.sweep import SweepRunner, build_selector, expand_grid
+
+__license__ = "BSD"
+
+
+def test_expand_grid_removes_defaults():
+    configs = expand_grid([{"selector": "regression", "alpha": [1.0, 0.5]},
+                           {"selector": "regression"},
+                           {"selector": "single_best", "aggregation": ["mean"]},
+                           {"selector": "schedule", "max_presolvers": [2],
+                            "final": [{"selector": "single_best"}, {"selector": "single_best", "aggregation": "mean"},
+                                      {"selector": "regression", "alpha": [1.0]}]}])
+    assert configs == [{"selector": "regression"},
+                       {"selector": "regression", "alpha": 0.5},
+                       {"selector": "single_best"},
+                       {"selector": "schedule", "max_presolvers": 2},
+                       {"selector": "schedule", "max_presolvers": 2, "final": {"selector": "regression"}}]
+    with pytest.raises(ValueError):
+        expand_grid([{"selector": "regression", "depth": [1]}])
+
+
+def test_stored_results(train_scenario, tmpdir):
+    configs = expand_grid([{"selector": "single_best"},
+                           {"selector": "regression", "alpha": [0.5]},
+                           {"selector": "schedule", "max_presolvers": [2], "final": [{"selector": "regression"}]}])
+    results_dn = str(tmpdir.join("results"))
+
+    fresh_rows, fresh_summary = SweepRunner(configs, n_jobs=1, results_dn=results_dn).run(train_scenario)
+    n_folds = fresh_summary["folds"]
+    assert fresh_summary["evaluated"] == len(configs) * n_folds and fresh_summary["cached"] == 0
+
+    rows, summary = SweepRunner(configs, n_jobs=1, results_dn=results_dn).run(train_scenario)
+    assert summary["evaluated"] == 0 and summary["cached"] == len(configs) * n_folds
+    for row, fresh_row in zip(rows, fresh_rows):
+        assert row["cached_folds"] == n_folds
+        for field in ["score", "oracle", "sbs", "closed_gap"]:
+            assert row[field] == fresh_row[field]
+
+    # same scores as the cross-validation of each configuration
+    for config, row in zip(configs, rows):
+        _, stat = CrossValidator(selector_factory=lambda: build_selector(config), n_jobs=1).run(train_scenario)
+        assert row["score"] == pytest.approx(stat.get_score(True))
+        assert row["closed_gap"] == pytest.approx(stat.get_closed_gap(True))
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+
+import pytest
+
+from oasc_starterkit.single_best import SingleBest
+from oasc_starterkit.regression_selector import RegressionSelector
+from oasc_starterkit.schedule_builder import ScheduleBuilder
+from oasc_starterkit.cross_validation import CrossValidator
+from validation.validate import Validator
+
+__license__ = "BSD"
+
+COUNTERS = ["par1", "par10", "timeouts", "solved", "unsolvable", "ended_early"]
+
+
+def validate_both(schedules, test_scenario, train_scenario):
+    validator = Validator(log_instances=False)
+    stats = [validator.validate_runtime(schedules=schedules, test_scenario=test_scenario,
+                                        train_scenario=train_scenario, vectorized=vectorized)
+             for vectorized in [True, False]]
+    return stats
+
+
+def assert_equal_stats(stat_vec, stat_loop):
+    for attr in COUNTERS:
+        assert getattr(stat_vec, attr) == getattr(stat_loop, attr), attr
+    assert list(stat_vec.outcomes.solved) == list(stat_loop.outcomes.solved)
+    assert list(stat_vec.outcomes.timeout) == list(stat_loop.outcomes.timeout)
+
+
+@pytest.mark.parametrize("selector_factory", [SingleBest, RegressionSelector,
+                                              lambda: ScheduleBuilder(selector=RegressionSelector(),
+                                                                      max_presolvers=2)])
+def test_loop_equals_vectorized_on_cv_folds(train_scenario, selector_factory):
+    for fold in CrossValidator().get_folds(train_scenario):
+        test_scenario, fold_train = train_scenario.get_split(indx=fold)
+        selector = selector_factory()
+        selector.fit(scenario=fold_train)
+        schedules = selector.predict(scenario=test_scenario, out_fn=None)
+        assert_equal_stats(*validate_both(schedules, test_scenario, fold_train))
+
+
+def test_loop_equals_vectorized_on_irregular_schedules(train_scenario):
+    test_scenario, fold_train = train_scenario.get_split(indx=1)
+    algos = test_scenario.algorithms
+    steps = test_scenario.feature_steps
+    cutoff = test_scenario.algorithm_cutoff_time
+    patterns = [
+        # unknown entries before and after an algorithm
+        lambda i: ["no_such_step", (algos[i % len(algos)], cutoff)],
+        lambda i: [(algos[i % len(algos)], 1.0), "no_such_step"],
+        lambda i: [("no_such_algo", cutoff), (algos[i % len(algos)], cutoff)],
+        lambda i: [42, (algos[i % len(algos)], 0.5)],
+        # feature steps after an algorithm (e.g., a presolver)
+        lambda i: [(algos[i % len(algos)], 5.0)] + list(steps) + [(algos[(i + 1) % len(algos)], cutoff)],
+        lambda i: [(algos[i % len(algos)], cutoff), steps[0]],
+        # algorithm name without budget and empty schedules
+        lambda i: [algos[i % len(algos)]],
+        lambda i: [],
+    ]
+    schedules = OrderedDict((inst, patterns[i % len(patterns)](i))
+                            for i, inst in enumerate(test_scenario.performance_data.index))
+    stat_vec, stat_loop = validate_both(schedules, test_scenario, fold_train)
+    assert_equal_stats(stat_vec, stat_loop)
+    assert stat_vec.timeouts > 0 and stat_vec.solved > 0 and stat_vec.ended_early > 0
@@ -0,0 +1,220 @@
+import os
+import json
+import hashlib
+import logging
+
+import numpy as np
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.runstatus import get_status
+from oasc_starterkit.scenario_cache import scenario_fingerprint, same_content, default_cache_dn
+
+__license__ = "BSD"
+
+
+# Oracle and single best solver (SBS) of a test scenario
+#
+# These baselines only depend on the scenario files and not on the submission;
+# they are computed once per train/test scenario pair and
+# can be stored on disk (BaselineIndex) to be reused by later validations.
+
+INDEX_VERSION = 2
+
+
+class ScenarioBaselines(object):
+
+    def __init__(self, instances: list, oracle: np.ndarray, sbs: str, sbs_perf: np.ndarray,
+                 unsolvable: np.ndarray, oracle_par10: float, sbs_par10: float):
+        """ Constructor
+
+            Arguments
+            ---------
+            instances: list
+                test instances (order of all arrays)
+            oracle: np.ndarray
+                performance of the oracle per instance
+            sbs: str
+                single best solver on the training data
+            sbs_perf: np.ndarray
+                performance of the SBS per instance
+            unsolvable: np.ndarray
+                bool; instance was not solved by any algorithm
+                (always False for solution quality scenarios)
+            oracle_par10: float
+                sum of oracle performance
+            sbs_par10: float
+                sum of SBS performance
+        """
+        self.instances = instances
+        self.oracle = oracle
+        self.sbs = sbs
+        self.sbs_perf = sbs_perf
+        self.unsolvable = unsolvable
+        self.oracle_par10 = oracle_par10
+        self.sbs_par10 = sbs_par10
+
+        # frames the baselines were computed on (see describes)
+        self._frames = None
+
+    @classmethod
+    def compute(cls, test_scenario: ASlibScenario, train_scenario: ASlibScenario):
+        """
+            computes oracle and SBS as Validator.validate_runtime and
+            Validator.validate_quality do
+
+            Arguments
+            ---------
+            test_scenario: ASlibScenario
+                ASlib scenario with test instances
+            train_scenario: ASlibScenario
+                ASlib scenario with training instances -- required for SBS
+        """
+        test_perf = test_scenario.performance_data
+        train_perf = train_scenario.performance_data
+
+        if test_scenario.performance_type[0] == "runtime":
+            oracle = test_perf.min(axis=1)
+            sbs = train_perf.sum(axis=0).idxmin()
+            unsolvable = ~get_status(test_scenario).runs.reindex(test_perf.index, test_perf.columns).ok.any(axis=1)
+        else:
+            if test_scenario.maximize[0]:
+                # remove *-1 of ASlibScenario
+                test_perf = test_perf * -1
+                train_perf = train_perf * -1
+                oracle = test_perf.max(axis=1)
+                sbs = train_perf.sum(axis=0).idxmax()
+            else:
+                oracle = test_perf.min(axis=1)
+                sbs = train_perf.sum(axis=0).idxmin()
+            unsolvable = np.zeros(test_perf.shape[0], dtype=bool)
+
+        baselines = cls(instances=list(test_perf.index),
+                        oracle=oracle.values,
+                        sbs=sbs,
+                        sbs_perf=test_perf[sbs].values,
+                        unsolvable=unsolvable,
+                        oracle_par10=oracle.sum(),
+                        sbs_par10=test_perf.sum(axis=0)[sbs])
+        baselines._frames = (test_scenario.performance_data, train_scenario.performance_data)
+        return baselines
+
+    def describes(self, test_scenario: ASlibScenario, train_scenario: ASlibScenario) -> bool:
+        """
+            True if the baselines were computed on exactly these scenario frames
+        """
+        return self._frames is not None and \
+            self._frames[0] is test_scenario.performance_data and \
+            self._frames[1] is train_scenario.performance_data
+
+    def save(self, fn: str):
+        np.savez(fn, instances=np.array(self.instances, dtype=str),
+                 oracle=self.oracle, sbs=np.array(self.sbs, dtype=str),
+                 sbs_perf=self.sbs_perf, unsolvable=self.unsolvable,
+                 oracle_par10=self.oracle_par10, sbs_par10=self.sbs_par10)
+
+    @classmethod
+    def load(cls, fn: str):
+        with np.load(fn) as data:
+            return cls(instances=list(data["instances"]),
+                       oracle=data["oracle"],
+                       sbs=str(data["sbs"]),
+                       sbs_perf=data["sbs_perf"],
+                       unsolvable=data["unsolvable"],
+                       oracle_par10=float(data["oracle_par10"]),
+                       sbs_par10=float(data["sbs_par10"]))
+
+
+def get_baselines(test_scenario: ASlibScenario, train_scenario: ASlibScenario) -> ScenarioBaselines:
+    """
+        returns the baselines of a train/test scenario pair;
+        they are memorized in test_scenario.baselines as long as
+        the performance data of both scenarios is not replaced
+    """
+    baselines = getattr(test_scenario, "baselines", None)
+    if baselines is None or not baselines.describes(test_scenario, train_scenario):
+        baselines = ScenarioBaselines.compute(test_scenario=test_scenario, train_scenario=train_scenario)
+        test_scenario.baselines = baselines
+    return baselines
+
+
+class BaselineIndex(object):
+
+    def __init__(self, index_dn: str = None, stream_runs: bool = False,
+                 keep_repetitions: bool = False, aggregate: str = "mean"):
+        """ Constructor
+
+            Arguments
+            ---------
+            index_dn: str
+                directory of the baseline index;
+                if None, <default_cache_dn>/baselines (see scenario_cache.default_cache_dn)
+            stream_runs, keep_repetitions: bool
+                how the algorithm runs of the scenarios were read (see scenario_cache.read_scenario);
+                baselines of different reading modes are stored separately
+            aggregate: str
+                aggregation of the repetitions of the algorithm runs
+                (see arff_stream.read_algorithm_runs)
+        """
+        self.index_dn = index_dn
+        self.mode = {"stream_runs": stream_runs or keep_repetitions,
+                     "keep_repetitions": keep_repetitions,
+                     "aggregate": aggregate}
+        self.logger = logging.getLogger("BaselineIndex")
+
+    def _get_prefix(self, test_dn: str, train_dn: str) -> str:
+        key = hashlib.sha1(("%s\n%s\n%s" % (os.path.abspath(test_dn), os.path.abspath(train_dn),
+                                            json.dumps(self.mode, sort_keys=True))).encode("utf-8")).hexdigest()[:16]
+        index_dn = self.index_dn if self.index_dn is not None else os.path.join(default_cache_dn(), "baselines")
+        return os.path.join(index_dn, key)
+
+    def get(self, test_dn: str, train_dn: str, test_scenario: ASlibScenario,
+            train_scenario: ASlibScenario) -> ScenarioBaselines:
+        """
+            returns the stored baselines if the files of both scenarios
+            did not change; otherwise computes and stores them
+
+            Arguments
+            ---------
+            test_dn, train_dn: str
+                scenario directories
+            test_scenario, train_scenario: ASlibScenario
+                loaded scenarios (used only if the baselines have to be computed)
+        """
+        prefix = self._get_prefix(test_dn, train_dn)
+        meta = None
+        if os.path.isfile(prefix + ".json"):
+            with open(prefix + ".json") as fp:
+                meta = json.load(fp)
+            if meta.get("version") != INDEX_VERSION or meta.get("mode") != self.mode:
+                meta = None
+
+        fingerprints = {"test": scenario_fingerprint(test_dn, previous=meta["test"] if meta else None),
+                        "train": scenario_fingerprint(train_dn, previous=meta["train"] if meta else None)}
+
+        if meta and same_content(meta["test"], fingerprints["test"]) and \
+                same_content(meta["train"], fingerprints["train"]):
+            try:
+                baselines = ScenarioBaselines.load(prefix + ".npz")
+                if list(test_scenario.performance_data.index) == baselines.instances:
+                    baselines._frames = (test_scenario.performance_data, train_scenario.performance_data)
+                    test_scenario.baselines = baselines
+                    self.logger.debug("Loaded baselines of %s from %s" % (test_dn, prefix))
+                    return baselines
+            except (OSError, KeyError, ValueError) as err:
+                self.logger.warning("Could not load baselines %s: %s" % (prefix, err))
+
+        baselines = get_baselines(test_scenario=test_scenario, train_scenario=train_scenario)
+        try:
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+            baselines.save(prefix + ".npz")
+            with open(prefix + ".json", "w") as fp:
+                json.dump({"version": INDEX_VERSION,
+                           "test_dn": os.path.abspath(test_dn),
+                           "train_dn": os.path.abspath(train_dn),
+                           "mode": self.mode,
+                           "test": fingerprints["test"],
+                           "train": fingerprints["train"]}, fp, indent=2)
+        except OSError as err:
+            self.logger.warning("Could not store baselines %s: %s" % (prefix, err))
+        return baselines
@@ -0,0 +1,263 @@
+import os
+import csv
+import json
+import logging
+import multiprocessing
+from collections import OrderedDict
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+from oasc_starterkit.scenario_cache import read_scenario
+from oasc_starterkit.results_io import load_results
+from validation.validate import Validator
+from validation.baselines import BaselineIndex, get_baselines
+
+__license__ = "BSD"
+
+
+# Validation of many result files against many scenarios
+#
+# The manifest lists (scenario, submission) pairs;
+# each train/test scenario pair is loaded only once
+# and all its submissions are validated by a pool of forked worker processes
+# (sharing the scenario data with the parent process).
+# The statistics are the same as the ones of validate_cli.py.
+
+MANIFEST_FIELDS = ["scenario", "train_as", "test_as", "result_fn"]
+
+RESULT_FIELDS = ["scenario", "result_fn", "score", "par1", "par10",
+                 "solved", "timeouts", "unsolvable", "n_samples",
+                 "oracle", "sbs", "closed_gap", "gap_remaining",
+                 "score_ci_low", "score_ci_high", "closed_gap_ci_low", "closed_gap_ci_high",
+                 "p_value_sbs", "error"]
+
+# scenarios shared with forked worker processes
+_SHARED = {}
+
+
+def read_manifest(fn: str) -> list:
+    '''
+        reads the manifest of (scenario, submission) pairs
+
+        either a CSV file with the header
+        scenario,train_as,test_as,result_fn
+        or a JSON file with a list of dictionaries with these keys
+        ("scenario" is optional and defaults to the name of the test directory)
+
+        Returns
+        -------
+        list of dicts
+    '''
+    with open(fn) as fp:
+        if fn.endswith(".json"):
+            entries = json.load(fp)
+        else:
+            entries = list(csv.DictReader(fp))
+
+    manifest_dn = os.path.dirname(os.path.abspath(fn))
+    for entry in entries:
+        missing = set(MANIFEST_FIELDS[1:]).difference(entry)
+        if missing:
+            raise ValueError("Manifest entry %s misses %s" % (entry, sorted(missing)))
+        # relative paths are relative to the manifest
+        for key in MANIFEST_FIELDS[1:]:
+            entry[key] = os.path.join(manifest_dn, entry[key])
+        if not entry.get("scenario"):
+            entry["scenario"] = os.path.basename(os.path.normpath(entry["test_as"]))
+    return entries
+
+
+def _empty_row(entry: dict) -> OrderedDict:
+    row = OrderedDict((field, None) for field in RESULT_FIELDS)
+    row["scenario"] = entry["scenario"]
+    row["result_fn"] = entry["result_fn"]
+    return row
+
+
+def _validate_submission(entry: dict) -> dict:
+    '''
+        validates one result file on the scenarios in _SHARED;
+        an error is reported in the column "error" (and does not stop the batch)
+
+        Returns
+        -------
+        dict with RESULT_FIELDS
+    '''
+    try:
+        return _get_row(entry)
+    except SystemExit:
+        # Validator exits if predictions are missing
+        error = "missing predictions"
+    except Exception as err:
+        error = "%s: %s" % (err.__class__.__name__, err)
+    row = _empty_row(entry)
+    row["error"] = error
+    return row
+
+
+def _get_row(entry: dict) -> dict:
+    test_scenario = _SHARED["test_scenario"]
+    train_scenario = _SHARED["train_scenario"]
+    baselines = _SHARED["baselines"]
+    row = _empty_row(entry)
+
+    schedules = load_results(entry["result_fn"])
+
+    validator = Validator(log_instances=False, bootstrap_samples=_SHARED["bootstrap_samples"],
+                          seed=_SHARED["seed"])
+    if test_scenario.performance_type[0] == "runtime":
+        stat = validator.validate_runtime(schedules=schedules, test_scenario=test_scenario,
+                                          train_scenario=train_scenario, baselines=baselines)
+        remove_unsolvable = True
+    else:
+        stat = validator.validate_quality(schedules=schedules, test_scenario=test_scenario,
+                                          train_scenario=train_scenario, baselines=baselines)
+        remove_unsolvable = False
+
+    row["score"] = stat.get_score(remove_unsolvable)
+    row["par1"] = stat.get_par1(remove_unsolvable)
+    row["solved"] = stat.solved
+    row["n_samples"] = stat.get_n_samples(remove_unsolvable)
+    if stat.runtime_cutoff:
+        row["par10"] = stat.get_par10(remove_unsolvable)
+        row["timeouts"] = stat.get_time_outs(remove_unsolvable)
+        row["unsolvable"] = int(stat.unsolvable)
+    row["oracle"] = stat.get_score_oracle(remove_unsolvable)
+    row["sbs"] = stat.get_score_sbs(remove_unsolvable)
+    row["closed_gap"] = stat.get_closed_gap(remove_unsolvable)
+    row["gap_remaining"] = stat.get_gap_remaining(remove_unsolvable)
+    if stat.bootstrap is not None:
+        row["score_ci_low"] = stat.bootstrap["score"]["ci_low"]
+        row["score_ci_high"] = stat.bootstrap["score"]["ci_high"]
+        row["closed_gap_ci_low"] = stat.bootstrap["closed_gap"]["ci_low"]
+        row["closed_gap_ci_high"] = stat.bootstrap["closed_gap"]["ci_high"]
+        row["p_value_sbs"] = stat.permutation["score"]["p_value"]
+    return row
+
+
+class BatchValidator(object):
+
+    def __init__(self, n_jobs: int = None, cache_dn: str = None, use_cache: bool = True,
+                 bootstrap_samples: int = 0, seed: int = 1):
+        '''
+            Arguments
+            ---------
+            n_jobs: int
+                number of worker processes (default: number of cores)
+            cache_dn: str
+                directory of scenario cache (see scenario_cache.py)
+            use_cache: bool
+                use the scenario cache
+            bootstrap_samples: int
+                if > 0, number of bootstrap samples (and permutations)
+                for confidence intervals (see validation/bootstrap.py)
+            seed: int
+                seed of bootstrap and permutation test
+                (the same for all submissions)
+        '''
+        self.n_jobs = n_jobs
+        self.cache_dn = cache_dn
+        self.use_cache = use_cache
+        self.bootstrap_samples = bootstrap_samples
+        self.seed = seed
+        self.logger = logging.getLogger("BatchValidator")
+
+    def _load_group(self, train_as: str, test_as: str):
+        '''
+            loads a train/test scenario pair (and its baselines) into _SHARED
+        '''
+        _SHARED["bootstrap_samples"] = self.bootstrap_samples
+        _SHARED["seed"] = self.seed
+        _SHARED["test_scenario"] = read_scenario(dn=test_as, cache_dn=self.cache_dn,
+                                                 use_cache=self.use_cache)
+        _SHARED["train_scenario"] = read_scenario(dn=train_as, cache_dn=self.cache_dn,
+                                                  use_cache=self.use_cache)
+        # oracle and SBS are computed once for all submissions
+        if self.use_cache:
+            index_dn = os.path.join(self.cache_dn, "baselines") if self.cache_dn else None
+            _SHARED["baselines"] = BaselineIndex(index_dn=index_dn).get(
+                test_dn=test_as, train_dn=train_as,
+                test_scenario=_SHARED["test_scenario"], train_scenario=_SHARED["train_scenario"])
+        else:
+            _SHARED["baselines"] = get_baselines(test_scenario=_SHARED["test_scenario"],
+                                                 train_scenario=_SHARED["train_scenario"])
+
+    def run(self, entries: list) -> list:
+        '''
+            validates all entries of a manifest
+
+            Arguments
+            ---------
+            entries: list
+                see read_manifest
+
+            Returns
+            -------
+            list of dicts with RESULT_FIELDS (in the order of entries)
+        '''
+        groups = OrderedDict()
+        for idx, entry in enumerate(entries):
+            groups.setdefault((entry["train_as"], entry["test_as"]), []).append(idx)
+
+        rows = [None] * len(entries)
+        for (train_as, test_as), indices in groups.items():
+            self.logger.info("Validate %d submission(s) on %s" % (len(indices), test_as))
+            group_entries = [entries[idx] for idx in indices]
+            try:
+                self._load_group(train_as=train_as, test_as=test_as)
+            except Exception as err:
+                _SHARED.clear()
+                error = "%s: %s" % (err.__class__.__name__, err)
+                self.logger.error("Could not load %s and %s: %s" % (train_as, test_as, error))
+                for idx, entry in zip(indices, group_entries):
+                    rows[idx] = _empty_row(entry)
+                    rows[idx]["error"] = error
+                continue
+            try:
+                n_jobs = min(self.n_jobs or multiprocessing.cpu_count(), len(group_entries))
+                if n_jobs > 1 and "fork" in multiprocessing.get_all_start_methods():
+                    with multiprocessing.get_context("fork").Pool(processes=n_jobs) as pool:
+                        group_rows = pool.map(_validate_submission, group_entries)
+                else:
+                    group_rows = list(map(_validate_submission, group_entries))
+            finally:
+                _SHARED.clear()
+            for idx, row in zip(indices, group_rows):
+                if row["error"]:
+                    self.logger.error("%s on %s: %s" % (row["result_fn"], row["scenario"], row["error"]))
+                rows[idx] = row
+        return rows
+
+
+def write_results(rows: list, fn: str):
+    '''
+        writes the consolidated table as CSV or JSON (if fn ends with .json)
+    '''
+    with open(fn, "w") as fp:
+        if fn.endswith(".json"):
+            json.dump(rows, fp, indent=2)
+        else:
+            writer = csv.DictWriter(fp, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--manifest", help="CSV (or JSON) file with columns scenario,train_as,test_as,result_fn")
+    parser.add_argument("--out_fn", default="validation.csv", help="Consolidated results (.csv or .json)")
+    parser.add_argument("--n_jobs", type=int, default=None, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+    parser.add_argument("--bootstrap", type=int, default=0, help="Number of bootstrap samples (and permutations) for confidence intervals (0: off)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of bootstrap and permutation test")
+    parser.add_argument("--verbose", default="INFO", choices=["DEBUG", "INFO", "WARNING"], help="Logging level")
+
+    args_ = parser.parse_args()
+
+    logging.basicConfig(level=args_.verbose)
+
+    rows = BatchValidator(n_jobs=args_.n_jobs, cache_dn=args_.cache_dir,
+                          use_cache=not args_.no_cache, bootstrap_samples=args_.bootstrap,
+                          seed=args_.seed).run(entries=read_manifest(args_.manifest))
+    write_results(rows=rows, fn=args_.out_fn)
@@ -0,0 +1,275 @@
+import numpy as np
+import pandas as pd
+
+__license__ = "BSD"
+
+
+# Confidence intervals and significance tests of the validation scores
+#
+# The validator stores the outcome of each test instance (InstanceOutcomes);
+# all resamples are then evaluated at once:
+# a bootstrap sample is a vector of instance counts and
+# a permutation is a vector of sign flips,
+# such that the sums of a whole batch of samples are a single matrix product.
+# The random numbers are drawn from a generator with a fixed seed,
+# i.e., the results are reproducible.
+
+# maximal number of matrix entries (samples x instances) per batch
+MAX_BATCH_ENTRIES = 10 ** 7
+
+
+class InstanceOutcomes(object):
+
+    def __init__(self, instances: list, used_time: np.ndarray, solved: np.ndarray,
+                 timeout: np.ndarray, score: np.ndarray, oracle: np.ndarray,
+                 sbs: np.ndarray, unsolvable: np.ndarray, runtime_cutoff: float,
+                 maximize: bool):
+        """ Constructor
+
+            per-instance outcome of a submission
+
+            Arguments
+            ---------
+            instances: list
+                test instances (order of all arrays)
+            used_time: np.ndarray
+                time used by the schedule (NaN for solution quality)
+            solved: np.ndarray
+                bool; solved (runtime) or validated (solution quality)
+            timeout: np.ndarray
+                bool; counted as a timeout (always False for solution quality)
+            score: np.ndarray
+                PAR10 contribution (runtime) or solution quality of the selected algorithm
+            oracle: np.ndarray
+                performance of the oracle
+            sbs: np.ndarray
+                performance of the single best solver
+            unsolvable: np.ndarray
+                bool; not solved by any algorithm
+            runtime_cutoff: float
+                maximal running time (None for solution quality)
+            maximize: bool
+                whether the objective has to be maximized
+        """
+        self.instances = instances
+        self.used_time = used_time
+        self.solved = solved
+        self.timeout = timeout
+        self.score = score
+        self.oracle = oracle
+        self.sbs = sbs
+        self.unsolvable = unsolvable
+        self.runtime_cutoff = runtime_cutoff
+        self.maximize = maximize
+
+    @classmethod
+    def from_arrays(cls, baselines, instances: list, used_time, solved, timeout, score,
+                    runtime_cutoff: float, maximize: bool):
+        """
+            outcomes of the validated instances in the order of the baselines;
+            instances without outcome are neither solved nor timeouts
+            (as in the statistics of the validator)
+
+            Arguments
+            ---------
+            baselines: ScenarioBaselines
+                oracle and SBS of the test scenario
+            instances: list
+                validated instances (order of the other arrays)
+        """
+        n_insts = len(baselines.instances)
+        rows = pd.Index(baselines.instances).get_indexer(list(instances))
+        known = rows >= 0
+        rows = rows[known]
+
+        def align(values, fill, dtype):
+            aligned = np.full(n_insts, fill, dtype=dtype)
+            aligned[rows] = np.asarray(values, dtype=dtype)[known]
+            return aligned
+
+        return cls(instances=list(baselines.instances),
+                   used_time=align(used_time, np.nan, np.float64),
+                   solved=align(solved, False, bool),
+                   timeout=align(timeout, False, bool),
+                   score=align(score, 0.0, np.float64),
+                   oracle=np.asarray(baselines.oracle, dtype=np.float64),
+                   sbs=np.asarray(baselines.sbs_perf, dtype=np.float64),
+                   unsolvable=np.asarray(baselines.unsolvable, dtype=bool),
+                   runtime_cutoff=runtime_cutoff, maximize=maximize)
+
+    def concatenate(self, other):
+        """
+            outcomes of both (e.g., of all cv folds)
+        """
+        return InstanceOutcomes(instances=self.instances + other.instances,
+                                **dict((attr, np.concatenate([getattr(self, attr), getattr(other, attr)]))
+                                       for attr in ["used_time", "solved", "timeout", "score",
+                                                    "oracle", "sbs", "unsolvable"]),
+                                runtime_cutoff=self.runtime_cutoff, maximize=self.maximize)
+
+    def get_counted(self, remove_unsolvable: bool) -> np.ndarray:
+        """
+            instances counted in the number of samples (see Stats.get_n_samples)
+        """
+        if self.runtime_cutoff:
+            counted = self.solved | self.timeout
+            if remove_unsolvable:
+                counted = counted & ~self.unsolvable
+            return counted
+        return self.solved.copy()
+
+    def get_matrix(self, remove_unsolvable: bool) -> np.ndarray:
+        """
+            instances x [score, oracle, sbs, counted];
+            the weighted column sums yield the totals of Stats
+        """
+        return np.column_stack([self.score, self.oracle, self.sbs,
+                                self.get_counted(remove_unsolvable)]).astype(np.float64)
+
+    def get_scores(self, sums: np.ndarray) -> dict:
+        """
+            scores and closed gap of (a batch of) column sums of get_matrix
+            (as Stats.get_score, get_score_oracle, get_score_sbs and get_closed_gap)
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            n = sums[..., 3]
+            score = sums[..., 0] / n
+            oracle = sums[..., 1] / n
+            sbs = sums[..., 2] / n
+            if self.maximize:
+                closed_gap = (score - sbs) / (oracle - sbs)
+            else:
+                closed_gap = (sbs - score) / (sbs - oracle)
+        return {"score": score, "oracle": oracle, "sbs": sbs, "closed_gap": closed_gap}
+
+
+def _batches(n_samples: int, n_insts: int):
+    batch_size = max(1, min(n_samples, MAX_BATCH_ENTRIES // max(n_insts, 1)))
+    for start in range(0, n_samples, batch_size):
+        yield min(batch_size, n_samples - start)
+
+
+def _summarize(values: np.ndarray, confidence: float) -> dict:
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {"mean": np.nan, "std": np.nan, "ci_low": np.nan, "ci_high": np.nan}
+    alpha = (1 - confidence) / 2
+    low, high = np.percentile(values, [100 * alpha, 100 * (1 - alpha)])
+    return {"mean": float(values.mean()), "std": float(values.std()),
+            "ci_low": float(low), "ci_high": float(high)}
+
+
+def bootstrap(outcomes: InstanceOutcomes, remove_unsolvable: bool = True, n_samples: int = 1000,
+              seed: int = 1, confidence: float = 0.95) -> dict:
+    """
+        bootstrap distribution of the score (PAR10 or solution quality),
+        of the oracle and SBS scores and of the closed gap
+
+        Arguments
+        ---------
+        outcomes: InstanceOutcomes
+            per-instance outcome of a submission
+        remove_unsolvable: bool
+            remove unsolvable instances (as in Stats)
+        n_samples: int
+            number of bootstrap samples
+        seed: int
+            seed of the random number generator
+        confidence: float
+            level of the percentile confidence intervals
+
+        Returns
+        -------
+        dict metric -> {"mean", "std", "ci_low", "ci_high"}
+        and "samples": dict metric -> np.ndarray (one value per bootstrap sample)
+    """
+    rng = np.random.RandomState(seed)
+    matrix = outcomes.get_matrix(remove_unsolvable)
+    n_insts = matrix.shape[0]
+
+    sums = []
+    for batch in _batches(n_samples, n_insts):
+        # how often each instance is drawn in each sample
+        # (one bincount over the draws of all samples of the batch)
+        draws = rng.randint(0, n_insts, size=(batch, n_insts))
+        draws += (np.arange(batch) * n_insts)[:, np.newaxis]
+        counts = np.bincount(draws.ravel(), minlength=batch * n_insts).reshape(batch, n_insts)
+        sums.append(counts.astype(np.float64) @ matrix)
+    samples = outcomes.get_scores(np.vstack(sums))
+
+    result = dict((metric, _summarize(values, confidence)) for metric, values in samples.items())
+    result["samples"] = samples
+    result["n_samples"] = n_samples
+    result["confidence"] = confidence
+    return result
+
+
+def permutation_test(outcomes: InstanceOutcomes, other: InstanceOutcomes = None,
+                     remove_unsolvable: bool = True, n_permutations: int = 1000,
+                     seed: int = 1) -> dict:
+    """
+        paired permutation test of the score difference
+        between a submission and the SBS (or another submission on the same instances):
+        under the null hypothesis, the outcomes of both are exchangeable per instance
+
+        Arguments
+        ---------
+        outcomes: InstanceOutcomes
+            per-instance outcome of a submission
+        other: InstanceOutcomes
+            per-instance outcome of a second submission (default: SBS)
+        remove_unsolvable: bool
+            remove unsolvable instances (as in Stats)
+        n_permutations: int
+            number of random permutations
+        seed: int
+            seed of the random number generator
+
+        Returns
+        -------
+        dict with the observed differences of score and closed gap,
+        their two-sided p-values and the distributions under the null hypothesis
+    """
+    rng = np.random.RandomState(seed)
+    matrix = outcomes.get_matrix(remove_unsolvable)
+    if other is None:
+        other_score = outcomes.sbs
+    else:
+        if list(other.instances) != list(outcomes.instances):
+            raise ValueError("Both submissions have to be validated on the same instances")
+        other_score = other.score
+    other_matrix = matrix.copy()
+    other_matrix[:, 0] = other_score
+    counted = matrix[:, 3] > 0
+    # instances that are not counted do not change the score
+    delta = np.where(counted, other_score - matrix[:, 0], 0.0)
+
+    observed = outcomes.get_scores(matrix.sum(axis=0))
+    observed_other = outcomes.get_scores(other_matrix.sum(axis=0))
+
+    diffs = {"score": [], "closed_gap": []}
+    n_insts = matrix.shape[0]
+    base = matrix.sum(axis=0)
+    for batch in _batches(n_permutations, n_insts):
+        # swapped instances take the outcome of the other submission
+        swaps = (rng.random_sample((batch, n_insts)) < 0.5).astype(np.float64)
+        shift = swaps @ delta
+        sums = np.tile(base, (batch, 1))
+        other_sums = np.tile(other_matrix.sum(axis=0), (batch, 1))
+        sums[:, 0] += shift
+        other_sums[:, 0] -= shift
+        perm = outcomes.get_scores(sums)
+        perm_other = outcomes.get_scores(other_sums)
+        for metric in diffs:
+            diffs[metric].append(perm[metric] - perm_other[metric])
+
+    result = {"n_permutations": n_permutations}
+    for metric in diffs:
+        null = np.concatenate(diffs[metric])
+        obs = observed[metric] - observed_other[metric]
+        # small tolerance such that permutations without effect count as extreme
+        extreme = np.abs(null) >= np.abs(obs) - 1e-12 * max(1.0, abs(obs))
+        result[metric] = {"observed_diff": float(obs),
+                          "p_value": float((1 + extreme.sum()) / (1 + null.size)),
+                          "null": null}
+    return result
@@ -0,0 +1,231 @@
+import logging
+
+import numpy as np
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+from oasc_starterkit.runstatus import get_status
+
+__license__ = "BSD"
+
+
+# batched counterpart of the per-instance loop in Validator.validate_runtime
+#
+# schedules are converted into padded 2D arrays (instances x schedule entries)
+# such that used time, solved and timeout status of all instances
+# can be computed with a few numpy operations
+
+ENTRY_PAD = 0
+ENTRY_ALGO = 1
+ENTRY_FEATURE = 2
+ENTRY_UNKNOWN = 3
+
+
+class ScheduleArrays(object):
+
+    def __init__(self, schedules: dict, algorithms: list, feature_steps: list,
+                 feature_group_dict: dict = None):
+        """ Constructor
+
+            Arguments
+            ---------
+            schedules: dict {instance name -> tuples [algo, bugdet]}
+                algorithm schedules per instance
+            algorithms: list
+                algorithm names; defines the column order of algo_idx
+            feature_steps: list
+                feature step names; defines the column order of step_idx
+            feature_group_dict: dict
+                feature step description (used to check "requires")
+        """
+        self.logger = logging.getLogger("ScheduleArrays")
+
+        self.algorithms = list(algorithms)
+        self.feature_steps = list(feature_steps)
+        self.instances = list(schedules.keys())
+
+        algo_map = dict((algo, idx) for idx, algo in enumerate(self.algorithms))
+        step_map = dict((step, idx) for idx, step in enumerate(self.feature_steps))
+
+        n_insts = len(self.instances)
+        max_len = max([len(s) for s in schedules.values()] + [0])
+
+        # entry type per position (ENTRY_*)
+        self.kind = np.full((n_insts, max_len), ENTRY_PAD, dtype=np.uint8)
+        # index into algorithms resp. feature_steps; 0 if not applicable
+        self.algo_idx = np.zeros((n_insts, max_len), dtype=np.int32)
+        self.step_idx = np.zeros((n_insts, max_len), dtype=np.int32)
+        self.budget = np.full((n_insts, max_len), np.inf)
+        self.length = np.zeros(n_insts, dtype=np.int32)
+
+        for i, (inst, schedule) in enumerate(schedules.items()):
+            self.length[i] = len(schedule)
+            feature_steps_used = []
+            for j, entry in enumerate(schedule):
+                if isinstance(entry, str):
+                    if entry in algo_map:
+                        self.kind[i, j] = ENTRY_ALGO
+                        self.algo_idx[i, j] = algo_map[entry]
+                    elif entry in step_map:
+                        self.kind[i, j] = ENTRY_FEATURE
+                        self.step_idx[i, j] = step_map[entry]
+                        feature_steps_used.append(entry)
+                        self._check_requires(entry, feature_steps_used, feature_group_dict)
+                    else:
+                        self.kind[i, j] = ENTRY_UNKNOWN
+                        self.logger.error("Schedule entry %s for %s not found in data" % (entry, inst))
+                elif isinstance(entry, (list, tuple)):
+                    algo, budget = entry
+                    if algo not in algo_map:
+                        self.kind[i, j] = ENTRY_UNKNOWN
+                        self.logger.error("Schedule entry %s for %s not found in data" % (algo, inst))
+                        continue
+                    self.kind[i, j] = ENTRY_ALGO
+                    self.algo_idx[i, j] = algo_map[algo]
+                    self.budget[i, j] = budget
+                else:
+                    self.kind[i, j] = ENTRY_UNKNOWN
+                    self.logger.error("Schedule entry %s for %s not found in data" % (entry, inst))
+
+    def _check_requires(self, entry: str, feature_steps_used: list, feature_group_dict: dict):
+        if not feature_group_dict or feature_group_dict[entry].get("requires") is None:
+            return
+        missing_f_groups = list(set(feature_group_dict[entry]["requires"]).difference(feature_steps_used))
+        if missing_f_groups:
+            self.logger.error("Required feature steps (%s) are missing for computing %s." % (
+                missing_f_groups, entry))
+
+
+class RuntimeOutcome(object):
+
+    def __init__(self, instances: list, used_time: np.ndarray,
+                 solved: np.ndarray, timeout: np.ndarray,
+                 runtime_cutoff: float):
+        """ Constructor
+
+            per-instance outcome of a set of schedules
+
+            Arguments
+            ---------
+            instances: list
+                instance names (same order as all arrays)
+            used_time: np.ndarray
+                time used until the schedule solved the instance or stopped
+            solved: np.ndarray
+                bool; instance was solved within the cutoff
+            timeout: np.ndarray
+                bool; instance was counted as a timeout
+            runtime_cutoff: float
+                maximal running time
+        """
+        self.instances = instances
+        self.used_time = used_time
+        self.solved = solved
+        self.timeout = timeout
+        self.runtime_cutoff = runtime_cutoff
+
+    @property
+    def par1(self) -> np.ndarray:
+        # instances that are neither solved nor timeouts (e.g., NaN feature costs)
+        # do not contribute to the statistics
+        return np.where(self.solved, self.used_time,
+                        np.where(self.timeout, float(self.runtime_cutoff), 0.0))
+
+    @property
+    def par10(self) -> np.ndarray:
+        return self.par1 + 9 * self.runtime_cutoff * self.timeout
+
+    def update_stats(self, stat):
+        """
+            adds the outcome to a Stats object
+
+            par1 is summed sequentially in instance order
+            to obtain exactly the same floating point result as the
+            per-instance validation loop
+        """
+        stat.solved += int(self.solved.sum())
+        stat.timeouts += int(self.timeout.sum())
+        with np.errstate(invalid="ignore"):
+            stat.ended_early += int((self.timeout & (self.used_time < self.runtime_cutoff)).sum())
+        stat.par1 = float(np.add.accumulate(np.concatenate(([stat.par1], self.par1)))[-1])
+
+
+def evaluate_runtime(arrays: ScheduleArrays, test_scenario: ASlibScenario,
+                     feature_times: bool):
+    """
+        evaluates all schedules at once
+
+        Arguments
+        ---------
+        arrays: ScheduleArrays
+            padded schedules
+        test_scenario: ASlibScenario
+            ASlib scenario with test instances
+        feature_times: bool
+            whether feature costs are charged for feature steps
+
+        Returns
+        -------
+        RuntimeOutcome
+    """
+    cutoff = test_scenario.algorithm_cutoff_time
+    n_insts, max_len = arrays.kind.shape
+
+    perf_data = test_scenario.performance_data
+    rows = perf_data.index.get_indexer(arrays.instances)
+    if (rows < 0).any():
+        raise KeyError("Unknown instances in schedules: %s" %
+                       ([inst for inst, r in zip(arrays.instances, rows) if r < 0]))
+    rows = rows[:, np.newaxis]
+
+    is_algo = arrays.kind == ENTRY_ALGO
+    is_feature = arrays.kind == ENTRY_FEATURE
+
+    status = get_status(test_scenario)
+
+    step_time = np.zeros((n_insts, max_len))
+    step_solved = np.zeros((n_insts, max_len), dtype=bool)
+
+    if arrays.algorithms:
+        perf = perf_data[arrays.algorithms].values
+        ok = status.runs.reindex(perf_data.index, arrays.algorithms).ok
+        time = perf[rows, arrays.algo_idx]
+        with np.errstate(invalid="ignore"):
+            algo_solved = (time <= arrays.budget) & ok[rows, arrays.algo_idx]
+        step_time = np.where(is_algo, np.minimum(time, arrays.budget), step_time)
+        step_solved = np.where(is_algo, algo_solved, step_solved)
+
+    if is_feature.any():
+        if feature_times:
+            costs = test_scenario.feature_cost_data.loc[perf_data.index, arrays.feature_steps].values
+            step_time = np.where(is_feature, costs[rows, arrays.step_idx], step_time)
+        presolved = status.features.reindex(perf_data.index, arrays.feature_steps).presolved
+        step_solved = np.where(is_feature, presolved[rows, arrays.step_idx], step_solved)
+
+    # cumsum is a sequential sum -- same rounding as "used_time += ..."
+    used = np.cumsum(step_time, axis=1)
+
+    valid = arrays.kind != ENTRY_PAD
+    with np.errstate(invalid="ignore"):
+        hit_solved = step_solved & (used <= cutoff) & valid
+        hit_timeout = ~hit_solved & (used >= cutoff) & valid
+    stop = hit_solved | hit_timeout
+    stopped = stop.any(axis=1)
+    first = stop.argmax(axis=1)
+
+    idx = np.arange(n_insts)
+    last = np.maximum(arrays.length - 1, 0)
+    if max_len:
+        used_time = np.where(stopped, used[idx, first], np.where(arrays.length > 0, used[idx, last], 0.0))
+        solved = stopped & hit_solved[idx, first]
+    else:
+        used_time = np.zeros(n_insts)
+        solved = np.zeros(n_insts, dtype=bool)
+
+    # schedule ended without using all time: counted as timeout
+    with np.errstate(invalid="ignore"):
+        ended_early = ~stopped & (used_time < cutoff)
+    timeout = (stopped & ~solved) | ended_early
+
+    return RuntimeOutcome(instances=arrays.instances, used_time=used_time,
+                          solved=solved, timeout=timeout, runtime_cutoff=cutoff)
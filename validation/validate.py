@@ -1,10 +1,20 @@
 import sys
+import copy
 import logging
+from collections import OrderedDict
 
 import numpy as np
 
 from aslib_scenario.aslib_scenario import ASlibScenario
 
+from oasc_starterkit.results_io import iter_chunks
+from oasc_starterkit.instrumentation import NULL_PROFILER
+from oasc_starterkit.arff_stream import get_run_cube
+from oasc_starterkit.runstatus import get_status
+from validation.baselines import ScenarioBaselines, get_baselines
+from validation.schedule_engine import ScheduleArrays, RuntimeOutcome, evaluate_runtime
+from validation.bootstrap import InstanceOutcomes, bootstrap, permutation_test
+
 __author__ = "Marius Lindauer, Jan N. van Rijn"
 __license__ = "BSD"
 
@@ -13,6 +23,11 @@ __license__ = "BSD"
 
 class Stats(object):
 
+    # counters and sums that are added over several validations (see add)
+    COUNTERS = ["par1", "par10", "timeouts", "solved", "unsolvable",
+                "presolved_feats", "oracle_par10", "sbs_par10", "worse_than_sbs",
+                "ended_early"]
+
     def __init__(self, runtime_cutoff: int,
                  maximize: bool):
         """ Constructor
@@ -38,9 +53,34 @@ class Stats(object):
         self.runtime_cutoff = runtime_cutoff
         self.maximize = maximize
         self.worse_than_sbs = 0  # int counter
+        # schedules that ended without using all time (counted as timeouts)
+        self.ended_early = 0
+
+        # per-instance oracle and SBS (see validation/baselines.py)
+        self.baselines = None
+        # per-instance outcome of the submission
+        # and confidence intervals (see validation/bootstrap.py)
+        self.outcomes = None
+        self.bootstrap = None
+        self.permutation = None
 
         self.logger = logging.getLogger("Stats")
 
+    def add(self, stat):
+        """
+            adds the counts and sums of another Stats object
+            (e.g., to aggregate the statistics of several cv folds)
+
+            Arguments
+            ---------
+            stat: Stats
+                statistics with the same runtime_cutoff and maximize
+        """
+        for attr in self.COUNTERS:
+            setattr(self, attr, getattr(self, attr) + getattr(stat, attr))
+        if stat.outcomes is not None:
+            self.outcomes = stat.outcomes if self.outcomes is None else self.outcomes.concatenate(stat.outcomes)
+
     def get_time_outs(self, remove_unsolvable: bool) -> int:
         if remove_unsolvable and self.runtime_cutoff:
             return self.timeouts - self.unsolvable
@@ -111,6 +151,31 @@ class Stats(object):
         else:
             return (system_score - oracle) / (sbs - oracle)
 
+    def compute_confidence(self, remove_unsolvable: bool, n_samples: int = 1000,
+                           seed: int = 1, confidence: float = 0.95):
+        """
+            computes bootstrap confidence intervals of the scores and the closed gap
+            and a permutation test against the SBS
+            (requires the per-instance outcomes of the validator)
+
+            Arguments
+            ---------
+            remove_unsolvable : bool
+                remove unsolvable from stats
+            n_samples: int
+                number of bootstrap samples and permutations
+            seed: int
+                seed of the random number generator
+            confidence: float
+                level of the confidence intervals
+        """
+        if self.outcomes is None:
+            raise ValueError("No per-instance outcomes available")
+        self.bootstrap = bootstrap(outcomes=self.outcomes, remove_unsolvable=remove_unsolvable,
+                                   n_samples=n_samples, seed=seed, confidence=confidence)
+        self.permutation = permutation_test(outcomes=self.outcomes, remove_unsolvable=remove_unsolvable,
+                                            n_permutations=n_samples, seed=seed)
+
     def show(self, remove_unsolvable: bool = True):
         """
             shows statistics
@@ -145,6 +210,9 @@ class Stats(object):
             self.logger.info("Solved: %d / %d" % (self.solved, self.get_n_samples(remove_unsolvable)))
             self.logger.info("Unsolvable (%s): %d / %d" %
                              (rm_string, self.unsolvable, self.get_n_samples(remove_unsolvable) + self.unsolvable))
+            if self.ended_early:
+                self.logger.warning("%d schedule(s) ended without using all time (counted as timeouts)" %
+                                    (self.ended_early))
         else:
             self.logger.info("Number of instances: %d" % self.get_n_samples(remove_unsolvable))
             self.logger.info("Average Solution Quality: %.4f" % (self.get_par1(remove_unsolvable) / self.get_n_samples(remove_unsolvable)))
@@ -157,26 +225,87 @@ class Stats(object):
         self.logger.info("Gap closed: %.4f" % self.get_closed_gap(remove_unsolvable))
         self.logger.info("Gap remaining: %.4f" % self.get_gap_remaining(remove_unsolvable))
 
+        if self.bootstrap is not None:
+            level = 100 * self.bootstrap["confidence"]
+            self.logger.info(">>>>>>>>>>>>>>>>>>>>>")
+            self.logger.info("Bootstrap (%d samples):" % (self.bootstrap["n_samples"]))
+            for metric, name in [("score", "System"), ("closed_gap", "Gap closed")]:
+                self.logger.info("%s: %.4f (%g%% CI: [%.4f, %.4f])" % (name, self.bootstrap[metric]["mean"], level,
+                                                                      self.bootstrap[metric]["ci_low"],
+                                                                      self.bootstrap[metric]["ci_high"]))
+        if self.permutation is not None:
+            self.logger.info("Permutation test vs. SBS (%d permutations): p-value %.4f" %
+                             (self.permutation["n_permutations"], self.permutation["score"]["p_value"]))
+
 
 class Validator(object):
 
-    def __init__(self):
-        """ Constructor """
+    def __init__(self, log_instances: bool = True, profiler=None,
+                 bootstrap_samples: int = 0, seed: int = 1):
+        """ Constructor
+
+            Arguments
+            ---------
+            log_instances: bool
+                log debug messages for each instance
+                (if False, the per-instance loops do not format any messages)
+            profiler: Profiler
+                records the validation stages (see oasc_starterkit/instrumentation.py)
+            bootstrap_samples: int
+                if > 0, number of bootstrap samples and permutations
+                for confidence intervals (see Stats.compute_confidence)
+            seed: int
+                seed of the bootstrap and permutation test
+        """
         self.logger = logging.getLogger("Validation")
+        self.log_instances = log_instances
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.bootstrap_samples = bootstrap_samples
+        self.seed = seed
+
+    def _compute_confidence(self, stat: Stats, remove_unsolvable: bool):
+        if self.bootstrap_samples > 0:
+            with self.profiler.stage("bootstrap", n_instances=len(stat.outcomes.instances)):
+                stat.compute_confidence(remove_unsolvable=remove_unsolvable,
+                                        n_samples=self.bootstrap_samples, seed=self.seed)
+
+    def _log_instances(self) -> bool:
+        return self.log_instances and self.logger.isEnabledFor(logging.DEBUG)
+
+    def _check_missing(self, test_scenario: ASlibScenario, instances):
+        """
+            ensure that we got predictions for all test instances
+        """
+        missing = set(test_scenario.instances).difference(instances)
+        if missing:
+            self.logger.error("Missing predictions for %s" % (missing))
+            sys.exit(1)
 
-    def validate_runtime(self, schedules: dict, test_scenario: ASlibScenario,
-                         train_scenario: ASlibScenario):
+    def validate_runtime(self, schedules, test_scenario: ASlibScenario,
+                         train_scenario: ASlibScenario, vectorized: bool = True,
+                         baselines: ScenarioBaselines = None, chunk_size: int = 10000):
         """
             validate selected schedules on test instances for runtime
 
             Arguments
             ---------
             schedules: dict {instance name -> tuples [algo, bugdet]}
-                algorithm schedules per instance
+                algorithm schedules per instance;
+                or an iterable of (instance name, schedule),
+                e.g., oasc_starterkit.results_io.iter_results
             test_scenario: ASlibScenario
                 ASlib scenario with test instances
             train_scenario: ASlibScenario
                 ASlib scenario with test instances -- required for SBS
+            vectorized: bool
+                evaluate all schedules at once with numpy (see schedule_engine);
+                if False, use the per-instance loop
+            baselines: ScenarioBaselines
+                precomputed oracle and SBS of the scenarios (see baselines.py);
+                computed if not given
+            chunk_size: int
+                number of schedules evaluated at once;
+                the statistics are updated after each chunk
         """
         if test_scenario.performance_type[0] != "runtime":
             raise ValueError("Cannot validate non-runtime scenario with runtime validation method")
@@ -188,35 +317,126 @@ class Validator(object):
         if test_scenario.feature_cost_data is not None and test_scenario.performance_type[0] == "runtime":
             feature_times = True
 
-        ok_status = test_scenario.runstatus_data == "ok"
-        unsolvable = ok_status.sum(axis=1) == 0
-        stat.unsolvable += unsolvable.sum()
+        if baselines is None:
+            with self.profiler.stage("baselines", n_instances=len(test_scenario.instances)):
+                baselines = get_baselines(test_scenario=test_scenario, train_scenario=train_scenario)
+        stat.baselines = baselines
+        stat.unsolvable += int(baselines.unsolvable.sum())
+
+        # a dict can be checked before the validation;
+        # a stream of schedules only after it was consumed
+        streamed = not isinstance(schedules, dict)
+        if not streamed:
+            self._check_missing(test_scenario, schedules.keys())
+            schedules = schedules.items()
+
+        stat.oracle_par10 = baselines.oracle_par10
+        stat.sbs_par10 = baselines.sbs_par10
+
+        seen = set()
+        # per-instance outcomes (list of RuntimeOutcome)
+        outcomes = []
+        with self.profiler.stage("validate_runtime") as stage:
+            for chunk in iter_chunks(schedules, chunk_size):
+                chunk = OrderedDict(chunk)
+                if vectorized:
+                    outcome = self._validate_runtime_vectorized(schedules=chunk, test_scenario=test_scenario,
+                                                                stat=stat, feature_times=feature_times)
+                else:
+                    outcome = self._validate_runtime_loop(schedules=chunk, test_scenario=test_scenario,
+                                                          stat=stat, feature_times=feature_times)
+                outcomes.append(outcome)
+                seen.update(chunk.keys())
+                if streamed:
+                    self.logger.debug("Validated %d schedules so far (solved: %d, timeouts: %d)" %
+                                      (len(seen), stat.solved, stat.timeouts))
+            stage["n_instances"] = len(seen)
+
+        if streamed:
+            self._check_missing(test_scenario, seen)
 
-        # ensure that we got predictions for all test instances
-        if set(test_scenario.instances).difference(schedules.keys()):
-            self.logger.error(
-                "Missing predictions for %s" % (set(test_scenario.instances).difference(schedules.keys())))
-            sys.exit(1)
+        stat.par10 = stat.par1 + 9 * \
+                     test_scenario.algorithm_cutoff_time * stat.timeouts
+
+        cutoff = test_scenario.algorithm_cutoff_time
+        stat.outcomes = InstanceOutcomes.from_arrays(
+            baselines=baselines,
+            instances=[inst for outcome in outcomes for inst in outcome.instances],
+            used_time=np.concatenate([outcome.used_time for outcome in outcomes] + [[]]),
+            solved=np.concatenate([outcome.solved for outcome in outcomes] + [[]]),
+            timeout=np.concatenate([outcome.timeout for outcome in outcomes] + [[]]),
+            score=np.concatenate([outcome.par10 for outcome in outcomes] + [[]]),
+            runtime_cutoff=cutoff, maximize=test_scenario.maximize[0])
+        self._compute_confidence(stat, remove_unsolvable=True)
+
+        stat.show()
 
-        stat.oracle_par10 = test_scenario.performance_data.min(axis=1).sum()
-        sbs = train_scenario.performance_data.sum(axis=0).argmin()
-        stat.sbs_par10 = test_scenario.performance_data.sum(axis=0)[sbs]
+        return stat
 
-        for inst, schedule in schedules.items():
-            self.logger.debug("Validate: %s on %s" % (schedule, inst))
+    def _validate_runtime_vectorized(self, schedules: dict, test_scenario: ASlibScenario,
+                                     stat: Stats, feature_times: bool):
+        """
+            evaluates all schedules at once and adds the results to stat
+        """
+        arrays = ScheduleArrays(schedules=schedules,
+                                algorithms=test_scenario.algorithms,
+                                feature_steps=test_scenario.feature_steps,
+                                feature_group_dict=test_scenario.feature_group_dict)
+        outcome = evaluate_runtime(arrays=arrays, test_scenario=test_scenario,
+                                   feature_times=feature_times)
+        outcome.update_stats(stat)
+        self.logger.debug("Validated %d schedules (max. length %d)" % (arrays.kind.shape[0], arrays.kind.shape[1]))
+        return outcome
+
+    def _validate_runtime_loop(self, schedules: dict, test_scenario: ASlibScenario,
+                               stat: Stats, feature_times: bool):
+        """
+            evaluates schedules instance by instance and adds the results to stat
 
+            Returns
+            -------
+            RuntimeOutcome
+        """
+        debug = self._log_instances()
+        # performance and precomputed status masks by position (as in schedule_engine.evaluate_runtime)
+        perf_data = test_scenario.performance_data
+        algo_pos = dict((algo, pos) for pos, algo in enumerate(test_scenario.algorithms))
+        perf = perf_data[test_scenario.algorithms].values
+        status = get_status(test_scenario)
+        ok = status.runs.reindex(perf_data.index, test_scenario.algorithms).ok
+        step_pos = dict((step, pos) for pos, step in enumerate(test_scenario.feature_steps))
+        presolved = None
+        if status.features is not None:
+            presolved = status.features.reindex(perf_data.index, test_scenario.feature_steps).presolved
+        if feature_times:
+            costs = test_scenario.feature_cost_data.loc[perf_data.index, test_scenario.feature_steps].values
+
+        n_insts = len(schedules)
+        used_times = np.zeros(n_insts)
+        solved_insts = np.zeros(n_insts, dtype=bool)
+        timeout_insts = np.zeros(n_insts, dtype=bool)
+        for idx, (inst, schedule) in enumerate(schedules.items()):
+            n_solved, n_timeouts = stat.solved, stat.timeouts
+            if debug:
+                self.logger.debug("Validate: %s on %s" % (schedule, inst))
+
+            row = perf_data.index.get_loc(inst)
             used_time = 0
+            # unknown schedule entries use no time and do not solve the instance
+            # (as in schedule_engine.ScheduleArrays)
+            solved = False
             feature_steps_used = []
             for entry in schedule:
                 if isinstance(entry, str):
-                    if entry in test_scenario.algorithms:
+                    if entry in algo_pos:
                         algo = entry
                         budget = np.inf
-                        time = test_scenario.performance_data[algo][inst]
-                        self.logger.debug("Alloted time %f of %s vs true time %f" % (budget, algo, time))
+                        time = perf[row, algo_pos[algo]]
+                        if debug:
+                            self.logger.debug("Alloted time %f of %s vs true time %f" % (budget, algo, time))
                         used_time += min(time, budget)
-                        solved = (time <= budget) and test_scenario.runstatus_data[algo][inst] == "ok"
-                    elif entry in test_scenario.feature_steps:
+                        solved = (time <= budget) and ok[row, algo_pos[algo]]
+                    elif entry in step_pos:
                         feature_steps_used.append(entry)
                         if test_scenario.feature_group_dict[entry].get("requires") is not None:
                             missing_f_groups = list(
@@ -225,122 +445,219 @@ class Validator(object):
                                 self.logger.error("Required feature steps (%s) are missing for computing %s." % (
                                 missing_f_groups, entry))
                         if feature_times:
-                            ftime = test_scenario.feature_cost_data[entry][inst]
-                            self.logger.debug("Used Feature time: %f" % (ftime))
+                            ftime = costs[row, step_pos[entry]]
+                            if debug:
+                                self.logger.debug("Used Feature time: %f" % (ftime))
                             used_time += ftime
-                        solved = (test_scenario.feature_runstatus_data[entry][inst] == "presolved")
+                        solved = presolved is not None and presolved[row, step_pos[entry]]
                     else:
                         self.logger.error("Schedule entry %s for %s not found in data" % (entry, inst))
-                elif isinstance(entry, list):  # algorithm
+                        solved = False
+                elif isinstance(entry, (list, tuple)):  # algorithm
                     algo, budget = entry
-                    time = test_scenario.performance_data[algo][inst]
-                    self.logger.debug("Alloted time %f of %s vs true time %f" % (budget, algo, time))
+                    if algo not in algo_pos:
+                        self.logger.error("Schedule entry %s for %s not found in data" % (algo, inst))
+                        solved = False
+                        continue
+                    time = perf[row, algo_pos[algo]]
+                    if debug:
+                        self.logger.debug("Alloted time %f of %s vs true time %f" % (budget, algo, time))
                     used_time += min(time, budget)
-                    solved = (time <= budget) and test_scenario.runstatus_data[algo][inst] == "ok"
-                self.logger.debug("Used time (so far): %f" % (used_time))
+                    solved = (time <= budget) and ok[row, algo_pos[algo]]
+                else:
+                    self.logger.error("Schedule entry %s for %s not found in data" % (entry, inst))
+                    solved = False
+                if debug:
+                    self.logger.debug("Used time (so far): %f" % (used_time))
 
                 if solved and used_time <= test_scenario.algorithm_cutoff_time:
                     stat.solved += 1
                     stat.par1 += used_time
-                    self.logger.info("Solved after %f" % (used_time))
+                    if self.log_instances:
+                        self.logger.info("Solved after %f" % (used_time))
                     break
                 elif used_time >= test_scenario.algorithm_cutoff_time:
                     stat.timeouts += 1
                     stat.par1 += test_scenario.algorithm_cutoff_time
-                    self.logger.debug("Timeout after %f (< %f)" % (test_scenario.algorithm_cutoff_time, used_time))
+                    if debug:
+                        self.logger.debug("Timeout after %f (< %f)" % (test_scenario.algorithm_cutoff_time, used_time))
                     break
 
             if not solved and used_time < test_scenario.algorithm_cutoff_time:
-                self.logger.warn(
-                    "Schedule ended without using all time: %f" % (test_scenario.algorithm_cutoff_time - used_time))
-                self.logger.warn("Counting as timeout")
+                # reported once in Stats.show
+                if debug:
+                    self.logger.warning("Schedule ended without using all time: %f; counting as timeout" %
+                                        (test_scenario.algorithm_cutoff_time - used_time))
+                stat.ended_early += 1
                 stat.timeouts += 1
                 stat.par1 += test_scenario.algorithm_cutoff_time
 
-        stat.par10 = stat.par1 + 9 * \
-                     test_scenario.algorithm_cutoff_time * stat.timeouts
+            used_times[idx] = used_time
+            solved_insts[idx] = stat.solved > n_solved
+            timeout_insts[idx] = stat.timeouts > n_timeouts
 
-        stat.show()
+        return RuntimeOutcome(instances=list(schedules.keys()), used_time=used_times,
+                              solved=solved_insts, timeout=timeout_insts,
+                              runtime_cutoff=test_scenario.algorithm_cutoff_time)
 
-        return stat
+    def validate_repetitions(self, schedules, test_scenario: ASlibScenario,
+                             train_scenario: ASlibScenario):
+        """
+            validates the schedules on each repetition of the test runs
+            (for stochastic algorithms)
 
-    def validate_quality(self, schedules: dict, test_scenario: ASlibScenario,
-                         train_scenario: ASlibScenario):
+            Arguments
+            ---------
+            schedules: dict {instance name -> tuples [algo, bugdet]}
+                algorithm schedules per instance
+                (an iterable of (instance name, schedule) is read into memory)
+            test_scenario: ASlibScenario
+                ASlib scenario with test instances and all repetitions
+                of the runs (run_cube, see read_scenario(keep_repetitions=True))
+            train_scenario: ASlibScenario
+                ASlib scenario with training instances -- required for SBS
+
+            Returns
+            -------
+            rep_stats: list
+                Stats of each repetition
+            stat: Stats
+                aggregated statistics over all repetitions
+                (runs missing in a repetition are unsuccessful for runtime
+                and take the mean of the other repetitions for solution quality)
+        """
+        if not isinstance(schedules, dict):
+            schedules = OrderedDict(schedules)
+        cube = get_run_cube(test_scenario)
+        runtime = test_scenario.performance_type[0] == "runtime"
+
+        rep_stats = []
+        for rep in range(cube.n_repetitions):
+            self.logger.info("Repetition %d of %d" % (rep + 1, cube.n_repetitions))
+            # the aggregated frames of test_scenario are not modified
+            rep_scenario = copy.copy(test_scenario)
+            cube.get_repetition(rep, fill_missing=not runtime).apply_to(rep_scenario)
+            with self.profiler.stage("repetition_%d" % (rep + 1)):
+                if runtime:
+                    rep_stats.append(self.validate_runtime(schedules=schedules, test_scenario=rep_scenario,
+                                                           train_scenario=train_scenario))
+                else:
+                    rep_stats.append(self.validate_quality(schedules=schedules, test_scenario=rep_scenario,
+                                                           train_scenario=train_scenario))
+
+        stat = Stats(runtime_cutoff=test_scenario.algorithm_cutoff_time if runtime else None,
+                     maximize=test_scenario.maximize[0])
+        for rep_stat in rep_stats:
+            stat.add(rep_stat)
+        self.logger.info("Aggregated over %d repetitions:" % (len(rep_stats)))
+        stat.show(remove_unsolvable=runtime)
+        return rep_stats, stat
+
+    def validate_quality(self, schedules, test_scenario: ASlibScenario,
+                         train_scenario: ASlibScenario, baselines: ScenarioBaselines = None):
         """
             validate selected schedules on test instances for solution quality
 
             Arguments
             ---------
             schedules: dict {instance name -> tuples [algo, bugdet]}
-                algorithm schedules per instance
+                algorithm schedules per instance;
+                or an iterable of (instance name, schedule),
+                e.g., oasc_starterkit.results_io.iter_results
             test_scenario: ASlibScenario
                 ASlib scenario with test instances
             train_scenario: ASlibScenario
                 ASlib scenario with test instances -- required for SBS
+            baselines: ScenarioBaselines
+                precomputed oracle and SBS of the scenarios (see baselines.py);
+                computed if not given
         """
         if test_scenario.performance_type[0] != "solution_quality":
             raise ValueError("Cannot validate non-solution_quality scenario with solution_quality validation method")
 
         self.logger.debug("FYI: Feature costs and algorithm runstatus is ignored")
 
+        # (the scenarios are not modified
+        #  such that they can be used to validate several result files)
+        test_perf = test_scenario.performance_data
         if test_scenario.maximize[0]:
-            test_scenario.performance_data *= -1
-            train_scenario.performance_data *= -1
+            test_perf = test_perf * -1
             self.logger.debug("Removing *-1 in performance data because of maximization")
 
         stat = Stats(runtime_cutoff=None, maximize=test_scenario.maximize[0])
 
-        # ensure that we got predictions for all test instances
-        if set(test_scenario.instances).difference(schedules.keys()):
-            self.logger.error(
-                "Missing predictions for %s" % (set(test_scenario.instances).difference(schedules.keys())))
-            sys.exit(1)
-
-        if test_scenario.maximize[0]:
-            stat.oracle_par10 = test_scenario.performance_data.max(axis=1).sum()
-            sbs = train_scenario.performance_data.sum(axis=0).argmax()
-            stat.sbs_par10 = test_scenario.performance_data.sum(axis=0)[sbs]
-        else:
-            stat.oracle_par10 = test_scenario.performance_data.min(axis=1).sum()
-            sbs = train_scenario.performance_data.sum(axis=0).argmin()
-            stat.sbs_par10 = test_scenario.performance_data.sum(axis=0)[sbs]
-
-        for inst, schedule in schedules.items():
-            if len(schedule) == 0:
-                raise ValueError('Found empty schedule for instance %s' % inst)
-            for entry in schedule:
-                if isinstance(entry, str):
-                    if entry in test_scenario.algorithms:
-                        selected_algo = entry
-                        perf = test_scenario.performance_data[selected_algo][inst]
-                        break
-                    else:
-                        self.logger.debug("Skip %s" % (entry))
-                elif isinstance(entry, list):
-                    entry = entry[0]  # ignore cutoff
-                    if entry in test_scenario.algorithms:
-                        selected_algo = entry
-                        perf = test_scenario.performance_data[selected_algo][inst]
-                        break
+        streamed = not isinstance(schedules, dict)
+        if not streamed:
+            self._check_missing(test_scenario, schedules.keys())
+            schedules = schedules.items()
+
+        if baselines is None:
+            with self.profiler.stage("baselines", n_instances=len(test_scenario.instances)):
+                baselines = get_baselines(test_scenario=test_scenario, train_scenario=train_scenario)
+        stat.baselines = baselines
+        stat.oracle_par10 = baselines.oracle_par10
+        sbs = baselines.sbs
+        stat.sbs_par10 = baselines.sbs_par10
+
+        with self.profiler.stage("validate_quality") as stage:
+            debug = self._log_instances()
+            seen = set()
+            quality = OrderedDict()
+            for inst, schedule in schedules:
+                seen.add(inst)
+                if len(schedule) == 0:
+                    raise ValueError('Found empty schedule for instance %s' % inst)
+                for entry in schedule:
+                    if isinstance(entry, str):
+                        if entry in test_scenario.algorithms:
+                            selected_algo = entry
+                            perf = test_perf[selected_algo][inst]
+                            break
+                        else:
+                            if debug:
+                                self.logger.debug("Skip %s" % (entry))
+                    elif isinstance(entry, (list, tuple)):
+                        entry = entry[0]  # ignore cutoff
+                        if entry in test_scenario.algorithms:
+                            selected_algo = entry
+                            perf = test_perf[selected_algo][inst]
+                            break
+                        else:
+                            if debug:
+                                self.logger.debug("Skip %s" % (entry))
                     else:
-                        self.logger.debug("Skip %s" % (entry))
+                        raise ValueError('schedule entries should be of type str or list')
+
+                if debug:
+                    self.logger.debug("Using %s on %s with performance %f" % (selected_algo, inst, perf))
+
+                stat.par1 += perf
+                stat.solved += 1
+                quality[inst] = perf
+                if test_scenario.maximize[0]:
+                    if perf < test_perf[sbs][inst]:
+                        stat.worse_than_sbs += 1
+                        if debug:
+                            self.logger.debug(
+                                "%s(%.3f) vs %s (%.3f)" % (selected_algo, perf, sbs, test_perf[sbs][inst]))
                 else:
-                    raise ValueError('schedule entries should be of type str or list')
-
-            self.logger.debug("Using %s on %s with performance %f" % (selected_algo, inst, perf))
-
-            stat.par1 += perf
-            stat.solved += 1
-            if test_scenario.maximize[0]:
-                if perf < test_scenario.performance_data[sbs][inst]:
-                    stat.worse_than_sbs += 1
-                    print(
-                        "%s(%.3f) vs %s (%.3f)" % (selected_algo, perf, sbs, test_scenario.performance_data[sbs][inst]))
-            else:
-                if perf > test_scenario.performance_data[sbs][inst]:
-                    stat.worse_than_sbs += 1
-                    print(
-                        "%s(%.3f) vs %s (%.3f)" % (selected_algo, perf, sbs, test_scenario.performance_data[sbs][inst]))
+                    if perf > test_perf[sbs][inst]:
+                        stat.worse_than_sbs += 1
+                        if debug:
+                            self.logger.debug(
+                                "%s(%.3f) vs %s (%.3f)" % (selected_algo, perf, sbs, test_perf[sbs][inst]))
+            stage["n_instances"] = len(seen)
+
+        if streamed:
+            self._check_missing(test_scenario, seen)
+
+        n_insts = len(quality)
+        stat.outcomes = InstanceOutcomes.from_arrays(
+            baselines=baselines, instances=list(quality.keys()),
+            used_time=np.full(n_insts, np.nan), solved=np.ones(n_insts, dtype=bool),
+            timeout=np.zeros(n_insts, dtype=bool), score=np.fromiter(quality.values(), dtype=np.float64, count=n_insts),
+            runtime_cutoff=None, maximize=test_scenario.maximize[0])
+        self._compute_confidence(stat, remove_unsolvable=False)
 
         stat.show(remove_unsolvable=False)
 
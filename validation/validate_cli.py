@@ -1,36 +1,83 @@
 # Author: Marius Lindauer
 # License: BSD
 
+import os
 import logging
-logging.basicConfig(level="DEBUG")
-import json
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 
-from aslib_scenario.aslib_scenario import ASlibScenario
+from oasc_starterkit.scenario_cache import read_scenario
+from oasc_starterkit.results_io import load_results
+from oasc_starterkit.instrumentation import Profiler, NULL_PROFILER
 from validation.validate import Validator
+from validation.baselines import BaselineIndex, get_baselines
 
 if __name__ == "__main__":
 
     parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
-    parser.add_argument("--result_fn", help="Result json file with predictions for each test instances")
+    parser.add_argument("--result_fn", help="Result json file with predictions for each test instances (.json or .jsonl)")
     parser.add_argument("--test_as", help="Directory with *all* test data in ASlib format")
     parser.add_argument("--train_as", help="Directory with *all* train data in ASlib format")
+    parser.add_argument("--cache_dir", default=None, help="Directory of scenario cache (default: $XDG_CACHE_HOME/oasc_starterkit)")
+    parser.add_argument("--no_cache", default=False, action="store_true", help="Always parse the scenario files")
+    parser.add_argument("--stream_runs", default=False, action="store_true", help="Read algorithm_runs.arff chunk by chunk (bounded memory)")
+    parser.add_argument("--lazy", default=False, action="store_true", help="Read only the scenario files required by the validation (instead of the scenario cache)")
+    parser.add_argument("--verbose", default="DEBUG", choices=["DEBUG", "INFO", "WARNING"], help="Logging level")
+    parser.add_argument("--no_instance_log", default=False, action="store_true", help="Do not log messages for each instance")
+    parser.add_argument("--profile", default=None, help="Write timing and memory report of all stages to this JSON file")
+    parser.add_argument("--repetitions", default=False, action="store_true", help="Validate on each repetition of the test runs (stochastic algorithms)")
+    parser.add_argument("--bootstrap", type=int, default=0, help="Number of bootstrap samples (and permutations) for confidence intervals (0: off)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of bootstrap and permutation test")
     
     args_ = parser.parse_args()
     
+    logging.basicConfig(level=args_.verbose)
+    
+    profiler = Profiler() if args_.profile else NULL_PROFILER
+    
     #read scenarios
-    test_scenario = ASlibScenario()
-    test_scenario.read_scenario(dn=args_.test_as)
-    train_scenario = ASlibScenario()
-    train_scenario.read_scenario(dn=args_.train_as)
+    with profiler.stage("read_test"):
+        test_scenario = read_scenario(dn=args_.test_as, cache_dn=args_.cache_dir, 
+                                      use_cache=not args_.no_cache, stream_runs=args_.stream_runs,
+                                      keep_repetitions=args_.repetitions, lazy=args_.lazy)
+    with profiler.stage("read_train"):
+        train_scenario = read_scenario(dn=args_.train_as, cache_dn=args_.cache_dir, 
+                                       use_cache=not args_.no_cache, stream_runs=args_.stream_runs,
+                                       lazy=args_.lazy)
+    
+    # oracle and SBS are stored on disk (and reused until the scenario files change)
+    with profiler.stage("baselines", n_instances=len(test_scenario.instances)):
+        if args_.no_cache:
+            baselines = get_baselines(test_scenario=test_scenario, train_scenario=train_scenario)
+        else:
+            # next to the scenario caches (default: <user cache dir>/baselines)
+            index_dn = os.path.join(args_.cache_dir, "baselines") if args_.cache_dir else None
+            index = BaselineIndex(index_dn=index_dn, stream_runs=args_.stream_runs,
+                                  keep_repetitions=args_.repetitions)
+            baselines = index.get(test_dn=args_.test_as, train_dn=args_.train_as,
+                                  test_scenario=test_scenario, train_scenario=train_scenario)
     
     # read result file
-    with open(args_.result_fn) as fp:
-        schedules = json.load(fp)
+    # (*.jsonl files are read line by line during the validation)
+    with profiler.stage("read_results"):
+        schedules = load_results(args_.result_fn)
     
-    validator = Validator()
+    validator = Validator(log_instances=not args_.no_instance_log, profiler=profiler,
+                          bootstrap_samples=args_.bootstrap, seed=args_.seed)
     
-    if test_scenario.performance_type[0] == "runtime":
-        validator.validate_runtime(schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario)
+    if args_.repetitions:
+        validator.validate_repetitions(schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario)
+    elif test_scenario.performance_type[0] == "runtime":
+        validator.validate_runtime(schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario,
+                                   baselines=baselines)
     else:
-        validator.validate_quality(schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario)
\ No newline at end of file
+        validator.validate_quality(schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario,
+                                   baselines=baselines)
+    
+    if args_.lazy:
+        # e.g., the validation of solution quality reads neither feature costs nor feature runstatus
+        logging.getLogger("Validation").info("Read test files: %s" % (", ".join(test_scenario.get_loaded_components())))
+        logging.getLogger("Validation").info("Read train files: %s" % (", ".join(train_scenario.get_loaded_components())))
+    
+    if args_.profile:
+        profiler.show()
+        profiler.write(args_.profile)